@@ -1,11 +1,308 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
+from werkzeug.exceptions import HTTPException
+from cocktail_cache import MAX_ENTRIES, ResultCache, SharedResultCache, etag_for
+from cocktail_fuzzy import MAX_DISTANCE
+from cocktail_measures import METRICS
+from cocktail_metrics import COUNT_BUCKETS, Registry, SlowRequestProfiler
 from cocktail_search import CocktailDB
+from cocktail_shards import ShardedCocktailDB
+from cocktail_shared import get_shared_db
+from cocktail_similar import MAX_NEIGHBORS
+from cocktail_suggest import MAX_SUGGESTIONS
+from cocktail_text import LANGUAGE_FIELDS
+from functools import lru_cache, wraps
+import base64
+import binascii
+import json
 import os
+import time
 
 app = Flask(__name__)
 
-# Initialize the database
-db = CocktailDB('cocktaildb_dump.json')
+# Shared, hot-reloading handle on the database; COCKTAILDB_JSON may also name an
+# SQLite catalog. Set COCKTAILDB_LAZY_DETAILS=1 to keep instructions and other
+# detail fields of a JSON dump on disk (low-memory mode)
+catalog = get_shared_db(os.environ.get('COCKTAILDB_JSON', 'cocktaildb_dump.json'),
+                        shards=int(os.environ.get('COCKTAILDB_SHARDS', '0')),
+                        **({'lazy_details': True} if os.environ.get('COCKTAILDB_LAZY_DETAILS') == '1' else {}))
+
+# Encoded payloads kept per catalog when they are not all prebuilt
+ON_DEMAND_PAYLOAD_CACHE_SIZE = 1024
+
+# Upper bound on the number of missing ingredients /pantry will tolerate
+MAX_PANTRY_MISSING = 5
+
+# Largest page a client may request from /search
+MAX_PAGE_SIZE = 100
+
+# Largest edit distance accepted for fuzzy searches
+MAX_FUZZY_DISTANCE = MAX_DISTANCE
+
+# Search types accepted by /search
+SEARCH_TYPES = ('name', 'ingredient', 'category', 'text')
+
+# Request and search instrumentation, exposed on /metrics
+metrics = Registry()
+REQUESTS = metrics.counter('cocktaildb_requests_total', 'HTTP requests by endpoint and status.',
+                           ('endpoint', 'status'))
+REQUEST_SECONDS = metrics.histogram('cocktaildb_request_duration_seconds', 'Time to build a response, by endpoint.',
+                                    ('endpoint',))
+ERRORS = metrics.counter('cocktaildb_errors_total', 'Unhandled exceptions, by endpoint.', ('endpoint',))
+SEARCH_SECONDS = metrics.histogram('cocktaildb_search_duration_seconds',
+                                   '/search latency by search type and phase (search, serialize, total).',
+                                   ('type', 'phase'))
+SEARCH_RESULTS = metrics.histogram('cocktaildb_search_results', 'Matching drinks per /search request.',
+                                   ('type',), COUNT_BUCKETS)
+CATALOG_LOAD_SECONDS = metrics.histogram('cocktaildb_catalog_load_seconds',
+                                         'Time to load a catalog generation and build its artifacts.',
+                                         buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+
+# Cache of encoded /search and /query responses; set COCKTAILDB_SHARED_CACHE to
+# a file path to share entries between worker processes
+result_cache = ResultCache(
+    int(os.environ.get('COCKTAILDB_RESULT_CACHE_SIZE', MAX_ENTRIES)),
+    shared=SharedResultCache(os.environ['COCKTAILDB_SHARED_CACHE']) if os.environ.get('COCKTAILDB_SHARED_CACHE') else None,
+)
+
+# Set COCKTAILDB_PROFILE_DIR to keep cProfile dumps of the slowest sampled requests
+profiler = None
+if os.environ.get('COCKTAILDB_PROFILE_DIR'):
+    profiler = SlowRequestProfiler(os.environ['COCKTAILDB_PROFILE_DIR'],
+                                   float(os.environ.get('COCKTAILDB_PROFILE_SAMPLE', '0.01')))
+
+def cocktail_to_json(cocktail):
+    """Convert a cocktail record to the dict returned by the API."""
+    return {
+        'id': cocktail.get('idDrink'),
+        'name': cocktail.get('strDrink', 'Unnamed Cocktail'),
+        'category': cocktail.get('strCategory', 'N/A'),
+        'glass': cocktail.get('strGlass', 'N/A'),
+        'alcoholic': cocktail.get('strAlcoholic', 'N/A'),
+        'instructions': cocktail.get('strInstructions', 'No instructions available'),
+        'image': cocktail.get('strDrinkThumb', ''),
+        'ingredients': [
+            {'ingredient': ingredient, 'measure': (measure or '').strip()}
+            for ingredient, measure in cocktail.ingredients
+        ]
+    }
+
+def cocktail_summary_to_json(cocktail):
+    """Convert a cocktail record to the summary dict used by list views."""
+    return {
+        'id': cocktail.get('idDrink'),
+        'name': cocktail.get('strDrink', 'Unnamed Cocktail'),
+        'category': cocktail.get('strCategory', 'N/A'),
+        'image': cocktail.get('strDrinkThumb', ''),
+    }
+
+def encode_json(value):
+    """Encode a value as compact UTF-8 JSON bytes."""
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+def json_response(body, status=200):
+    """Wrap already-encoded JSON bytes in a response."""
+    return Response(body, status=status, mimetype='application/json')
+
+class OnDemandPayloads:
+    """JSON encodings of cocktails that are too costly to prebuild, made when asked for.
+    
+    Used for the full records of a low-memory catalog, where encoding
+    one reads its details back from the dump, and for every record of an
+    SQLite catalog. Only the ``cache_size`` most recently used encodings
+    are kept. Looks up like the dicts ``CocktailPayloads`` otherwise holds.
+    """
+    
+    def __init__(self, db, convert, cache_size):
+        self.db = db
+        self.convert = convert
+        self.encode = lru_cache(maxsize=cache_size)(self._encode)
+    
+    def _encode(self, drink_id):
+        cocktail = self.db.get_cocktail_by_id(drink_id)
+        if cocktail is None:
+            raise KeyError(drink_id)
+        return encode_json(self.convert(cocktail))
+    
+    def __getitem__(self, drink_id):
+        return self.encode(drink_id)
+    
+    def get(self, drink_id, default=None):
+        try:
+            return self.encode(drink_id)
+        except KeyError:
+            return default
+    
+    def clear(self):
+        """Forget every encoding, e.g. after a delta changed some drinks."""
+        self.encode.cache_clear()
+
+class CocktailPayloads:
+    """Prebuilt JSON encodings of every cocktail in a CocktailDB.
+    
+    Responses are assembled by joining these fragments, so a cocktail is
+    converted and encoded once at load rather than on every request. For
+    a catalog loaded with ``lazy_details``, only the summaries are built
+    up front and ``full`` is an ``OnDemandPayloads``; an SQLite catalog
+    gets ``OnDemandPayloads`` for both.
+    """
+    
+    def __init__(self, db):
+        in_memory = isinstance(db, (CocktailDB, ShardedCocktailDB))
+        self.full = self._payloads(db, cocktail_to_json, in_memory and db.details is None)
+        self.summary = self._payloads(db, cocktail_summary_to_json, in_memory)
+        # (payloads, converter) for the dicts that hold every cocktail.
+        self._prebuilt = [(payloads, convert) for payloads, convert in
+                          ((self.full, cocktail_to_json), (self.summary, cocktail_summary_to_json))
+                          if isinstance(payloads, dict)]
+        if self._prebuilt:
+            for cocktail in db:
+                self._encode(cocktail)
+    
+    @staticmethod
+    def _payloads(db, convert, prebuilt):
+        return {} if prebuilt else OnDemandPayloads(db, convert, ON_DEMAND_PAYLOAD_CACHE_SIZE)
+    
+    def _encode(self, cocktail):
+        for payloads, convert in self._prebuilt:
+            payloads[cocktail.id] = encode_json(convert(cocktail))
+    
+    def update(self, db, drink_ids):
+        """Re-encode the given drinks after a delta, dropping deleted ones."""
+        for drink_id in drink_ids:
+            cocktail = db.get_cocktail_by_id(drink_id)
+            if cocktail is None:
+                for payloads, _ in self._prebuilt:
+                    payloads.pop(drink_id, None)
+            else:
+                self._encode(cocktail)
+        for payloads in (self.full, self.summary):
+            if isinstance(payloads, OnDemandPayloads):
+                payloads.clear()
+    
+    def results_body(self, fragments, **fields):
+        """Build a {"results": [...], **fields} body from encoded fragments."""
+        body = [b'{"results":[', b','.join(fragments), b']']
+        for key, value in fields.items():
+            body.append(b',' + encode_json(key) + b':' + encode_json(value))
+        body.append(b'}')
+        return b''.join(body)
+
+def cached_response(body, etag):
+    """Return a JSON response for a cacheable body, tagged with its ETag."""
+    response = json_response(body)
+    response.set_etag(etag)
+    return response
+
+def not_modified(etag):
+    """Return an empty 304 response for a client that already has ``etag``."""
+    response = Response(status=304)
+    response.set_etag(etag)
+    return response
+
+def encode_cursor(offset):
+    """Encode a result offset as an opaque pagination cursor."""
+    return base64.urlsafe_b64encode(f'o:{offset}'.encode('ascii')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if invalid."""
+    try:
+        prefix, _, offset = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').partition(':')
+    except (binascii.Error, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if prefix != 'o' or not offset.isdigit():
+        raise ValueError('Invalid cursor')
+    return int(offset)
+
+def parse_page(params):
+    """Return (offset, limit) from a request body; limit is None for everything."""
+    limit = params.get('limit')
+    if limit is not None and (not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE):
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    cursor = params.get('cursor')
+    if cursor is not None:
+        if not isinstance(cursor, str):
+            raise ValueError('Invalid cursor')
+        return decode_cursor(cursor), limit
+    offset = params.get('offset', 0)
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError('offset must be a non-negative integer')
+    return offset, limit
+
+def requires(method):
+    """Answer 501 from a view when the catalog backend lacks ``method``."""
+    def decorator(view):
+        @wraps(view)
+        def checked(*args, **kwargs):
+            if not hasattr(catalog.state.db, method):
+                return jsonify({'error': 'Not supported by the SQLite catalog backend'}), 501
+            return view(*args, **kwargs)
+        return checked
+    return decorator
+
+catalog.register_artifact('payloads', CocktailPayloads)
+CATALOG_LOAD_SECONDS.observe(catalog.state.load_seconds)
+catalog.on_reload(lambda state: CATALOG_LOAD_SECONDS.observe(state.load_seconds))
+catalog.on_reload(lambda state: result_cache.clear())
+
+def collect_catalog_generation():
+    return [('cocktaildb_catalog_generation', {}, catalog.state.generation)]
+
+def collect_catalog_drinks():
+    return [('cocktaildb_catalog_drinks', {}, len(catalog.state.db))]
+
+def collect_cache_requests():
+    samples = []
+    state = catalog.state
+    details = getattr(state.db, 'details', None)
+    if details is not None:
+        info = details.load.cache_info()
+        samples.append(('cocktaildb_cache_requests_total', {'cache': 'details', 'result': 'hit'}, info.hits))
+        samples.append(('cocktaildb_cache_requests_total', {'cache': 'details', 'result': 'miss'}, info.misses))
+    payloads = state.artifacts['payloads']
+    for name, encoded in (('payloads', payloads.full), ('summary_payloads', payloads.summary)):
+        if isinstance(encoded, OnDemandPayloads):
+            info = encoded.encode.cache_info()
+            samples.append(('cocktaildb_cache_requests_total', {'cache': name, 'result': 'hit'}, info.hits))
+            samples.append(('cocktaildb_cache_requests_total', {'cache': name, 'result': 'miss'}, info.misses))
+    tiers = [('results', result_cache)]
+    if result_cache.shared is not None:
+        tiers.append(('shared_results', result_cache.shared))
+    for name, cache in tiers:
+        samples.append(('cocktaildb_cache_requests_total', {'cache': name, 'result': 'hit'}, cache.hits))
+        samples.append(('cocktaildb_cache_requests_total', {'cache': name, 'result': 'miss'}, cache.misses))
+    return samples
+
+metrics.collector('cocktaildb_catalog_generation', 'gauge', 'Generation number of the loaded catalog.',
+                  collect_catalog_generation)
+metrics.collector('cocktaildb_catalog_drinks', 'gauge', 'Drinks in the loaded catalog.', collect_catalog_drinks)
+metrics.collector('cocktaildb_cache_requests_total', 'counter', 'Cache lookups by cache and result (hit or miss).',
+                  collect_cache_requests)
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    g.profile = profiler.start() if profiler is not None else None
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    REQUEST_SECONDS.observe(time.perf_counter() - g.started, endpoint=endpoint)
+    return response
+
+@app.teardown_request
+def finish_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.finish(profile, f'{request.method} {request.path}', time.perf_counter() - g.started)
+
+@app.errorhandler(Exception)
+def handle_exception(e):
+    if isinstance(e, HTTPException):
+        return e
+    ERRORS.inc(endpoint=request.endpoint or 'unmatched')
+    app.logger.exception('Unhandled error in %s %s', request.method, request.path)
+    return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/')
 def index():
@@ -15,48 +312,263 @@ def index():
 def search():
     search_type = request.json.get('type')
     query = request.json.get('query', '').strip()
+    fields = request.json.get('fields', 'full')
+    stream = bool(request.json.get('stream', False))
+    language = request.json.get('language', 'en')
+    fuzzy = bool(request.json.get('fuzzy', False))
+    max_distance = request.json.get('max_distance', MAX_FUZZY_DISTANCE)
     
     if not query:
         return jsonify({'error': 'Search query cannot be empty'}), 400
-    
+    if fields not in ('full', 'summary'):
+        return jsonify({'error': 'fields must be "full" or "summary"'}), 400
+    if search_type not in SEARCH_TYPES:
+        return jsonify({'error': 'Invalid search type'}), 400
+    if fuzzy and search_type not in ('name', 'ingredient'):
+        return jsonify({'error': 'Fuzzy search supports name and ingredient searches'}), 400
+    if fuzzy and not hasattr(catalog.state.db, 'search_fuzzy'):
+        return jsonify({'error': 'Not supported by the SQLite catalog backend'}), 501
+    if search_type == 'text' and (not isinstance(language, str) or language not in LANGUAGE_FIELDS):
+        return jsonify({'error': f"language must be one of {', '.join(LANGUAGE_FIELDS)}"}), 400
+    # max_distance only means something to a fuzzy search.
+    if fuzzy and (not isinstance(max_distance, int) or isinstance(max_distance, bool)
+                  or not 0 <= max_distance <= MAX_FUZZY_DISTANCE):
+        return jsonify({'error': f'max_distance must be between 0 and {MAX_FUZZY_DISTANCE}'}), 400
     try:
-        if search_type == 'name':
+        offset, limit = parse_page(request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    metric_type = f'fuzzy_{search_type}' if fuzzy else search_type
+    started = g.started
+    # Deltas wait until this request has joined its results with the payloads.
+    with catalog.reading() as state:
+        db, payloads = state.db, state.artifacts['payloads']
+        if not stream:
+            # Searches ignore case, so queries differing only in case share an entry
+            cache_key = json.dumps(['search', search_type, query.lower(), fuzzy, max_distance if fuzzy else None,
+                                    language if search_type == 'text' else None, fields, offset, limit])
+            etag = etag_for(state.digest, cache_key)
+            if request.if_none_match.contains_weak(etag):
+                return not_modified(etag)
+            body = result_cache.get(state.digest, cache_key)
+            if body is not None:
+                SEARCH_SECONDS.observe(time.perf_counter() - started, type=metric_type, phase='total')
+                return cached_response(body, etag)
+        search_started = time.perf_counter()
+        if fuzzy:
+            results = db.search_fuzzy(query, search_type, max_distance)
+        elif search_type == 'name':
             results = db.search_by_name(query)
         elif search_type == 'ingredient':
             results = db.search_by_ingredient(query)
         elif search_type == 'category':
             results = db.search_by_category(query)
         else:
-            return jsonify({'error': 'Invalid search type'}), 400
-            
-        # Convert results to a list of dicts for JSON serialization
-        cocktails = []
-        for cocktail in results:
-            # Get ingredients and measures
-            ingredients = []
-            for i in range(1, 16):
-                ingredient = cocktail.get(f'strIngredient{i}')
-                if ingredient:
-                    measure = cocktail.get(f'strMeasure{i}', '').strip()
-                    ingredients.append({
-                        'ingredient': ingredient,
-                        'measure': measure
-                    })
-            
-            cocktails.append({
-                'name': cocktail.get('strDrink', 'Unnamed Cocktail'),
-                'category': cocktail.get('strCategory', 'N/A'),
-                'glass': cocktail.get('strGlass', 'N/A'),
-                'alcoholic': cocktail.get('strAlcoholic', 'N/A'),
-                'instructions': cocktail.get('strInstructions', 'No instructions available'),
-                'image': cocktail.get('strDrinkThumb', ''),
-                'ingredients': ingredients
-            })
-            
-        return jsonify({'results': cocktails})
+            # Only rank as many hits as this page needs
+            results = db.search_by_text(query, language, None if limit is None else offset + limit)
+        
+        total = db.count_by_text(query, language) if search_type == 'text' else len(results)
+        end = total if limit is None else min(offset + limit, total)
+        page = results[offset:end]
+        next_cursor = encode_cursor(end) if end < total else None
+        encoded = payloads.summary if fields == 'summary' else payloads.full
+        searched = time.perf_counter()
+        SEARCH_SECONDS.observe(searched - search_started, type=metric_type, phase='search')
+        SEARCH_RESULTS.observe(total, type=metric_type)
+        # Look the fragments up now; a stream is sent after the lock is released.
+        fragments = [encoded[cocktail.id] for cocktail in page]
+    
+    def record_serialization():
+        finished = time.perf_counter()
+        SEARCH_SECONDS.observe(finished - searched, type=metric_type, phase='serialize')
+        SEARCH_SECONDS.observe(finished - started, type=metric_type, phase='total')
+    
+    if stream:
+        def generate():
+            for fragment in fragments:
+                yield fragment + b'\n'
+            record_serialization()
+        headers = {'X-Total-Count': str(total)}
+        if next_cursor:
+            headers['X-Next-Cursor'] = next_cursor
+        return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+    
+    body = payloads.results_body(fragments, total=total, next_cursor=next_cursor)
+    record_serialization()
+    result_cache.put(state.digest, cache_key, body)
+    return cached_response(body, etag)
+
+@app.route('/query', methods=['POST'])
+@requires('query')
+def structured_query():
+    spec = request.json.get('filter', {})
+    fields = request.json.get('fields', 'full')
+    facet_limit = request.json.get('facet_limit')
+    
+    if fields not in ('full', 'summary'):
+        return jsonify({'error': 'fields must be "full" or "summary"'}), 400
+    if facet_limit is not None and (not isinstance(facet_limit, int) or facet_limit < 1):
+        return jsonify({'error': 'facet_limit must be a positive integer'}), 400
+    try:
+        offset, limit = parse_page(request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with catalog.reading() as state:
+        db, payloads = state.db, state.artifacts['payloads']
+        cache_key = json.dumps(['query', spec, fields, facet_limit, offset, limit], sort_keys=True)
+        etag = etag_for(state.digest, cache_key)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        body = result_cache.get(state.digest, cache_key)
+        if body is not None:
+            return cached_response(body, etag)
+        try:
+            results, facets = db.query(spec, facet_limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        total = len(results)
+        end = total if limit is None else min(offset + limit, total)
+        next_cursor = encode_cursor(end) if end < total else None
+        encoded = payloads.summary if fields == 'summary' else payloads.full
+        fragments = [encoded[cocktail.id] for cocktail in results[offset:end]]
+    body = payloads.results_body(fragments, total=total, next_cursor=next_cursor, facets=facets)
+    result_cache.put(state.digest, cache_key, body)
+    return cached_response(body, etag)
+
+@app.route('/measures', methods=['POST'])
+@requires('search_by_measure')
+def measure_range():
+    metric = request.json.get('metric')
+    minimum = request.json.get('min')
+    maximum = request.json.get('max')
+    order = request.json.get('order', 'asc')
+    exact = bool(request.json.get('exact', False))
+    fields = request.json.get('fields', 'summary')
+    
+    if metric not in METRICS:
+        return jsonify({'error': f"metric must be one of {', '.join(METRICS)}"}), 400
+    if not all(bound is None or (isinstance(bound, (int, float)) and not isinstance(bound, bool))
+               for bound in (minimum, maximum)):
+        return jsonify({'error': 'min and max must be numbers'}), 400
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order must be "asc" or "desc"'}), 400
+    if fields not in ('full', 'summary'):
+        return jsonify({'error': 'fields must be "full" or "summary"'}), 400
+    try:
+        offset, limit = parse_page(request.json)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with catalog.reading() as state:
+        db, payloads = state.db, state.artifacts['payloads']
+        cache_key = json.dumps(['measures', metric, minimum, maximum, order, exact, fields, offset, limit])
+        etag = etag_for(state.digest, cache_key)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        body = result_cache.get(state.digest, cache_key)
+        if body is not None:
+            return cached_response(body, etag)
+        # Only order as many drinks as this page needs
+        results = db.search_by_measure(metric, minimum, maximum, order == 'desc',
+                                       None if limit is None else offset + limit, exact)
+        total = db.count_by_measure(metric, minimum, maximum, exact)
+        end = total if limit is None else min(offset + limit, total)
+        next_cursor = encode_cursor(end) if end < total else None
+        encoded = payloads.summary if fields == 'summary' else payloads.full
+        fragments = [encoded[cocktail.id] for cocktail in results[offset:end]]
+    body = payloads.results_body(fragments, total=total, next_cursor=next_cursor)
+    result_cache.put(state.digest, cache_key, body)
+    return cached_response(body, etag)
+
+@app.route('/cocktail/<drink_id>/measures')
+@requires('measures')
+def cocktail_measures(drink_id):
+    with catalog.reading() as state:
+        cocktail = state.db.get_cocktail_by_id(drink_id)
+        if cocktail is None:
+            return jsonify({'error': 'Cocktail not found'}), 404
+        drink = state.db.measures(drink_id)
+    ingredients = [
+        {'ingredient': ingredient, 'measure': measure.strip() if measure else None, **parsed._asdict()}
+        for (ingredient, measure), parsed in zip(cocktail.ingredients, drink.measures)
+    ]
+    return jsonify({
+        'id': drink_id,
+        'ingredients': ingredients,
+        'total_ml': drink.total_ml,
+        'spirit_ml': drink.spirit_ml,
+        'spirit_share': drink.spirit_share,
+        'ingredient_count': drink.ingredient_count,
+        'confidence': drink.confidence,
+    })
+
+@app.route('/similar/<drink_id>')
+@requires('similar')
+def similar(drink_id):
+    k = request.args.get('k', 5, type=int)
+    fields = request.args.get('fields', 'summary')
+    if not 1 <= k <= MAX_NEIGHBORS:
+        return jsonify({'error': f'k must be between 1 and {MAX_NEIGHBORS}'}), 400
+    if fields not in ('full', 'summary'):
+        return jsonify({'error': 'fields must be "full" or "summary"'}), 400
+    
+    with catalog.reading() as state:
+        db, payloads = state.db, state.artifacts['payloads']
+        if db.get_cocktail_by_id(drink_id) is None:
+            return jsonify({'error': 'Cocktail not found'}), 404
+        encoded = payloads.summary if fields == 'summary' else payloads.full
+        fragments = [encoded[cocktail.id] for cocktail in db.similar(drink_id, k)]
+    return json_response(payloads.results_body(fragments))
+
+@app.route('/suggest')
+@requires('suggest')
+def suggest():
+    prefix = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return jsonify({'error': f'limit must be between 1 and {MAX_SUGGESTIONS}'}), 400
+    suggestions = [
+        {'text': text, 'type': kind, 'count': count}
+        for text, kind, count in catalog.state.db.suggest(prefix, limit)
+    ]
+    return jsonify({'suggestions': suggestions})
+
+@app.route('/cocktail/<drink_id>')
+def cocktail_detail(drink_id):
+    body = catalog.state.artifacts['payloads'].full.get(drink_id)
+    if body is None:
+        return jsonify({'error': 'Cocktail not found'}), 404
+    return json_response(body)
+
+@app.route('/pantry', methods=['POST'])
+@requires('search_by_pantry')
+def pantry():
+    ingredients = request.json.get('ingredients', [])
+    max_missing = request.json.get('max_missing', 0)
+    
+    if not isinstance(ingredients, list) or not all(isinstance(i, str) for i in ingredients):
+        return jsonify({'error': 'Ingredients must be a list of names'}), 400
+    if not ingredients:
+        return jsonify({'error': 'Ingredient list cannot be empty'}), 400
+    if not isinstance(max_missing, int) or not 0 <= max_missing <= MAX_PANTRY_MISSING:
+        return jsonify({'error': f'max_missing must be between 0 and {MAX_PANTRY_MISSING}'}), 400
+    
+    with catalog.reading() as state:
+        db, payloads = state.db, state.artifacts['payloads']
+        results = db.search_by_pantry(ingredients, max_missing)
+        # Splice the missing list into each prebuilt object before its closing brace
+        fragments = [
+            payloads.full[cocktail.id][:-1] + b',"missing":' + encode_json(missing) + b'}'
+            for cocktail, missing in results
+        ]
+    return json_response(payloads.results_body(fragments))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -1,9 +1,8 @@
 import streamlit as st
 import json
-from cocktail_search import CocktailDB
-from PIL import Image
-import requests
-from io import BytesIO
+from cocktail_pages import cached_search, lookup, page_of
+from cocktail_shared import get_shared_db
+from cocktail_thumbs import ThumbnailService
 
 # Set page config
 st.set_page_config(
@@ -13,8 +12,21 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize the database
-db = CocktailDB('cocktaildb_dump.json')
+@st.cache_resource
+def get_catalog():
+    """Load the database once per Streamlit server process; it reloads itself when the dump changes."""
+    return get_shared_db('cocktaildb_dump.json')
+
+# Current database generation, read once per rerun
+state = get_catalog().state
+db = state.db
+
+@st.cache_resource
+def get_thumbnail_service():
+    """One thumbnail fetcher and cache per Streamlit server process."""
+    return ThumbnailService()
+
+thumbs = get_thumbnail_service()
 
 # Custom CSS for better styling
 st.markdown("""
@@ -59,22 +71,29 @@ with st.sidebar:
     
     search_button = st.button("Search")
 
+# The last submitted search stays on screen while its pages are browsed
+if search_button and search_query:
+    st.session_state.search = (search_type, search_query)
+search = st.session_state.get('search')
+
 # Main content
 st.title("🍹 Cocktail Search")
 
-if search_button and search_query:
+if search:
+    search_type, search_query = search
     with st.spinner(f'Searching for cocktails with {search_type.lower()}: {search_query}...'):
-        if search_type == "Name":
-            results = db.search_by_name(search_query)
-        elif search_type == "Ingredient":
-            results = db.search_by_ingredient(search_query)
-        else:  # Category
-            results = db.search_by_category(search_query)
+        result_ids = cached_search(state, search_type, search_query)
             
-        if not results:
+        if not result_ids:
             st.warning(f"No cocktails found matching your search: {search_query}")
         else:
-            st.success(f"Found {len(results)} cocktail{'s' if len(results) > 1 else ''}:")
+            st.success(f"Found {len(result_ids)} cocktail{'s' if len(result_ids) > 1 else ''}:")
+            
+            # Only the current page of results is looked up and rendered
+            results = lookup(db, page_of(result_ids, search))
+            
+            # Fetch every thumbnail on the page in parallel before rendering
+            images = thumbs.prefetch(cocktail.get('strDrinkThumb') for cocktail in results)
             
             # Display results in a grid
             cols = st.columns(3)
@@ -84,14 +103,7 @@ if search_button and search_query:
                         st.markdown(f"### {cocktail.get('strDrink', 'Unnamed Cocktail')}")
                         
                         # Display image if available
-                        if cocktail.get('strDrinkThumb'):
-                            try:
-                                response = requests.get(cocktail['strDrinkThumb'])
-                                img = Image.open(BytesIO(response.content))
-                                st.image(img, use_container_width=True)
-                            except:
-                                st.image("https://via.placeholder.com/300x200?text=No+Image", 
-                                       use_container_width=True)
+                        st.image(images[cocktail.get('strDrinkThumb')], use_container_width=True)
                         
                         # Basic info
                         st.caption(f"**Category:** {cocktail.get('strCategory', 'N/A')}")
@@ -116,7 +128,7 @@ if search_button and search_query:
                         st.markdown("---")
 
 # Show instructions if no search has been performed
-elif not search_button:
+else:
     st.markdown("""
     ### Welcome to Cocktail Search! 🍸
     
@@ -130,20 +142,14 @@ elif not search_button:
     
     # Display some featured cocktails
     st.markdown("### Featured Cocktails")
-    featured = db.search_by_name("", case_sensitive=False)[:6]  # Get first 6 cocktails
+    featured = db.featured(6)
     
     if featured:
+        images = thumbs.prefetch(cocktail.get('strDrinkThumb') for cocktail in featured)
         cols = st.columns(3)
         for i, cocktail in enumerate(featured):
             with cols[i % 3]:
                 st.markdown(f"**{cocktail.get('strDrink', 'Unnamed Cocktail')}**")
-                if cocktail.get('strDrinkThumb'):
-                    try:
-                        response = requests.get(cocktail['strDrinkThumb'])
-                        img = Image.open(BytesIO(response.content))
-                        st.image(img, use_container_width=True)
-                    except:
-                        st.image("https://via.placeholder.com/300x200?text=No+Image", 
-                               use_container_width=True)
+                st.image(images[cocktail.get('strDrinkThumb')], use_container_width=True)
                 st.markdown(f"*{cocktail.get('strCategory', 'Cocktail')}*")
                 st.markdown("---")
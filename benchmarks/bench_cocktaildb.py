@@ -0,0 +1,328 @@
+"""Benchmark CocktailDB and the Flask /search endpoint on scaled catalogs.
+
+Synthetic catalogs are generated from ``cocktaildb_dump.json`` at several
+multiples of its size by perturbing drink names, swapping ingredients and
+rescaling measures, with a fixed seed so runs are reproducible. Each scale
+is measured in a fresh subprocess so load time and peak RSS are not skewed
+by earlier scales:
+
+* catalog load time (JSON, and optionally the binary snapshot),
+* latency percentiles and throughput of each ``search_*`` method,
+* the same for ``POST /search`` through Flask's test client, with the
+  app's result cache disabled, and again as cache hits (``[cached]``),
+* with ``--shards N``, the sharded searches through a ``ShardedCocktailDB``,
+* resident memory per phase: after the catalog loads, the peak while the
+  searches run, and what the app's own copy of the catalog adds.
+
+Usage, from the repository root:
+
+    python benchmarks/bench_cocktaildb.py --scales 1 10 100
+    python benchmarks/bench_cocktaildb.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_cocktaildb.py --baseline benchmarks/baseline.json
+
+With ``--baseline`` the run exits non-zero when any p50/p95 latency is
+more than ``--tolerance`` slower than the stored numbers.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_DUMP = os.path.join(ROOT, 'cocktaildb_dump.json')
+DEFAULT_SCALES = (1, 10, 100, 1000)
+
+# Words appended to names in generated copies of a drink.
+NAME_VARIANTS = (
+    'Royale', 'Spritz', 'Deluxe', 'Smash', 'Fizz', 'Twist', 'Frozen', 'Spiced',
+    'Tropical', 'Midnight', 'Sunrise', 'Velvet', 'Golden', 'Smoky', 'Wild', 'Old',
+)
+
+# Queries timed for every method, covering selective and broad matches.
+QUERIES = {
+    'search_by_name': ['margarita', 'gin fizz', 'ma', 'a', 'zzzz'],
+    'search_by_ingredient': ['gin', 'lemon', 'vodka', 'a', 'zzzz'],
+    'search_by_category': ['cocktail', 'shot', 'ordinary drink', 'zzzz'],
+    'search_fuzzy': ['margerita', 'tequilla', 'moijto', 'cosmopolitn'],
+    'search_by_text': ['shaken with egg white', 'stir', 'pour over ice', 'blend'],
+    'search_by_pantry': [
+        ['Vodka', 'Gin', 'Lime juice', 'Triple sec', 'Tequila', 'Sugar', 'Lemon juice', 'Ice',
+         'Light rum', 'Soda water', 'Mint', 'Angostura bitters', 'Grenadine', 'Orange juice',
+         'Cranberry juice', 'Coca-Cola', 'Sweet Vermouth', 'Dry Vermouth', 'Lime', 'Cream'],
+    ],
+}
+
+# Methods ``ShardedCocktailDB`` runs across its shards.
+SHARDED_METHODS = ('search_by_name', 'search_by_ingredient', 'search_by_category', 'search_fuzzy',
+                   'search_by_text')
+
+SEARCH_REQUESTS = [
+    {'type': 'name', 'query': 'margarita'},
+    {'type': 'ingredient', 'query': 'gin'},
+    {'type': 'ingredient', 'query': 'a', 'limit': 24, 'fields': 'summary'},
+    {'type': 'ingredient', 'query': 'a'},
+    {'type': 'category', 'query': 'cocktail', 'limit': 24},
+    {'type': 'name', 'query': 'margerita', 'fuzzy': True},
+    {'type': 'text', 'query': 'shaken with egg white', 'limit': 24},
+]
+
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _perturb_name(name: str, rng: random.Random) -> str:
+    name = f'{name} {rng.choice(NAME_VARIANTS)}'
+    if len(name) > 4 and rng.random() < 0.3:
+        i = rng.randrange(1, len(name) - 2)
+        name = name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return name
+
+
+def _perturb_measure(measure: Optional[str], rng: random.Random) -> Optional[str]:
+    if not measure:
+        return measure
+    factor = rng.choice((0.5, 1, 1.5, 2))
+    return _NUMBER.sub(lambda m: f'{float(m.group()) * factor:g}', measure)
+
+
+def generate_catalog(source: str, scale: int, destination: str, seed: int = 0) -> None:
+    """Write a catalog ``scale`` times the size of ``source`` to ``destination``.
+
+    The first copy is the original catalog; later copies get new ids,
+    perturbed names and measures, and occasionally a swapped ingredient.
+    """
+    with open(source, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    rng = random.Random(seed)
+    vocabulary = sorted({
+        drink[f'strIngredient{i}'] for drink in base for i in range(1, 16) if drink.get(f'strIngredient{i}')
+    })
+    with open(destination, 'w', encoding='utf-8') as out:
+        out.write('[\n')
+        first = True
+        for copy in range(scale):
+            for drink in base:
+                if copy:
+                    drink = dict(drink)
+                    drink['idDrink'] = f"{drink['idDrink']}-{copy}"
+                    drink['strDrink'] = _perturb_name(drink['strDrink'], rng)
+                    for i in range(1, 16):
+                        if drink.get(f'strIngredient{i}') and rng.random() < 0.15:
+                            drink[f'strIngredient{i}'] = rng.choice(vocabulary)
+                        drink[f'strMeasure{i}'] = _perturb_measure(drink.get(f'strMeasure{i}'), rng)
+                out.write('' if first else ',\n')
+                out.write(json.dumps(drink, ensure_ascii=False))
+                first = False
+        out.write('\n]\n')
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(call: Callable[[], Any], min_runs: int, max_seconds: float) -> Dict[str, float]:
+    """Time ``call`` repeatedly; the first (warm-up) call is reported separately."""
+    started = time.perf_counter()
+    call()
+    first = time.perf_counter() - started
+
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    while len(samples) < min_runs or (time.perf_counter() < deadline and len(samples) < 100 * min_runs):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+        if time.perf_counter() > deadline and len(samples) >= 3:
+            break
+    total = sum(samples)
+    return {
+        'first_ms': first * 1e3,
+        'p50_ms': _percentile(samples, 0.50) * 1e3,
+        'p95_ms': _percentile(samples, 0.95) * 1e3,
+        'p99_ms': _percentile(samples, 0.99) * 1e3,
+        'throughput_per_s': len(samples) / total if total else float('inf'),
+        'runs': len(samples),
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident memory, or None where ``/proc`` is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * resource.getpagesize() / (1 << 20)
+
+
+def run_scale(catalog: str, min_runs: int, max_seconds: float, snapshot: bool, shards: int = 0) -> Dict[str, Any]:
+    """Benchmark one catalog file in this process and return the results."""
+    from cocktail_search import CocktailDB
+
+    results: Dict[str, Any] = {}
+    started = time.perf_counter()
+    db = CocktailDB(catalog, use_snapshot=False)
+    results['load_json'] = {'seconds': time.perf_counter() - started, 'drinks': len(db.cocktails)}
+    results['rss_after_load_mb'] = _rss_mb()
+
+    if snapshot:
+        from cocktail_snapshot import build_snapshot
+
+        snapshot_file = build_snapshot(catalog, os.path.join(os.path.dirname(catalog), 'bench.snapshot'))
+        started = time.perf_counter()
+        CocktailDB(catalog, snapshot_file=snapshot_file)
+        results['load_snapshot'] = {'seconds': time.perf_counter() - started}
+
+    for method, queries in QUERIES.items():
+        search = getattr(db, method)
+        for query in queries:
+            label = f'{method}({query!r})' if isinstance(query, str) else f'{method}({len(query)} items)'
+            results[label] = measure(lambda: search(query), min_runs, max_seconds)
+
+    if shards:
+        from cocktail_shards import ShardedCocktailDB
+
+        with ShardedCocktailDB(db, shards) as sharded:
+            for method in SHARDED_METHODS:
+                search = getattr(sharded, method)
+                for query in QUERIES[method]:
+                    results[f'{method}({query!r}) [{shards} shards]'] = measure(
+                        lambda: search(query), min_runs, max_seconds)
+
+    # Taken before the app loads a second copy of the catalog.
+    results['peak_rss_mb'] = _peak_rss_mb()
+    rss_before_app = _rss_mb()
+
+    os.environ['COCKTAILDB_JSON'] = catalog
+    # Every timed request after the first would otherwise be a cache hit.
+    os.environ['COCKTAILDB_RESULT_CACHE_SIZE'] = '0'
+    import app as flask_app
+    results['app_rss_mb'] = None if rss_before_app is None else _rss_mb() - rss_before_app
+    from cocktail_cache import ResultCache
+
+    client = flask_app.app.test_client()
+
+    def request(body):
+        response = client.post('/search', json=body)
+        assert response.status_code == 200, response.data
+        return response.data
+
+    for body in SEARCH_REQUESTS:
+        results['POST /search ' + json.dumps(body, sort_keys=True)] = measure(
+            lambda: request(body), min_runs, max_seconds)
+    flask_app.result_cache = ResultCache()
+    for body in SEARCH_REQUESTS:
+        results['POST /search [cached] ' + json.dumps(body, sort_keys=True)] = measure(
+            lambda: request(body), min_runs, max_seconds)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a description of every p50/p95 latency that regressed beyond ``tolerance``."""
+    regressions = []
+    for scale, operations in results.items():
+        for label, numbers in operations.items():
+            previous = baseline.get(scale, {}).get(label)
+            if not isinstance(numbers, dict) or not isinstance(previous, dict):
+                continue
+            for key in ('p50_ms', 'p95_ms', 'seconds'):
+                if key in numbers and key in previous and numbers[key] > previous[key] * (1 + tolerance):
+                    regressions.append(f'{scale}x {label} {key}: {previous[key]:.3f} -> {numbers[key]:.3f}')
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    """Print each operation's p50/p95/p99 across scales, giving the scaling curve."""
+    scales = list(results)
+    labels = []
+    for operations in results.values():
+        labels.extend(label for label in operations if label not in labels)
+    print(f"{'operation':<70}" + ''.join(f'{scale + "x":>26}' for scale in scales))
+    for label in labels:
+        cells = []
+        for scale in scales:
+            numbers = results[scale].get(label)
+            if numbers is None:
+                cells.append('-')
+            elif isinstance(numbers, (int, float)):
+                cells.append(f'{numbers:.1f}')
+            elif 'seconds' in numbers:
+                cells.append(f"{numbers['seconds'] * 1e3:.1f} ms")
+            else:
+                cells.append(f"{numbers['p50_ms']:.3f}/{numbers['p95_ms']:.3f}/{numbers['p99_ms']:.3f}")
+        print(f'{label[:70]:<70}' + ''.join(f'{cell:>26}' for cell in cells))
+    print('(latencies are p50/p95/p99 in ms)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dump', default=DEFAULT_DUMP, help='catalog to scale up')
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES))
+    parser.add_argument('--min-runs', type=int, default=20, help='minimum timed runs per operation')
+    parser.add_argument('--max-seconds', type=float, default=1.0, help='time budget per operation')
+    parser.add_argument('--snapshot', action='store_true', help='also build and time the binary snapshot')
+    parser.add_argument('--shards', type=int, default=0, help='also time the searches across this many shards')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare against results saved with --save-baseline')
+    parser.add_argument('--save-baseline', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown versus the baseline')
+    parser.add_argument('--run-scale', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        json.dump(run_scale(args.run_scale, args.min_runs, args.max_seconds, args.snapshot, args.shards), sys.stdout)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='cocktail-bench-') as workdir:
+        for scale in args.scales:
+            scale_dir = os.path.join(workdir, str(scale))
+            os.makedirs(scale_dir)
+            catalog = os.path.join(scale_dir, 'catalog.json')
+            print(f'Generating {scale}x catalog...', file=sys.stderr)
+            generate_catalog(args.dump, scale, catalog, args.seed)
+            print(f'Benchmarking {scale}x catalog...', file=sys.stderr)
+            command = [sys.executable, os.path.abspath(__file__), '--run-scale', catalog,
+                       '--min-runs', str(args.min_runs), '--max-seconds', str(args.max_seconds)]
+            if args.snapshot:
+                command.append('--snapshot')
+            if args.shards:
+                command.extend(['--shards', str(args.shards)])
+            output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=ROOT).stdout
+            results[str(scale)] = json.loads(output)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,7 @@
 import streamlit as st
-import json
-from PIL import Image
-import requests
-from io import BytesIO
+from cocktail_pages import cached_search, lookup, page_of
+from cocktail_shared import get_shared_db
+from cocktail_thumbs import ThumbnailService
 
 # Set page config
 st.set_page_config(
@@ -41,55 +40,21 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class CocktailDB:
-    def __init__(self, json_file):
-        """Initialize the database with the given JSON file."""
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.cocktails = json.load(f)
-    
-    def search_by_name(self, name, case_sensitive=False):
-        """Search for cocktails by name."""
-        name = name if case_sensitive else name.lower()
-        return [
-            cocktail for cocktail in self.cocktails
-            if name in (cocktail['strDrink'].lower() if not case_sensitive else cocktail['strDrink'])
-        ]
-    
-    def search_by_ingredient(self, ingredient, case_sensitive=False):
-        """Search for cocktails containing a specific ingredient."""
-        ingredient = ingredient if case_sensitive else ingredient.lower()
-        results = []
-        
-        for cocktail in self.cocktails:
-            for i in range(1, 16):
-                ingredient_key = f'strIngredient{i}'
-                if ingredient_key in cocktail and cocktail[ingredient_key]:
-                    cocktail_ingredient = cocktail[ingredient_key]
-                    if not case_sensitive:
-                        cocktail_ingredient = cocktail_ingredient.lower()
-                    if ingredient in cocktail_ingredient:
-                        results.append(cocktail)
-                        break
-        return results
-    
-    def search_by_category(self, category, case_sensitive=False):
-        """Search for cocktails by category."""
-        category = category if case_sensitive else category.lower()
-        return [
-            cocktail for cocktail in self.cocktails
-            if cocktail.get('strCategory') and 
-            (category in (cocktail['strCategory'].lower() if not case_sensitive else cocktail['strCategory']))
-        ]
-    
-    def get_cocktail_by_id(self, drink_id):
-        """Get a cocktail by its ID."""
-        for cocktail in self.cocktails:
-            if cocktail.get('idDrink') == drink_id:
-                return cocktail
-        return None
+@st.cache_resource
+def get_catalog():
+    """Load the database once per Streamlit server process; it reloads itself when the dump changes."""
+    return get_shared_db('cocktaildb_dump.json')
+
+# Current database generation, read once per rerun
+state = get_catalog().state
+db = state.db
 
-# Initialize the database
-db = CocktailDB('cocktaildb_dump.json')
+@st.cache_resource
+def get_thumbnail_service():
+    """One thumbnail fetcher and cache per Streamlit server process."""
+    return ThumbnailService()
+
+thumbs = get_thumbnail_service()
 
 # Session state to track the current view
 if 'view' not in st.session_state:
@@ -112,17 +77,8 @@ def display_cocktail_detail(cocktail):
     
     with col1:
         # Display cocktail image
-        if cocktail.get('strDrinkThumb'):
-            try:
-                response = requests.get(cocktail['strDrinkThumb'])
-                img = Image.open(BytesIO(response.content))
-                st.image(img, use_container_width=True, caption=cocktail.get('strDrink', ''))
-            except:
-                st.image("https://via.placeholder.com/400x400?text=No+Image", 
-                        use_container_width=True)
-        else:
-            st.image("https://via.placeholder.com/400x400?text=No+Image", 
-                    use_container_width=True)
+        st.image(thumbs.get(cocktail.get('strDrinkThumb')), use_container_width=True,
+                 caption=cocktail.get('strDrink', ''))
     
     with col2:
         st.title(cocktail.get('strDrink', 'Unnamed Cocktail'))
@@ -179,15 +135,18 @@ def display_search():
     # Search button
     if st.button("Search") or search_query:
         if search_query.strip():
-            if search_type == "Name":
-                results = db.search_by_name(search_query)
-            else:
-                results = db.search_by_ingredient(search_query)
+            result_ids = cached_search(state, search_type, search_query)
             
-            if not results:
+            if not result_ids:
                 st.warning("No cocktails found matching your search.")
             else:
-                st.success(f"Found {len(results)} cocktail{'s' if len(results) > 1 else ''}:")
+                st.success(f"Found {len(result_ids)} cocktail{'s' if len(result_ids) > 1 else ''}:")
+                
+                # Only the current page of results is looked up and rendered
+                results = lookup(db, page_of(result_ids, (search_type, search_query.strip().lower())))
+                
+                # Fetch every thumbnail on the page in parallel before rendering
+                images = thumbs.prefetch(cocktail.get('strDrinkThumb') for cocktail in results)
                 
                 # Display results in a grid
                 cols = st.columns(3)
@@ -198,17 +157,7 @@ def display_search():
                             card = st.container()
                             with card:
                                 # Display cocktail image
-                                if cocktail.get('strDrinkThumb'):
-                                    try:
-                                        response = requests.get(cocktail['strDrinkThumb'])
-                                        img = Image.open(BytesIO(response.content))
-                                        st.image(img, use_container_width=True)
-                                    except:
-                                        st.image("https://via.placeholder.com/300x200?text=No+Image", 
-                                               use_container_width=True)
-                                else:
-                                    st.image("https://via.placeholder.com/300x200?text=No+Image", 
-                                           use_container_width=True)
+                                st.image(images[cocktail.get('strDrinkThumb')], use_container_width=True)
                                 
                                 # Cocktail name and category
                                 st.write(f"**{cocktail.get('strDrink', 'Unnamed Cocktail')}**")
@@ -225,22 +174,16 @@ def display_search():
     else:
         # Show featured cocktails if no search
         st.markdown("### 🎉 Featured Cocktails")
-        featured = db.search_by_name("", case_sensitive=False)[:6]
+        featured = db.featured(6)
         
         if featured:
+            images = thumbs.prefetch(cocktail.get('strDrinkThumb') for cocktail in featured)
             cols = st.columns(3)
             for i, cocktail in enumerate(featured):
                 with cols[i % 3]:
                     with st.container():
                         # Display cocktail image
-                        if cocktail.get('strDrinkThumb'):
-                            try:
-                                response = requests.get(cocktail['strDrinkThumb'])
-                                img = Image.open(BytesIO(response.content))
-                                st.image(img, use_container_width=True)
-                            except:
-                                st.image("https://via.placeholder.com/300x200?text=No+Image", 
-                                       use_container_width=True)
+                        st.image(images[cocktail.get('strDrinkThumb')], use_container_width=True)
                         
                         # Cocktail name and category
                         st.write(f"**{cocktail.get('strDrink', 'Unnamed Cocktail')}**")
@@ -0,0 +1,179 @@
+"""Batch query mode for the cocktail_search CLI.
+
+Reads one JSON query per line and writes one JSON result per line, in input
+order, for offline jobs that replay logged queries:
+
+    {"type": "name", "query": "margarita"}
+    {"type": "ingredient", "query": "gin", "limit": 10}
+    {"type": "name", "query": "margarta", "fuzzy": true}
+    {"type": "text", "query": "shake with ice", "language": "de"}
+
+Each output line echoes ``type`` and ``query`` and carries ``total`` and
+``results`` (drink ids, or full records with ``--fields full``). A query
+that cannot be answered gets an ``error`` instead, and the batch continues.
+
+The catalog is opened with ``open_store``, so an SQLite catalog works too
+(without fuzzy search). It is loaded, and every index built, once in the
+parent process.
+Worker processes are forked from it, so they share the loaded catalog
+copy-on-write instead of each loading their own. Queries are sent to them
+in chunks, and the input is read in bounded windows, so memory stays flat
+however long the input is.
+
+    python cocktail_search.py --batch queries.jsonl --workers 8 > results.jsonl
+"""
+import json
+import multiprocessing
+import os
+import sys
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from cocktail_fuzzy import MAX_DISTANCE
+from cocktail_search import CocktailDB
+from cocktail_store import CocktailStore, open_store
+from cocktail_text import LANGUAGE_FIELDS
+
+BATCH_TYPES = ('name', 'ingredient', 'category', 'text')
+
+# Queries sent to a worker per task.
+CHUNK_SIZE = 256
+
+# Chunks read ahead per worker; bounds how much input is held in memory.
+_WINDOW_CHUNKS = 8
+
+# The catalog a worker answers from, inherited from the parent on fork.
+_db: Optional[CocktailStore] = None
+_fields = 'ids'
+_default_limit: Optional[int] = None
+
+
+def _init_worker(json_file: str, fields: str, limit: Optional[int]) -> None:
+    global _db, _fields, _default_limit
+    if _db is None:
+        # Start methods other than fork do not inherit the parent's catalog.
+        _db = open_store(json_file)
+    _fields, _default_limit = fields, limit
+
+
+def run_query(db: CocktailStore, spec: Dict[str, Any], limit: Optional[int] = None) -> Tuple[int, List]:
+    """Answer one batch query, returning ``(total, cocktails)``.
+
+    Raises ValueError for a query the CLI cannot answer.
+    """
+    search_type = spec.get('type')
+    query = spec.get('query')
+    fuzzy = bool(spec.get('fuzzy', False))
+    language = spec.get('language', 'en')
+    max_distance = spec.get('max_distance', MAX_DISTANCE)
+    limit = spec.get('limit', limit)
+    if search_type not in BATCH_TYPES:
+        raise ValueError(f"type must be one of {', '.join(BATCH_TYPES)}")
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError('query must be a non-empty string')
+    if fuzzy and search_type not in ('name', 'ingredient'):
+        raise ValueError('Fuzzy search supports name and ingredient searches')
+    # A list or dict is unhashable, so check the type before the lookup.
+    if search_type == 'text' and (not isinstance(language, str) or language not in LANGUAGE_FIELDS):
+        raise ValueError(f"language must be one of {', '.join(LANGUAGE_FIELDS)}")
+    if fuzzy and not isinstance(db, CocktailDB):
+        raise ValueError('Fuzzy search needs a JSON catalog')
+    # bool is an int subclass, but ``"limit": true`` is not a number.
+    if not isinstance(max_distance, int) or isinstance(max_distance, bool) or not 0 <= max_distance <= MAX_DISTANCE:
+        raise ValueError(f'max_distance must be between 0 and {MAX_DISTANCE}')
+    if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+        raise ValueError('limit must be a non-negative integer')
+
+    query = query.strip()
+    if fuzzy:
+        results = db.search_fuzzy(query, search_type, max_distance)
+    elif search_type == 'name':
+        results = db.search_by_name(query)
+    elif search_type == 'ingredient':
+        results = db.search_by_ingredient(query)
+    elif search_type == 'category':
+        results = db.search_by_category(query)
+    else:
+        results = db.search_by_text(query, language, limit)
+        return db.count_by_text(query, language), results
+    return len(results), results if limit is None else results[:limit]
+
+
+def _answer(item: Tuple[int, str]) -> str:
+    """Answer one input line, returning its encoded output line."""
+    line_number, line = item
+    try:
+        spec = json.loads(line)
+        if not isinstance(spec, dict):
+            raise ValueError('expected a JSON object')
+        total, results = run_query(_db, spec, _default_limit)
+    except (ValueError, TypeError) as e:
+        # json.JSONDecodeError is a ValueError too; a TypeError from a
+        # malformed query fails only its own line.
+        return json.dumps({'line': line_number, 'error': str(e)}, ensure_ascii=False)
+    output = {'line': line_number, 'type': spec['type'], 'query': spec['query'], 'total': total}
+    if _fields == 'full':
+        output['results'] = [cocktail.to_dict() for cocktail in results]
+    else:
+        output['results'] = [cocktail.id for cocktail in results]
+    return json.dumps(output, ensure_ascii=False)
+
+
+def _numbered(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    for line_number, line in enumerate(lines, 1):
+        if line.strip():
+            yield line_number, line
+
+
+def run_batch(json_file: str, queries: TextIO, output: TextIO, workers: int = 1,
+              chunk_size: int = CHUNK_SIZE, fields: str = 'ids', limit: Optional[int] = None) -> int:
+    """Answer every query line from ``queries``, writing results to ``output``.
+
+    Returns the number of queries answered (including those with errors).
+    """
+    global _db
+    if fields not in ('ids', 'full'):
+        raise ValueError('fields must be "ids" or "full"')
+    _db = open_store(json_file)
+    if isinstance(_db, CocktailDB):
+        # Build the lazily built indexes once, before the workers fork.
+        _db.warm_up(neighbors=False)
+    _init_worker(json_file, fields, limit)
+    items = _numbered(queries)
+    answered = 0
+    if workers <= 1:
+        for item in items:
+            output.write(_answer(item) + '\n')
+            answered += 1
+        return answered
+
+    window = chunk_size * workers * _WINDOW_CHUNKS
+    # Forked workers share the loaded catalog, so fork is used even where
+    # it is not the default (macOS). Without it (Windows), each worker
+    # loads its own catalog in _init_worker.
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    with context.Pool(workers, _init_worker, (json_file, fields, limit)) as pool:
+        # Pool.imap queues its whole input up front, so feed it in windows.
+        while True:
+            batch = list(islice(items, window))
+            if not batch:
+                break
+            for line in pool.imap(_answer, batch, chunk_size):
+                output.write(line + '\n')
+            answered += len(batch)
+    return answered
+
+
+def main(args) -> None:
+    """Run ``cocktail_search.py --batch`` with its parsed arguments."""
+    queries = sys.stdin if args.batch == '-' else open(args.batch, 'r', encoding='utf-8')
+    try:
+        answered = run_batch(args.json_file, queries, sys.stdout, args.workers or os.cpu_count() or 1,
+                             args.chunk_size, args.fields, args.limit)
+    finally:
+        if queries is not sys.stdin:
+            queries.close()
+    print(f'Answered {answered} queries', file=sys.stderr)
@@ -0,0 +1,153 @@
+"""Response cache for hot queries.
+
+Encoded response bodies are cached under a normalized request key plus the
+content digest of the catalog they were computed from, so a reloaded (or
+replaced) dump can never be answered from stale entries. There are two
+tiers:
+
+* an in-process LRU bounded by entry count and total bytes, and
+* an optional SQLite file shared by every worker on the host, so a query
+  computed by one worker is a cheap lookup for the others.
+
+``etag_for`` derives a response's ETag from the same key and digest, so it
+is known, and ``If-None-Match`` can be answered, before any search runs.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Default bounds of the in-process tier.
+MAX_ENTRIES = 1024
+MAX_BYTES = 64 << 20
+
+# Default number of rows kept in the shared tier.
+SHARED_MAX_ENTRIES = 10000
+
+
+def etag_for(digest: str, key: str) -> str:
+    """Return the (unquoted) ETag of the response for ``key`` on catalog ``digest``."""
+    return hashlib.blake2b(f'{digest}\0{key}'.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class SharedResultCache:
+    """A size-bounded cache table in a SQLite file, usable from many processes.
+
+    Each process (and each fork of it) opens its own connection on first
+    use; writes that lose a lock race are skipped rather than retried.
+    """
+
+    def __init__(self, path: str, max_entries: int = SHARED_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=0.05, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS results '
+                '(digest TEXT, key TEXT, body BLOB, used REAL, PRIMARY KEY (digest, key))'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS results_used ON results (used)')
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, digest: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            try:
+                connection = self._connect()
+                row = connection.execute('SELECT body FROM results WHERE digest = ? AND key = ?',
+                                         (digest, key)).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+                connection.execute('UPDATE results SET used = ? WHERE digest = ? AND key = ?',
+                                   (time.time(), digest, key))
+                return row[0]
+            except sqlite3.Error:
+                logger.warning('Shared result cache lookup failed', exc_info=True)
+                return None
+
+    def put(self, digest: str, key: str, body: bytes) -> None:
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                                   (digest, key, body, time.time()))
+                # Entries for other catalogs are unreachable; evict them first.
+                connection.execute('DELETE FROM results WHERE digest != ?', (digest,))
+                connection.execute(
+                    'DELETE FROM results WHERE rowid IN '
+                    '(SELECT rowid FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,),
+                )
+            except sqlite3.Error:
+                logger.warning('Shared result cache store failed', exc_info=True)
+
+
+class ResultCache:
+    """An in-process LRU of response bodies, optionally backed by a shared tier."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES,
+                 shared: Optional[SharedResultCache] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[tuple, bytes]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, key: str) -> Optional[bytes]:
+        """Return the cached body for ``key`` on catalog ``digest``, or None."""
+        with self._lock:
+            body = self._entries.get((digest, key))
+            if body is not None:
+                self._entries.move_to_end((digest, key))
+                self.hits += 1
+                return body
+            self.misses += 1
+        if self.shared is not None:
+            body = self.shared.get(digest, key)
+            if body is not None:
+                self._store(digest, key, body)
+        return body
+
+    def put(self, digest: str, key: str, body: bytes) -> None:
+        self._store(digest, key, body)
+        if self.shared is not None:
+            self.shared.put(digest, key, body)
+
+    def _store(self, digest: str, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop((digest, key), None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[(digest, key)] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        """Drop every in-process entry (the shared tier is keyed by digest)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
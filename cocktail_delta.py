@@ -0,0 +1,208 @@
+"""Incremental catalog updates from JSONL delta files.
+
+A delta file holds one JSON object per line, applied in order:
+
+    {"op": "upsert", "drink": {"idDrink": "11007", "strDrink": "Margarita", ...}}
+    {"op": "delete", "idDrink": "11008"}
+
+A bare TheCocktailDB record on a line is an upsert as well. Delta files
+are read line by line, so their size is not limited by memory.
+
+For a JSON-dump catalog, deltas are spooled into ``<dump>.deltas/`` next to
+the dump. ``SharedCocktailDB`` applies new spool files to the loaded
+catalog in place, and replays the whole spool after every full load, so the
+dump itself is only rewritten when the spool is compacted. An SQLite
+catalog (``cocktail_sqlite.py``) is updated directly.
+
+    python cocktail_delta.py spool changes.jsonl             # JSON dump catalog
+    python cocktail_delta.py apply changes.jsonl --db cocktails.sqlite
+    python cocktail_delta.py compact                         # fold the spool into the dump
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from cocktail_details import iter_dump_records
+
+# (op, payload): ('upsert', raw record) or ('delete', idDrink).
+DeltaOp = Tuple[str, Any]
+
+# Spool files are named so that sorting them gives the order they arrived in.
+_SPOOL_SUFFIX = '.jsonl'
+
+
+def parse_delta_line(line: str, line_number: int = 0) -> Optional[DeltaOp]:
+    """Parse one line of a delta file; blank lines give None."""
+    if not line.strip():
+        return None
+    try:
+        entry = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'line {line_number}: invalid JSON ({e.msg})') from None
+    if not isinstance(entry, dict):
+        raise ValueError(f'line {line_number}: expected a JSON object')
+    op = entry.get('op', 'upsert' if 'idDrink' in entry else None)
+    if op == 'upsert':
+        drink = entry.get('drink', entry) if 'op' in entry else entry
+        if not isinstance(drink, dict) or not isinstance(drink.get('idDrink'), str) or not drink['idDrink']:
+            raise ValueError(f'line {line_number}: an upsert needs a drink with a string idDrink')
+        return 'upsert', drink
+    if op == 'delete':
+        drink_id = entry.get('idDrink')
+        if not isinstance(drink_id, str) or not drink_id:
+            raise ValueError(f'line {line_number}: a delete needs a string idDrink')
+        return 'delete', drink_id
+    raise ValueError(f"line {line_number}: op must be 'upsert' or 'delete'")
+
+
+def iter_delta(delta_file: str) -> Iterator[DeltaOp]:
+    """Yield the operations of a delta file one line at a time."""
+    with open(delta_file, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                op = parse_delta_line(line, line_number)
+            except ValueError as e:
+                raise ValueError(f'{delta_file}: {e}') from None
+            if op is not None:
+                yield op
+
+
+def validate_delta(delta_file: str) -> int:
+    """Check every line of a delta file, returning the number of operations."""
+    return sum(1 for _ in iter_delta(delta_file))
+
+
+def apply_delta(store: Any, ops: Iterator[DeltaOp]) -> Set[str]:
+    """Apply operations to a catalog with ``upsert``/``delete`` methods.
+
+    Returns the ids of the drinks that were added, replaced or deleted.
+    """
+    changed = set()
+    for op, payload in ops:
+        if op == 'upsert':
+            store.upsert(payload)
+            changed.add(payload['idDrink'])
+        elif store.delete(payload):
+            changed.add(payload)
+    return changed
+
+
+def file_digest(path: str) -> str:
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def delta_dir_for(json_file: str) -> str:
+    """Return the spool directory of a JSON dump."""
+    return json_file + '.deltas'
+
+
+def spooled_deltas(json_file: str) -> List[str]:
+    """Return the spooled delta files of a dump, oldest first."""
+    spool = delta_dir_for(json_file)
+    try:
+        names = sorted(name for name in os.listdir(spool) if name.endswith(_SPOOL_SUFFIX))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(spool, name) for name in names]
+
+
+def spool_delta(json_file: str, delta_file: str) -> str:
+    """Validate a delta file and add it to the dump's spool; returns its spool path."""
+    validate_delta(delta_file)
+    spool = delta_dir_for(json_file)
+    os.makedirs(spool, exist_ok=True)
+    name = f'{time.time_ns():020d}-{os.getpid()}{_SPOOL_SUFFIX}'
+    tmp_path = os.path.join(spool, f'.{name}.tmp')
+    shutil.copyfile(delta_file, tmp_path)
+    # Renaming makes the file visible to watchers only once it is complete.
+    path = os.path.join(spool, name)
+    os.replace(tmp_path, path)
+    return path
+
+
+def compact(json_file: str) -> int:
+    """Fold every spooled delta into the dump and clear the spool.
+
+    The dump is streamed through, so only the net changes are held in
+    memory. Returns the number of spool files folded in.
+    """
+    deltas = spooled_deltas(json_file)
+    if not deltas:
+        return 0
+    # idDrink -> latest record, or None when its last operation was a delete.
+    changes: Dict[str, Optional[Dict[str, Any]]] = {}
+    for delta in deltas:
+        for op, payload in iter_delta(delta):
+            if op == 'upsert':
+                changes[payload['idDrink']] = payload
+            else:
+                changes[payload] = None
+
+    tmp_path = f'{json_file}.tmp{os.getpid()}'
+    with open(tmp_path, 'w', encoding='utf-8') as out:
+        out.write('[')
+        first = True
+
+        def write(record):
+            nonlocal first
+            out.write('\n' if first else ',\n')
+            out.write(json.dumps(record, ensure_ascii=False))
+            first = False
+
+        for record, _, _ in iter_dump_records(json_file):
+            drink_id = record.get('idDrink')
+            if drink_id in changes:
+                record = changes.pop(drink_id)
+                if record is None:
+                    continue
+            write(record)
+        for record in changes.values():
+            if record is not None:
+                write(record)
+        out.write('\n]\n')
+    os.replace(tmp_path, json_file)
+    # Replaying a folded delta is harmless (upserts and deletes are
+    # idempotent), so the spool is cleared only after the dump is replaced.
+    for delta in deltas:
+        os.remove(delta)
+    return len(deltas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply JSONL deltas to the cocktail catalog.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    spool = commands.add_parser('spool', help='queue deltas for the processes serving a JSON dump')
+    spool.add_argument('deltas', nargs='+')
+    spool.add_argument('--dump', default='cocktaildb_dump.json')
+    apply = commands.add_parser('apply', help='apply deltas to an SQLite catalog')
+    apply.add_argument('deltas', nargs='+')
+    apply.add_argument('--db', default='cocktails.sqlite')
+    compact_parser = commands.add_parser('compact', help='fold the spooled deltas into the dump')
+    compact_parser.add_argument('--dump', default='cocktaildb_dump.json')
+    args = parser.parse_args()
+
+    if args.command == 'spool':
+        for delta in args.deltas:
+            print(f'{delta}: spooled as {spool_delta(args.dump, delta)}')
+    elif args.command == 'apply':
+        from cocktail_sqlite import SQLiteCocktailDB
+
+        db = SQLiteCocktailDB(args.db)
+        for delta in args.deltas:
+            validate_delta(delta)
+            print(f'{delta}: {len(apply_delta(db, iter_delta(delta)))} drinks changed')
+    else:
+        print(f'Folded {compact(args.dump)} delta files into {args.dump}')
+
+
+if __name__ == '__main__':
+    main()
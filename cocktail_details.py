@@ -0,0 +1,115 @@
+"""On-demand access to full records in the JSON dump.
+
+``iter_dump_records`` streams the dump's top-level array one object at a
+time, reporting where each object sits in the file, so a catalog can be
+indexed without ever holding the whole dump in memory. ``DetailStore``
+keeps those byte ranges and decodes a single record straight from the
+file when it is needed, behind a small LRU.
+"""
+import codecs
+import json
+import os
+import weakref
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Tuple
+
+# Bytes read from the dump per step while streaming it.
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_dump_records(json_file: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Dict[str, Any], int, int]]:
+    """Yield ``(record, byte offset, byte length)`` for each object in a JSON array file."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    with open(json_file, 'rb') as f:
+        text = ''
+        pos = 0
+        byte_pos = 0        # file offset of text[pos]
+        started = False
+        eof = False
+
+        def advance(to: int) -> None:
+            nonlocal pos, byte_pos
+            byte_pos += len(text[pos:to].encode('utf-8'))
+            pos = to
+
+        while True:
+            while pos < len(text) and (text[pos] in _WHITESPACE or (started and text[pos] == ',')):
+                advance(pos + 1)
+            if pos < len(text):
+                if not started:
+                    if text[pos] != '[':
+                        raise ValueError(f'{json_file} does not contain a JSON array')
+                    started = True
+                    advance(pos + 1)
+                    continue
+                if text[pos] == ']':
+                    return
+                try:
+                    record, end = decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    start = byte_pos
+                    advance(end)
+                    yield record, start, byte_pos - start
+                    continue
+            elif eof:
+                raise ValueError(f'{json_file} ended before its JSON array was closed')
+
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            text = text[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+
+
+class DumpChangedError(RuntimeError):
+    """The dump was rewritten in place after its records were indexed."""
+
+
+class DetailStore:
+    """Byte ranges of records in the dump, decoded on demand through an LRU.
+
+    The dump is opened once. If it is later replaced by renaming a new file
+    over it, the store keeps reading the version its offsets were taken
+    from. A dump rewritten in place cannot be read that way: every read
+    first checks the file's size and mtime against those seen at open,
+    and raises ``DumpChangedError`` if they differ, until the catalog is
+    reloaded.
+    """
+
+    def __init__(self, json_file: str, cache_size: int = 256):
+        self.json_file = json_file
+        self._offsets = array('q')
+        self._lengths = array('q')
+        self._fd = os.open(json_file, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        self._finalizer = weakref.finalize(self, os.close, self._fd)
+        self._stamp = self._stat()
+        self.load = lru_cache(maxsize=cache_size)(self._read)
+
+    def _stat(self) -> Tuple[int, int]:
+        stat = os.fstat(self._fd)
+        return stat.st_size, stat.st_mtime_ns
+
+    def close(self) -> None:
+        """Close the dump; records already in the LRU stay readable."""
+        self._finalizer()
+
+    def add(self, offset: int, length: int) -> int:
+        """Register a record's byte range and return its detail index."""
+        self._offsets.append(offset)
+        self._lengths.append(length)
+        return len(self._offsets) - 1
+
+    def _read(self, index: int) -> Dict[str, Any]:
+        if self._stat() != self._stamp:
+            raise DumpChangedError(f'{self.json_file} changed since it was indexed; reload the catalog')
+        offset, length = self._offsets[index], self._lengths[index]
+        data = os.pread(self._fd, length, offset)
+        if len(data) != length:
+            raise DumpChangedError(f'{self.json_file} is shorter than when it was indexed')
+        return json.loads(data)
@@ -0,0 +1,129 @@
+"""Facet bitmaps for structured cocktail queries.
+
+Every value of the exact-match facets (category, alcoholic, glass, IBA,
+tags and ingredients) gets a bitmap over catalog positions, stored as a
+Python int. Combining filters is then a chain of ``&``/``|`` on those ints,
+and the per-value counts for a result set are one ``&`` plus
+``int.bit_count()`` each. Deltas set or clear single bits.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Facet name -> raw TheCocktailDB field for single-valued facets.
+FIELD_FACETS = {
+    'category': 'strCategory',
+    'alcoholic': 'strAlcoholic',
+    'glass': 'strGlass',
+    'iba': 'strIBA',
+}
+
+# All facets with precomputed bitmaps, in the order counts are reported.
+FACETS = (*FIELD_FACETS, 'tag', 'ingredient')
+
+
+def positions_to_bitmap(positions: Iterable[int], size: int) -> int:
+    """Pack catalog positions into an int bitmap."""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitmap_to_positions(bitmap: int) -> List[int]:
+    """Unpack an int bitmap into sorted catalog positions."""
+    return [position for position, bit in enumerate(reversed(bin(bitmap)[2:])) if bit == '1']
+
+
+def _tags(raw_tags: Optional[str]) -> List[str]:
+    return [tag.strip() for tag in raw_tags.split(',') if tag.strip()] if raw_tags else []
+
+
+class FacetIndex:
+    """Bitmaps for every value of every facet, keyed case-insensitively."""
+
+    def __init__(self, cocktails: List):
+        self.size = len(cocktails)
+        # Bits of live drinks; deleted positions stay cleared.
+        self.all = positions_to_bitmap(
+            (position for position, cocktail in enumerate(cocktails) if cocktail is not None), self.size)
+        # facet -> lowercased value -> (display value, bitmap)
+        self.values: Dict[str, Dict[str, tuple]] = {}
+
+        collected: Dict[str, Dict[str, List]] = {facet: {} for facet in FACETS}
+        for position, cocktail in enumerate(cocktails):
+            if cocktail is None:
+                continue
+            for facet, value in self._facet_values(cocktail):
+                self._collect(collected[facet], value, position)
+
+        for facet, values in collected.items():
+            self.values[facet] = {
+                key: (display, positions_to_bitmap(positions, self.size))
+                for key, (display, positions) in values.items()
+            }
+
+    @staticmethod
+    def _facet_values(cocktail) -> Iterator[Tuple[str, str]]:
+        """Yield the ``(facet, value)`` pairs a cocktail carries."""
+        for facet, field in FIELD_FACETS.items():
+            value = cocktail.get(field)
+            if value:
+                yield facet, value
+        for tag in _tags(cocktail.get('strTags')):
+            yield 'tag', tag
+        for ingredient, _ in cocktail.ingredients:
+            if ingredient.strip():
+                yield 'ingredient', ingredient.strip()
+
+    def add(self, position: int, cocktail) -> None:
+        """Set ``position``'s bit for every facet value of ``cocktail``."""
+        bit = 1 << position
+        self.size = max(self.size, position + 1)
+        self.all |= bit
+        for facet, value in self._facet_values(cocktail):
+            values = self.values[facet]
+            display, bitmap = values.get(value.lower(), (value, 0))
+            values[value.lower()] = (display, bitmap | bit)
+
+    def remove(self, position: int, cocktail) -> None:
+        """Clear ``position``'s bit for the facet values of ``cocktail``."""
+        bit = 1 << position
+        self.all &= ~bit
+        for facet, value in self._facet_values(cocktail):
+            values = self.values[facet]
+            entry = values.get(value.lower())
+            if entry is None:
+                continue
+            bitmap = entry[1] & ~bit
+            if bitmap:
+                values[value.lower()] = (entry[0], bitmap)
+            else:
+                del values[value.lower()]
+
+    @staticmethod
+    def _collect(values: Dict[str, List], value: Optional[str], position: int) -> None:
+        if not value:
+            return
+        entry = values.setdefault(value.lower(), [value, []])
+        if not entry[1] or entry[1][-1] != position:
+            entry[1].append(position)
+
+    def bitmap(self, facet: str, value: str) -> int:
+        """Return the bitmap of drinks whose ``facet`` equals ``value`` (ignoring case)."""
+        entry = self.values[facet].get(value.strip().lower())
+        return entry[1] if entry else 0
+
+    def counts(self, bitmap: int, limit: Optional[int] = None) -> Dict[str, Dict[str, int]]:
+        """Count the drinks in ``bitmap`` per facet value, most common first.
+
+        Values with no drinks in the set are omitted; ``limit`` caps the
+        number of values reported per facet.
+        """
+        counts = {}
+        for facet in FACETS:
+            facet_counts = [
+                (display, (bitmap & value_bitmap).bit_count())
+                for display, value_bitmap in tuple(self.values[facet].values())
+            ]
+            facet_counts = sorted((item for item in facet_counts if item[1]), key=lambda item: (-item[1], item[0]))
+            counts[facet] = dict(facet_counts[:limit])
+        return counts
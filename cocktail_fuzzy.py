@@ -0,0 +1,124 @@
+"""Typo-tolerant matching over the words of a search field.
+
+``FuzzyIndex`` splits every distinct value of a field (drink names,
+ingredient names) into lowercase words and precomputes, for each vocabulary
+word, every string obtained by deleting up to ``MAX_DISTANCE`` characters.
+Two words within that edit distance always share such a deletion variant,
+so a query word is resolved with a few dictionary lookups followed by exact
+Levenshtein checks on the handful of candidates, instead of comparing it
+against the whole vocabulary.
+"""
+import re
+from itertools import combinations
+from typing import Dict, Iterator, List, Set, Tuple
+
+_WORD = re.compile(r'\w+')
+
+# Largest edit distance the deletion index supports.
+MAX_DISTANCE = 2
+
+
+def words(text: str) -> List[str]:
+    """Split ``text`` into lowercase words."""
+    return _WORD.findall(text.lower())
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Return the edit distance between ``a`` and ``b``."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def allowed_distance(word: str, max_distance: int) -> int:
+    """Scale the edit budget with word length so short words are not matched loosely."""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 5:
+        return min(1, max_distance)
+    return min(max_distance, MAX_DISTANCE)
+
+
+def _deletions(word: str, distance: int) -> Iterator[str]:
+    """Yield every string made by deleting up to ``distance`` characters of ``word``."""
+    seen: Set[str] = set()
+    for count in range(min(distance, len(word)) + 1):
+        for dropped in combinations(range(len(word)), count):
+            variant = ''.join(char for i, char in enumerate(word) if i not in dropped)
+            if variant not in seen:
+                seen.add(variant)
+                yield variant
+
+
+class FuzzyIndex:
+    """Word-level fuzzy lookup over the distinct values of one field.
+
+    ``search`` returns the ids of the values in which every query word has
+    a vocabulary word within its edit budget.
+    """
+
+    def __init__(self, values: List[str]):
+        self._values_by_word: Dict[str, List[int]] = {}
+        self._words_by_variant: Dict[str, List[str]] = {}
+        self.word_counts: List[int] = []
+        for value_id, value in enumerate(values):
+            self.add(value_id, value)
+
+    def add(self, value_id: int, value: str) -> None:
+        """Index the value with id ``value_id``; ids must be added in order."""
+        value_words = set(words(value))
+        self.word_counts.append(len(value_words))
+        for word in value_words:
+            if word not in self._values_by_word:
+                self._values_by_word[word] = []
+                for variant in _deletions(word, allowed_distance(word, MAX_DISTANCE)):
+                    self._words_by_variant.setdefault(variant, []).append(word)
+            self._values_by_word[word].append(value_id)
+
+    def _similar_words(self, word: str, max_distance: int) -> Dict[str, int]:
+        candidates = set()
+        for variant in _deletions(word, max_distance):
+            candidates.update(self._words_by_variant.get(variant, ()))
+        similar = {}
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = levenshtein(word, candidate)
+            if distance <= min(max_distance, allowed_distance(candidate, MAX_DISTANCE)):
+                similar[candidate] = distance
+        return similar
+
+    def search(self, query: str, max_distance: int = 2) -> Dict[int, Tuple[int, int]]:
+        """Match ``query`` against the indexed values.
+
+        Returns ``{value id: (summed edit distance, extra words)}``, where
+        extra words counts the words of the value the query did not cover.
+        """
+        query_words = set(words(query))
+        scores: Dict[int, int] = {}
+        for n, word in enumerate(query_words):
+            best: Dict[int, int] = {}
+            for match, distance in self._similar_words(word, allowed_distance(word, max_distance)).items():
+                for value_id in self._values_by_word[match]:
+                    if value_id not in best or distance < best[value_id]:
+                        best[value_id] = distance
+            if n == 0:
+                scores = best
+            else:
+                scores = {value_id: score + best[value_id] for value_id, score in scores.items() if value_id in best}
+            if not scores:
+                return {}
+        return {
+            value_id: (distance, self.word_counts[value_id] - len(query_words))
+            for value_id, distance in scores.items()
+        }
@@ -0,0 +1,279 @@
+"""Parsed ingredient measures and per-drink volume ranges.
+
+TheCocktailDB measures are free text ("1 1/2 oz", "2 cl", "Juice of 1/2",
+"dash"). ``parse_measure`` turns one into an amount, a canonical unit and,
+for liquid units, a volume in millilitres, with a confidence flag:
+
+* ``exact``: a number and a standard volume unit ("1 1/2 oz", "2 cl")
+* ``estimate``: a range ("1-2 oz") or a loose unit ("dash", "splash",
+  "juice of 1/2"), converted with a typical volume
+* ``none``: no volume could be derived ("1", "2 slices", "top up", parts)
+
+``MeasureIndex`` parses every recipe once and keeps, per metric, the drinks
+sorted by their derived totals, so range and top-N queries are ``bisect``
+slices. Deltas insert or remove single entries.
+"""
+import re
+from bisect import bisect_left, bisect_right, insort
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+EXACT = 'exact'
+ESTIMATE = 'estimate'
+NONE = 'none'
+
+# Millilitres per unit for standard volume units.
+UNIT_ML = {
+    'ml': 1.0, 'cl': 10.0, 'dl': 100.0, 'l': 1000.0,
+    'oz': 29.5735, 'tsp': 4.92892, 'tblsp': 14.7868, 'cup': 236.588,
+    'shot': 44.3603, 'jigger': 44.3603, 'pint': 473.176, 'qt': 946.353,
+    'gal': 3785.41, 'fifth': 757.082,
+}
+
+# Typical millilitres for units with no fixed size.
+ESTIMATED_UNIT_ML = {
+    'dash': 0.92, 'drop': 0.05, 'splash': 5.9, 'glass': 250.0,
+    'bottle': 750.0, 'can': 355.0, 'juice': 30.0,
+}
+
+# Spelling variants -> canonical unit. Plurals are folded before lookup.
+_UNIT_ALIASES = {
+    'millilitre': 'ml', 'milliliter': 'ml', 'centilitre': 'cl', 'centiliter': 'cl',
+    'litre': 'l', 'liter': 'l', 'fl oz': 'oz', 'ounce': 'oz', 'teaspoon': 'tsp',
+    'tbsp': 'tblsp', 'tbs': 'tblsp', 'tablespoon': 'tblsp', 'quart': 'qt',
+    'gallon': 'gal', 'dashe': 'dash', 'glasse': 'glass', 'gr': 'g', 'gram': 'g',
+}
+
+# Units understood as such that have no volume (weights, counts, parts).
+_OTHER_UNITS = frozenset({
+    'part', 'g', 'kg', 'lb', 'pinch', 'slice', 'wedge', 'twist', 'cube', 'chunk',
+    'piece', 'sprig', 'scoop', 'inch', 'cm', 'stick', 'package', 'whole', 'leaf',
+    'handful', 'strip', 'bag',
+})
+
+_FRACTIONS = {'½': ' 1/2', '⅓': ' 1/3', '⅔': ' 2/3', '¼': ' 1/4', '¾': ' 3/4', '⅛': ' 1/8'}
+_NUMBER = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+)'
+_MEASURE = re.compile(
+    rf'^\s*(?:(?P<low>{_NUMBER})(?:\s*-\s*(?P<high>{_NUMBER}))?)?\s*(?P<unit>fl\.? oz|[a-z]+)?\b'
+)
+_JUICE_OF = re.compile(rf'^\s*juice\s+of\s+(?P<amount>{_NUMBER})?')
+
+# Whole words of an ingredient name that mark it as a spirit (at least
+# roughly 35% ABV), and full names of brands that are spirits.
+SPIRIT_WORDS = frozenset({
+    'gin', 'vodka', 'rum', 'tequila', 'mezcal', 'whiskey', 'whisky', 'bourbon', 'scotch',
+    'rye', 'brandy', 'cognac', 'armagnac', 'calvados', 'cachaca', 'pisco', 'absinthe',
+    'grappa', 'aquavit', 'kirschwasser', 'everclear', 'ouzo',
+})
+SPIRIT_NAMES = frozenset({
+    'bacardi', 'bacardi limon', 'crown royal', 'wild turkey', 'jack daniels', 'jim beam',
+    'johnnie walker', 'southern comfort', 'jägermeister', 'goldschlager', 'firewater',
+    'absolut citron', 'absolut kurant', 'absolut peppar', 'absolut vodka', 'smirnoff',
+})
+
+
+class ParsedMeasure(NamedTuple):
+    amount: Optional[float]
+    unit: Optional[str]
+    ml: Optional[float]
+    confidence: str
+
+
+_UNPARSED = ParsedMeasure(None, None, None, NONE)
+
+
+def _number(text: str) -> float:
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            total += int(numerator) / int(denominator) if int(denominator) else 0.0
+        else:
+            total += float(part)
+    return total
+
+
+def _unit(word: Optional[str]) -> Optional[str]:
+    if not word:
+        return None
+    word = word.replace('.', '')
+    for candidate in (word, word[:-1] if word.endswith('s') else None):
+        if candidate:
+            candidate = _UNIT_ALIASES.get(candidate, candidate)
+            if candidate in UNIT_ML or candidate in ESTIMATED_UNIT_ML or candidate in _OTHER_UNITS:
+                return candidate
+    return None
+
+
+@lru_cache(maxsize=8192)
+def parse_measure(text: Optional[str]) -> ParsedMeasure:
+    """Parse a free-text measure into amount, unit, millilitres and confidence.
+
+    Only the leading quantity is read; trailing words ("2 oz Bacardi") are
+    ignored.
+    """
+    if not text or not text.strip():
+        return _UNPARSED
+    text = text.lower()
+    for fraction, replacement in _FRACTIONS.items():
+        text = text.replace(fraction, replacement)
+
+    match = _JUICE_OF.match(text)
+    if match:
+        amount = _number(match['amount']) if match['amount'] else 1.0
+        return ParsedMeasure(amount, 'juice', amount * ESTIMATED_UNIT_ML['juice'], ESTIMATE)
+
+    match = _MEASURE.match(text)
+    if match is None:
+        return _UNPARSED
+    amount = None
+    approximate = False
+    if match['low']:
+        amount = _number(match['low'])
+        if match['high']:
+            amount = (amount + _number(match['high'])) / 2
+            approximate = True
+    unit = _unit(match['unit'])
+    if unit is None:
+        return ParsedMeasure(amount, None, None, NONE) if amount is not None else _UNPARSED
+    if amount is None:
+        # A bare loose unit ("dash", "splash") means one of it.
+        if unit not in ESTIMATED_UNIT_ML:
+            return ParsedMeasure(None, unit, None, NONE)
+        amount = 1.0
+    if unit in UNIT_ML:
+        return ParsedMeasure(amount, unit, amount * UNIT_ML[unit], ESTIMATE if approximate else EXACT)
+    if unit in ESTIMATED_UNIT_ML:
+        return ParsedMeasure(amount, unit, amount * ESTIMATED_UNIT_ML[unit], ESTIMATE)
+    return ParsedMeasure(amount, unit, None, NONE)
+
+
+@lru_cache(maxsize=4096)
+def is_spirit(ingredient: str) -> bool:
+    """Whether an ingredient name looks like a spirit rather than a mixer or liqueur."""
+    name = ingredient.strip().lower()
+    if name in SPIRIT_NAMES:
+        return True
+    return any(word in SPIRIT_WORDS for word in re.findall(r'[a-zà-ÿ]+', name))
+
+
+class DrinkMeasures(NamedTuple):
+    """A recipe's parsed measures and the totals derived from them."""
+    measures: Tuple[ParsedMeasure, ...]
+    # None when no ingredient had a volume.
+    total_ml: Optional[float]
+    spirit_ml: Optional[float]
+    spirit_share: Optional[float]
+    ingredient_count: int
+    # exact when every ingredient has an exact volume, estimate when the
+    # totals rest on estimates or leave ingredients out, none without totals.
+    confidence: str
+
+
+def measure_drink(ingredients: Iterable[Tuple[str, Optional[str]]]) -> DrinkMeasures:
+    """Parse a recipe's ``(ingredient, measure)`` pairs and total them."""
+    measures = []
+    total = spirit = 0.0
+    for ingredient, measure in ingredients:
+        parsed = parse_measure(measure)
+        measures.append(parsed)
+        if parsed.ml is not None:
+            total += parsed.ml
+            if is_spirit(ingredient):
+                spirit += parsed.ml
+    if all(parsed.ml is None for parsed in measures):
+        return DrinkMeasures(tuple(measures), None, None, None, len(measures), NONE)
+    confidence = EXACT if all(parsed.confidence == EXACT for parsed in measures) else ESTIMATE
+    return DrinkMeasures(tuple(measures), total, spirit, spirit / total if total else None,
+                         len(measures), confidence)
+
+
+# Metrics that drinks can be ranged and ranked by.
+METRICS = ('total_ml', 'spirit_ml', 'spirit_share', 'ingredient_count')
+
+_MAX_POSITION = float('inf')
+
+
+class MeasureIndex:
+    """Every drink's derived totals, sorted per metric.
+
+    Each metric keeps a list of ``(value, position)`` pairs in ascending
+    order; drinks without a value for a metric (no parseable volume) are
+    left out of it. A second set of lists holds only the drinks whose
+    totals are exact.
+    """
+
+    def __init__(self, cocktails: List):
+        self.drinks: List[Optional[DrinkMeasures]] = [None] * len(cocktails)
+        self._sorted: Dict[str, List[Tuple[float, int]]] = {metric: [] for metric in METRICS}
+        self._exact: Dict[str, List[Tuple[float, int]]] = {metric: [] for metric in METRICS}
+        for position, cocktail in enumerate(cocktails):
+            if cocktail is None:
+                continue
+            drink = self.drinks[position] = measure_drink(cocktail.ingredients)
+            for values, value in self._entries(drink):
+                values.append((value, position))
+        for values in (*self._sorted.values(), *self._exact.values()):
+            values.sort()
+
+    def _entries(self, drink: DrinkMeasures) -> Iterable[Tuple[List[Tuple[float, int]], float]]:
+        """Yield the sorted lists a drink belongs in, with its value for each."""
+        for metric in METRICS:
+            value = getattr(drink, metric)
+            if value is not None:
+                yield self._sorted[metric], value
+                if drink.confidence == EXACT:
+                    yield self._exact[metric], value
+
+    def add(self, position: int, cocktail) -> None:
+        if position >= len(self.drinks):
+            self.drinks.extend([None] * (position + 1 - len(self.drinks)))
+        drink = self.drinks[position] = measure_drink(cocktail.ingredients)
+        for values, value in self._entries(drink):
+            insort(values, (value, position))
+
+    def remove(self, position: int) -> None:
+        drink = self.drinks[position]
+        if drink is None:
+            return
+        for values, value in self._entries(drink):
+            index = bisect_left(values, (value, position))
+            if index < len(values) and values[index] == (value, position):
+                del values[index]
+        self.drinks[position] = None
+
+    def _bounds(self, metric: str, minimum: Optional[float], maximum: Optional[float],
+                exact: bool) -> Tuple[List[Tuple[float, int]], int, int]:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}")
+        values = (self._exact if exact else self._sorted)[metric]
+        start = 0 if minimum is None else bisect_left(values, (minimum, -1))
+        end = len(values) if maximum is None else bisect_right(values, (maximum, _MAX_POSITION))
+        return values, start, max(start, end)
+
+    def count(self, metric: str, minimum: Optional[float] = None, maximum: Optional[float] = None,
+              exact: bool = False) -> int:
+        """Return how many positions ``range`` would return without a limit."""
+        _, start, end = self._bounds(metric, minimum, maximum, exact)
+        return end - start
+
+    def range(self, metric: str, minimum: Optional[float] = None, maximum: Optional[float] = None,
+              descending: bool = False, limit: Optional[int] = None, exact: bool = False) -> List[int]:
+        """Return the positions whose ``metric`` lies in ``[minimum, maximum]``, ordered by it.
+
+        Either bound may be omitted. Ties are broken by catalog position.
+        With ``exact``, only drinks whose totals are exact are considered.
+        Only the first ``limit`` positions are looked at, from either end.
+        """
+        values, start, end = self._bounds(metric, minimum, maximum, exact)
+        if descending:
+            # Walk down from the top one run of tied values at a time; each
+            # run is already in catalog position order.
+            positions: List[int] = []
+            while end > start and (limit is None or len(positions) < limit):
+                run = bisect_left(values, (values[end - 1][0], -1), start, end)
+                positions.extend(position for _, position in values[run:end])
+                end = run
+            return positions[:limit]
+        stop = end if limit is None else min(end, start + limit)
+        return [position for _, position in values[start:stop]]
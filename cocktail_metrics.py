@@ -0,0 +1,239 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+A deliberately small subset of what ``prometheus_client`` offers: labelled
+counters, gauges and histograms that are cheap enough to update on every
+request, plus collector callbacks for values that are read at scrape time
+(cache statistics, the loaded catalog generation). ``SlowRequestProfiler``
+optionally runs a sample of requests under ``cProfile`` and keeps the
+profiles of the slowest ones on disk.
+"""
+import bisect
+import cProfile
+import itertools
+import math
+import os
+import random
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from 50us to 10s.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets for the number of results a search returned.
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+# (name, labels, value) samples produced by collectors at scrape time.
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + '}'
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(f'{name}{_format_labels(labels)} {_format_value(value)}' for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, self._labels(key), value) for key, value in items]
+
+
+class Gauge(_Metric):
+    """A value that can go up and down, per label set."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, self._labels(key), value) for key, value in items]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, a sum and a count per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class Registry:
+    """A set of metrics and scrape-time collectors rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Tuple[str, str, str, Callable[[], Iterable[Sample]]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, name: str, kind: str, documentation: str, collect: Callable[[], Iterable[Sample]]) -> None:
+        """Report the samples ``collect()`` returns under ``name`` on every scrape."""
+        self._collectors.append((name, kind, documentation, collect))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, kind, documentation, collect in self._collectors:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{sample}{_format_labels(labels)} {_format_value(value)}'
+                         for sample, labels, value in collect())
+        return '\n'.join(lines) + '\n'
+
+
+class SlowRequestProfiler:
+    """Profile a random sample of requests and keep the slowest on disk.
+
+    Profiles are written as ``<milliseconds>ms-<label>-<n>.prof`` files (readable
+    with ``pstats`` or ``snakeviz``) in ``dump_dir``; only the ``keep``
+    slowest are retained. One request is profiled at a time, so concurrent
+    requests are simply not sampled while a profile is running.
+    """
+
+    def __init__(self, dump_dir: str, sample_rate: float = 0.01, keep: int = 20):
+        self.dump_dir = dump_dir
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._slowest: List[Tuple[float, str]] = []   # (seconds, path), ascending
+        self._sequence = itertools.count()
+        os.makedirs(dump_dir, exist_ok=True)
+
+    def start(self) -> Optional[cProfile.Profile]:
+        """Start profiling this request if it is sampled; returns the profile or None."""
+        if random.random() >= self.sample_rate or not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is active.
+            self._busy.release()
+            return None
+        return profile
+
+    def finish(self, profile: cProfile.Profile, label: str, seconds: float) -> None:
+        """Stop ``profile`` and dump it if it is among the slowest seen."""
+        profile.disable()
+        self._busy.release()
+        with self._lock:
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            safe_label = ''.join(c if c.isalnum() else '_' for c in label).strip('_') or 'request'
+            path = os.path.join(self.dump_dir, f'{seconds * 1e3:.1f}ms-{safe_label}-{next(self._sequence)}.prof')
+            profile.dump_stats(path)
+            bisect.insort(self._slowest, (seconds, path))
+            while len(self._slowest) > self.keep:
+                _, evicted = self._slowest.pop(0)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
@@ -0,0 +1,72 @@
+"""Memoized searches and paged result grids for the Streamlit front-ends.
+
+Streamlit reruns the whole script on every widget interaction, which used
+to repeat the search and render every matching card each time. Searches
+are now memoized per (type, query) across reruns and sessions in a bounded
+``st.cache_data`` cache keyed by the catalog's digest, so a reloaded
+catalog is never answered from stale entries. The cache holds drink ids
+only, and just the current page of them is looked up and rendered.
+"""
+from math import ceil
+from typing import Hashable, List
+
+import streamlit as st
+
+# Cards per page of the result grid (a multiple of the three grid columns).
+PAGE_SIZE = 12
+
+# Distinct searches kept in the memo cache; the oldest are evicted first.
+SEARCH_CACHE_ENTRIES = 256
+
+
+@st.cache_data(max_entries=SEARCH_CACHE_ENTRIES, show_spinner=False)
+def search_ids(search_type: str, query: str, digest: str, _db) -> List[str]:
+    """Return the ids of the drinks matching a Name, Ingredient or Category search.
+
+    ``digest`` identifies the catalog ``_db`` was loaded from; it is part of
+    the cache key, while ``_db`` itself is not hashed.
+    """
+    if search_type == 'Name':
+        results = _db.search_by_name(query)
+    elif search_type == 'Ingredient':
+        results = _db.search_by_ingredient(query)
+    else:
+        results = _db.search_by_category(query)
+    return [cocktail.id for cocktail in results]
+
+
+def cached_search(state, search_type: str, query: str) -> List[str]:
+    """Search a ``CatalogState`` through the memo cache."""
+    # Searches ignore case, so queries differing only in case share an entry.
+    return search_ids(search_type, query.strip().lower(), state.digest, state.db)
+
+
+def lookup(db, ids: List[str]) -> List:
+    """Return the cocktails for ``ids``, skipping any deleted since they were found."""
+    cocktails = (db.get_cocktail_by_id(drink_id) for drink_id in ids)
+    return [cocktail for cocktail in cocktails if cocktail is not None]
+
+
+def _set_page(key: str, page: int) -> None:
+    st.session_state[key] = page
+
+
+def page_of(ids: List[str], search: Hashable, key: str = 'page') -> List[str]:
+    """Render previous/next controls for ``ids`` and return the ids on the current page.
+
+    The page number lives in ``st.session_state[key]`` and goes back to the
+    first page whenever ``search`` (e.g. the search type and query) changes.
+    """
+    if st.session_state.get(f'{key}_search') != search:
+        st.session_state[f'{key}_search'] = search
+        st.session_state[key] = 0
+    pages = max(1, ceil(len(ids) / PAGE_SIZE))
+    page = min(st.session_state.get(key, 0), pages - 1)
+    if pages > 1:
+        previous, position, following = st.columns([1, 2, 1])
+        previous.button('← Previous', key=f'{key}_previous', disabled=page == 0,
+                        on_click=_set_page, args=(key, page - 1), use_container_width=True)
+        position.caption(f'Page {page + 1} of {pages}')
+        following.button('Next →', key=f'{key}_next', disabled=page == pages - 1,
+                         on_click=_set_page, args=(key, page + 1), use_container_width=True)
+    return ids[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
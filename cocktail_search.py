@@ -1,53 +1,1087 @@
+import argparse
 import json
-from typing import List, Dict, Any
+import sys
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Mapping
+from contextlib import contextmanager
+from functools import wraps
+from itertools import islice
+from typing import TYPE_CHECKING, List, Dict, Any, Callable, Iterable, Iterator, Optional, Set, Tuple
 
-class CocktailDB:
-    def __init__(self, json_file: str):
-        """Initialize the database with the given JSON file."""
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.cocktails = json.load(f)
-    
-    def search_by_name(self, name: str, case_sensitive: bool = False) -> List[Dict[str, Any]]:
+from cocktail_details import DetailStore, iter_dump_records
+from cocktail_facets import FACETS, FacetIndex, bitmap_to_positions, positions_to_bitmap
+from cocktail_fuzzy import FuzzyIndex
+from cocktail_measures import METRICS, DrinkMeasures, MeasureIndex
+from cocktail_snapshot import Snapshot, snapshot_path_for
+from cocktail_store import CocktailStore, open_store
+from cocktail_suggest import SuggestIndex
+from cocktail_text import LANGUAGE_FIELDS, TextIndex
+
+if TYPE_CHECKING:
+    from cocktail_similar import NeighborTable
+
+# Number of strIngredientN/strMeasureN slot pairs in a TheCocktailDB record.
+INGREDIENT_SLOTS = 15
+
+# Keys of a raw TheCocktailDB record, in the order the API returns them.
+RAW_KEYS = (
+    'idDrink', 'strDrink', 'strDrinkAlternate', 'strTags', 'strVideo',
+    'strCategory', 'strIBA', 'strAlcoholic', 'strGlass', 'strInstructions',
+    'strInstructionsES', 'strInstructionsDE', 'strInstructionsFR',
+    'strInstructionsIT', 'strInstructionsZH-HANS', 'strInstructionsZH-HANT',
+    'strDrinkThumb',
+    *(f'strIngredient{i}' for i in range(1, INGREDIENT_SLOTS + 1)),
+    *(f'strMeasure{i}' for i in range(1, INGREDIENT_SLOTS + 1)),
+    'strImageSource', 'strImageAttribution', 'strCreativeCommonsConfirmed',
+    'dateModified',
+)
+_RAW_KEY_SET = frozenset(RAW_KEYS)
+
+# Raw keys held in dedicated Cocktail slots rather than the ``extra`` dict.
+_FIELD_ATTRS = {
+    'idDrink': 'id',
+    'strDrink': 'name',
+    'strCategory': 'category',
+    'strAlcoholic': 'alcoholic',
+    'strGlass': 'glass',
+    'strIBA': 'iba',
+    'strTags': 'tags',
+    'strDrinkThumb': 'thumb',
+    'strInstructions': 'instructions',
+}
+
+# strIngredientN -> (N - 1, 0) and strMeasureN -> (N - 1, 1).
+_RECIPE_KEYS = {
+    **{f'strIngredient{i}': (i - 1, 0) for i in range(1, INGREDIENT_SLOTS + 1)},
+    **{f'strMeasure{i}': (i - 1, 1) for i in range(1, INGREDIENT_SLOTS + 1)},
+}
+
+
+# (strIngredientN, strMeasureN) key pairs, in slot order.
+_SLOT_KEYS = tuple((f'strIngredient{i}', f'strMeasure{i}') for i in range(1, INGREDIENT_SLOTS + 1))
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+def _extra_fields(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the non-null raw fields that have no dedicated Cocktail slot."""
+    return {
+        key: value for key, value in raw.items()
+        if value is not None and key not in _FIELD_ATTRS and key not in _RECIPE_KEYS
+    } or None
+
+
+def _unpacked_slots(raw: Dict[str, Any], recipe: Tuple[Tuple[int, Optional[str]], ...],
+                   ingredients: 'IngredientTable') -> Optional[Dict[str, Any]]:
+    """Return the raw recipe slots that the packed ``recipe`` does not reproduce.
+
+    Packing drops empty ingredient slots and the measures beside them and
+    moves later slots up, and trailing ``""`` measures would read back as
+    ``None``; the few records where that changes a slot keep the originals.
+    """
+    names = ingredients.names
+    unpacked = None
+    for index, keys in enumerate(_SLOT_KEYS):
+        if index < len(recipe):
+            ingredient_id, measure = recipe[index]
+            packed = (names[ingredient_id], measure)
+        else:
+            packed = (None, None)
+        for key, value in zip(keys, packed):
+            original = raw.get(key)
+            if original != value:
+                if unpacked is None:
+                    unpacked = {}
+                unpacked[key] = original
+    return unpacked
+
+
+class IngredientTable:
+    """Interns ingredient names into dense integer ids shared by all recipes.
+
+    Safe to share between threads: ``SQLiteCocktailDB`` decodes records on
+    every thread that searches it.
+    """
+
+    __slots__ = ('names', 'ids', '_lock')
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, name: str) -> int:
+        """Return the id for ``name``, assigning a new one if needed."""
+        ingredient_id = self.ids.get(name)
+        if ingredient_id is None:
+            with self._lock:
+                ingredient_id = self.ids.get(name)
+                if ingredient_id is None:
+                    ingredient_id = len(self.names)
+                    # Published in this order, an id always has its name.
+                    self.names.append(sys.intern(name))
+                    self.ids[name] = ingredient_id
+        return ingredient_id
+
+    def copy(self) -> 'IngredientTable':
+        """Return an independent table assigning the same ids."""
+        table = IngredientTable()
+        table.names = list(self.names)
+        table.ids = dict(self.ids)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class Cocktail(Mapping):
+    """Compact, read-only cocktail record.
+
+    The fields every front-end uses live in slots, the recipe is a tuple of
+    ``(ingredient_id, measure)`` pairs and the remaining non-null raw fields
+    (translations, image attribution, ...) share one small ``extra`` dict.
+    Records behave like the raw TheCocktailDB dict they were built from, so
+    ``cocktail.get('strIngredient1')`` keeps working; ``to_dict()`` returns
+    a full copy in the original shape, down to empty or orphaned measure
+    slots, which ``unpacked`` keeps for the records that have them.
+    """
+
+    __slots__ = (
+        'id', 'name', 'category', 'alcoholic', 'glass', 'iba', 'tags',
+        'thumb', 'instructions', 'recipe', 'unpacked', 'extra', '_ingredients',
+    )
+
+    def __init__(self, raw: Dict[str, Any], ingredients: IngredientTable):
+        self._set_summary(raw, ingredients)
+        self.instructions = raw.get('strInstructions')
+        self.extra: Optional[Dict[str, Any]] = _extra_fields(raw)
+
+    def _set_summary(self, raw: Dict[str, Any], ingredients: IngredientTable) -> None:
+        """Fill every slot except the detail fields ``instructions`` and ``extra``."""
+        self.id = raw.get('idDrink')
+        self.name = raw.get('strDrink')
+        self.category = _intern(raw.get('strCategory'))
+        self.alcoholic = _intern(raw.get('strAlcoholic'))
+        self.glass = _intern(raw.get('strGlass'))
+        self.iba = _intern(raw.get('strIBA'))
+        self.tags = raw.get('strTags')
+        self.thumb = raw.get('strDrinkThumb')
+        self.recipe: Tuple[Tuple[int, Optional[str]], ...] = tuple(
+            (ingredients.intern(raw[f'strIngredient{i}']), _intern(raw.get(f'strMeasure{i}')))
+            for i in range(1, INGREDIENT_SLOTS + 1)
+            if raw.get(f'strIngredient{i}')
+        )
+        self.unpacked = _unpacked_slots(raw, self.recipe, ingredients)
+        self._ingredients = ingredients
+
+    def state(self) -> Tuple[Any, ...]:
+        """Return the record's fields as a plain tuple for serialization."""
+        return (
+            self.id, self.name, self.category, self.alcoholic, self.glass,
+            self.iba, self.tags, self.thumb, self.instructions, self.recipe,
+            self.unpacked, self.extra,
+        )
+
+    @classmethod
+    def from_state(cls, state: Tuple[Any, ...], ingredients: IngredientTable) -> 'Cocktail':
+        """Rebuild a record from the tuple produced by ``state()``."""
+        cocktail = cls.__new__(cls)
+        (cocktail.id, cocktail.name, category, alcoholic, glass, iba,
+         cocktail.tags, cocktail.thumb, cocktail.instructions, recipe,
+         cocktail.unpacked, cocktail.extra) = state
+        cocktail.category = _intern(category)
+        cocktail.alcoholic = _intern(alcoholic)
+        cocktail.glass = _intern(glass)
+        cocktail.iba = _intern(iba)
+        cocktail.recipe = tuple((ingredient_id, _intern(measure)) for ingredient_id, measure in recipe)
+        cocktail._ingredients = ingredients
+        return cocktail
+
+    @property
+    def ingredients(self) -> List[Tuple[str, Optional[str]]]:
+        """The recipe as ``(ingredient name, raw measure)`` pairs."""
+        names = self._ingredients.names
+        return [(names[ingredient_id], measure) for ingredient_id, measure in self.recipe]
+
+    def __getitem__(self, key: str) -> Any:
+        attr = _FIELD_ATTRS.get(key)
+        if attr is not None:
+            return getattr(self, attr)
+        slot = _RECIPE_KEYS.get(key)
+        if slot is not None:
+            if self.unpacked is not None and key in self.unpacked:
+                return self.unpacked[key]
+            index, column = slot
+            if index >= len(self.recipe):
+                return None
+            ingredient_id, measure = self.recipe[index]
+            return self._ingredients.names[ingredient_id] if column == 0 else measure
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        if key in _RAW_KEY_SET:
+            return None
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from RAW_KEYS
+        if self.extra:
+            yield from (key for key in self.extra if key not in _RAW_KEY_SET)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record as a raw TheCocktailDB-shaped dict."""
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return f'Cocktail(id={self.id!r}, name={self.name!r})'
+
+class LazyCocktail(Cocktail):
+    """Cocktail whose instructions and other detail fields stay in the dump.
+
+    Only the summary fields and recipe are resident; ``instructions``,
+    ``extra`` and everything derived from them (``to_dict()``, ``get()`` of
+    translated instructions, ...) decode the full record from the dump on
+    access, through the ``DetailStore``'s LRU.
+    """
+
+    __slots__ = ('_details', '_detail_index')
+
+    def __init__(self, raw: Dict[str, Any], ingredients: IngredientTable, details: DetailStore, detail_index: int):
+        self._set_summary(raw, ingredients)
+        self._details = details
+        self._detail_index = detail_index
+
+    @property
+    def instructions(self) -> Optional[str]:
+        return self._details.load(self._detail_index).get('strInstructions')
+
+    @property
+    def extra(self) -> Optional[Dict[str, Any]]:
+        return _extra_fields(self._details.load(self._detail_index))
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Return the set of 3-character substrings of ``text``."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _SubstringIndex:
+    """Substring index over the distinct values of one cocktail field.
+
+    Each distinct value keeps a posting list of the catalog positions that
+    carry it, and every trigram of the lowercased value points back at the
+    values containing it. A query only verifies the values sharing all of
+    its trigrams, using the same ``in`` test the linear scan used, so the
+    results are identical to scanning ``self.cocktails``.
+    """
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.lowered: List[str] = []
+        self.postings: List[List[int]] = []
+        self.value_ids: Dict[str, int] = {}
+        self.trigrams: Dict[str, List[int]] = {}
+
+    def add(self, position: int, value: str) -> None:
+        """Record that the cocktail at ``position`` carries ``value``."""
+        value_id = self.value_ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self.value_ids[value] = value_id
+            self.values.append(value)
+            lowered = value.lower()
+            self.lowered.append(lowered)
+            self.postings.append([])
+            for trigram in _trigrams(lowered):
+                self.trigrams.setdefault(trigram, []).append(value_id)
+        posting = self.postings[value_id]
+        if not posting or posting[-1] < position:
+            posting.append(position)
+        elif posting[-1] != position:
+            index = bisect_left(posting, position)
+            if posting[index] != position:
+                posting.insert(index, position)
+
+    def remove(self, position: int, value: str) -> None:
+        """Record that the cocktail at ``position`` no longer carries ``value``."""
+        value_id = self.value_ids.get(value)
+        if value_id is None:
+            return
+        posting = self.postings[value_id]
+        index = bisect_left(posting, position)
+        if index < len(posting) and posting[index] == position:
+            del posting[index]
+
+    def state(self) -> Tuple[Any, ...]:
+        """Return the index contents as plain containers for serialization."""
+        return (self.values, self.lowered, self.postings, self.trigrams)
+
+    @classmethod
+    def from_state(cls, state: Tuple[Any, ...]) -> '_SubstringIndex':
+        """Rebuild an index from the tuple produced by ``state()``."""
+        index = cls()
+        index.values, index.lowered, index.postings, index.trigrams = state
+        index.value_ids = {value: value_id for value_id, value in enumerate(index.values)}
+        return index
+
+    def _candidates(self, query: str, case_sensitive: bool) -> Iterable[int]:
+        # Lowercasing a non-ASCII query is not guaranteed to map onto the
+        # lowercased value character for character, so only prune with the
+        # trigram table when that holds.
+        if len(query) < 3 or (case_sensitive and not query.isascii()):
+            return range(len(self.values))
+        grams = sorted((self.trigrams.get(g, ()) for g in _trigrams(query.lower())), key=len)
+        if not grams[0]:
+            return ()
+        return set(grams[0]).intersection(*grams[1:])
+
+    def search(self, query: str, case_sensitive: bool = False) -> List[int]:
+        """Return the sorted catalog positions whose value contains ``query``."""
+        values = self.values if case_sensitive else self.lowered
+        needle = query if case_sensitive else query.lower()
+        matched = [
+            self.postings[value_id]
+            for value_id in self._candidates(query, case_sensitive)
+            if needle in values[value_id]
+        ]
+        if len(matched) == 1:
+            return list(matched[0])
+        return sorted(set().union(*matched))
+
+
+class _ReadWriteLock:
+    """A lock any number of searches share and an update holds alone.
+
+    Both sides nest: a thread already reading or writing passes straight
+    through, and the writing thread may also read. A waiting writer keeps
+    new readers out, so a steady stream of searches cannot starve a delta.
+    Upgrading a read to a write would deadlock and raises instead.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._waiting_writers = 0
+        self._writer: Optional[int] = None
+        self._local = threading.local()
+
+    @contextmanager
+    def reading(self) -> Iterator[None]:
+        local = self._local
+        if getattr(local, 'reading', False) or self._writer == threading.get_ident():
+            yield
+            return
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        local.reading = True
+        try:
+            yield
+        finally:
+            local.reading = False
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def writing(self) -> Iterator[None]:
+        me = threading.get_ident()
+        if self._writer == me:
+            yield
+            return
+        if getattr(self._local, 'reading', False):
+            raise RuntimeError('Cannot update the catalog while this thread is reading it')
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+
+def _reads(method: Callable) -> Callable:
+    """Run a CocktailDB method under its read lock."""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock.reading():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def _writes(method: Callable) -> Callable:
+    """Run a CocktailDB method under its write lock."""
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock.writing():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class CocktailDB(CocktailStore):
+    def __init__(self, json_file: str, snapshot_file: Optional[str] = None, use_snapshot: bool = True,
+                 lazy_details: bool = False, detail_cache_size: int = 256):
+        """Initialize the database with the given JSON file.
+
+        If a snapshot built from the current ``json_file`` exists (see
+        ``cocktail_snapshot.py``) it is loaded instead of parsing the JSON.
+        ``snapshot_file`` defaults to the JSON path with a ``.snapshot``
+        extension.
+
+        With ``lazy_details`` the dump is streamed instead, and only summary
+        fields, recipes and indexes stay in memory; instructions and the
+        other detail fields are read back from the dump by byte offset when
+        accessed, keeping up to ``detail_cache_size`` decoded records. The
+        snapshot is not used in this mode.
+        """
+        self.json_file = json_file
+        # Searches read under this lock and upsert/delete write under it.
+        self._lock = _ReadWriteLock()
+        restored = False
+        # Similar-drink neighbors come from the snapshot or are computed on first use.
+        self._neighbor_state: Optional[Tuple[bytes, bytes]] = None
+        self._neighbors = None
+        # Positions changed while a fresh table is built in the background.
+        self._neighbor_changes: Optional[Set[int]] = None
+        # Set in lazy mode; its ``load.cache_info()`` reports the detail LRU.
+        self.details: Optional[DetailStore] = None
+        if use_snapshot and not lazy_details:
+            snapshot = Snapshot.open(snapshot_file or snapshot_path_for(json_file), json_file)
+            if snapshot is not None:
+                with snapshot:
+                    restored = self._restore(snapshot)
+        if lazy_details:
+            details = self.details = DetailStore(json_file, detail_cache_size)
+            self.ingredients = IngredientTable()
+            self.cocktails = [
+                LazyCocktail(raw, self.ingredients, details, details.add(offset, length))
+                for raw, offset, length in iter_dump_records(json_file)
+            ]
+            self._build_indexes()
+        elif not restored:
+            with open(json_file, 'r', encoding='utf-8') as f:
+                raw_cocktails = json.load(f)
+            self.ingredients = IngredientTable()
+            self.cocktails: List[Cocktail] = [Cocktail(raw, self.ingredients) for raw in raw_cocktails]
+            self._build_indexes()
+        self._positions_by_id = {
+            cocktail.id: position for position, cocktail in enumerate(self.cocktails) if cocktail is not None
+        }
+        self._build_pantry_index()
+        self._build_suggestions()
+        self._facets = FacetIndex(self.cocktails)
+        # Fuzzy word indexes are built on the first fuzzy query per field.
+        self._fuzzy_indexes: Dict[str, FuzzyIndex] = {}
+        # Instruction indexes are built the first time a language is queried.
+        self._text_indexes: Dict[str, TextIndex] = {}
+        # Parsed measures and their sorted totals, built on the first measure query.
+        self._measures: Optional[MeasureIndex] = None
+
+    @_reads
+    def snapshot_sections(self) -> Dict[str, Any]:
+        """Return the loaded catalog and its indexes as snapshot sections."""
+        return {
+            'ingredients': self.ingredients.names,
+            'cocktails': [None if cocktail is None else cocktail.state() for cocktail in self.cocktails],
+            'name_index': self._name_index.state(),
+            'ingredient_index': self._ingredient_index.state(),
+            'category_index': self._category_index.state(),
+            'neighbors': self.neighbor_table().state(),
+        }
+
+    def _restore(self, snapshot: 'Snapshot') -> bool:
+        """Load the catalog and indexes from ``snapshot``; returns False if it cannot be decoded."""
+        try:
+            self._restore_sections(snapshot)
+        except (ValueError, EOFError, TypeError, KeyError):
+            # Damaged in a way the section checksums did not catch.
+            self._neighbor_state = None
+            return False
+        return True
+
+    def _restore_sections(self, snapshot: 'Snapshot') -> None:
+        self.ingredients = IngredientTable()
+        for name in snapshot.load('ingredients'):
+            self.ingredients.intern(name)
+        self.cocktails = [
+            None if state is None else Cocktail.from_state(state, self.ingredients)
+            for state in snapshot.load('cocktails')
+        ]
+        self._name_index = _SubstringIndex.from_state(snapshot.load('name_index'))
+        self._ingredient_index = _SubstringIndex.from_state(snapshot.load('ingredient_index'))
+        self._category_index = _SubstringIndex.from_state(snapshot.load('category_index'))
+        self._neighbor_state = snapshot.load('neighbors')
+
+    def _build_indexes(self) -> None:
+        """Build the name, ingredient and category indexes in one pass."""
+        self._name_index = _SubstringIndex()
+        self._ingredient_index = _SubstringIndex()
+        self._category_index = _SubstringIndex()
+        names = self.ingredients.names
+        for position, cocktail in enumerate(self.cocktails):
+            if cocktail is None:
+                continue
+            self._name_index.add(position, cocktail.name or '')
+            for ingredient_id, _ in cocktail.recipe:
+                self._ingredient_index.add(position, names[ingredient_id])
+            if cocktail.category:
+                self._category_index.add(position, cocktail.category)
+
+    def _build_pantry_index(self) -> None:
+        """Index every recipe by the pantry ingredients it needs.
+
+        Ingredient names that differ only in case or surrounding whitespace
+        ("Lemon juice", "Lemon Juice") share one pantry id. Each pantry id
+        keeps the sorted positions of the drinks that need it, and
+        ``_recipe_sizes`` holds how many distinct pantry ids each drink needs.
+        """
+        self._pantry_ids_by_key: Dict[str, int] = {}
+        self._pantry_ids: List[int] = []
+        self._pantry_postings: List[List[int]] = []
+        self._extend_pantry_ids()
+        self._recipe_sizes = array('H', bytes(2 * len(self.cocktails)))
+        for position, cocktail in enumerate(self.cocktails):
+            if cocktail is not None:
+                self._add_recipe(position, cocktail)
+
+    def _extend_pantry_ids(self) -> None:
+        """Assign pantry ids to ingredient names interned since the last call."""
+        for name in self.ingredients.names[len(self._pantry_ids):]:
+            key = name.strip().lower()
+            pantry_id = self._pantry_ids_by_key.setdefault(key, len(self._pantry_ids_by_key))
+            if pantry_id == len(self._pantry_postings):
+                self._pantry_postings.append([])
+            self._pantry_ids.append(pantry_id)
+
+    def _recipe_pantry_ids(self, cocktail: Cocktail) -> Set[int]:
+        return {self._pantry_ids[ingredient_id] for ingredient_id, _ in cocktail.recipe}
+
+    def _add_recipe(self, position: int, cocktail: Cocktail) -> None:
+        pantry_ids = self._recipe_pantry_ids(cocktail)
+        for pantry_id in pantry_ids:
+            posting = self._pantry_postings[pantry_id]
+            if not posting or posting[-1] < position:
+                posting.append(position)
+            else:
+                insort(posting, position)
+        self._recipe_sizes[position] = len(pantry_ids)
+
+    def _remove_recipe(self, position: int, cocktail: Cocktail) -> None:
+        for pantry_id in self._recipe_pantry_ids(cocktail):
+            posting = self._pantry_postings[pantry_id]
+            index = bisect_left(posting, position)
+            if index < len(posting) and posting[index] == position:
+                del posting[index]
+        self._recipe_sizes[position] = 0
+
+    def _build_suggestions(self) -> None:
+        """Build the typeahead index, weighting each suggestion by its drink count."""
+        entries = []
+        for kind, index in (('name', self._name_index), ('ingredient', self._ingredient_index),
+                            ('category', self._category_index)):
+            entries.extend((value, kind, len(posting)) for value, posting in zip(index.values, index.postings) if value)
+        self._suggestions = SuggestIndex(entries)
+
+    @_reads
+    def neighbor_table(self) -> 'NeighborTable':
+        """Return the similar-drink ``NeighborTable``.
+
+        The table comes from the snapshot or is built on first use, in
+        time linear in the catalog (see ``cocktail_similar.MAX_FAN_OUT``).
+        Deltas patch it in place,
+        and once they add up to ``cocktail_similar.REBUILD_FRACTION`` of the
+        catalog a fresh table is built on a background thread and swapped in.
+        """
+        if self._neighbors is None:
+            # Imported here so processes that never ask for recommendations skip NumPy.
+            from cocktail_similar import NeighborTable
+
+            if self._neighbor_state is not None:
+                self._neighbors = NeighborTable.from_state(self._neighbor_state, self._describe,
+                                                           self._pantry_postings)
+            else:
+                self._neighbors = NeighborTable.build(self._describe, self._pantry_postings,
+                                                      len(self.cocktails))
+        return self._neighbors
+
+    def _describe(self, position: int) -> Tuple[List[int], Optional[str], Optional[str]]:
+        """A drink's distinct pantry ids, category and glass, for the neighbor table."""
+        cocktail = self.cocktails[position]
+        if cocktail is None:
+            return [], None, None
+        return sorted(self._recipe_pantry_ids(cocktail)), cocktail.category, cocktail.glass
+
+    def _update_neighbors(self, position: int) -> None:
+        """Patch the neighbor table, if there is one, after the drink at ``position`` changed."""
+        if self._neighbors is None and self._neighbor_state is None:
+            return
+        from cocktail_similar import REBUILD_FRACTION
+
+        self.neighbor_table().patch(position)
+        if self._neighbor_changes is not None:
+            self._neighbor_changes.add(position)
+        elif self._neighbors.changed > REBUILD_FRACTION * len(self.cocktails):
+            # Enough drinks changed that the IDF weights are stale. The
+            # patched table keeps serving while a fresh one is built off
+            # the lock.
+            self._neighbor_changes = set()
+            threading.Thread(target=self._rebuild_neighbors, name='neighbor-rebuild', daemon=True).start()
+
+    def _rebuild_neighbors(self) -> None:
+        """Build a fresh neighbor table from a copy of the catalog and swap it in."""
+        from cocktail_similar import NeighborTable
+
+        try:
+            with self._lock.reading():
+                descriptions = [self._describe(position) for position in range(len(self.cocktails))]
+            table = NeighborTable.build(descriptions.__getitem__, self._pantry_postings, len(descriptions))
+            with self._lock.writing():
+                table.catch_up(self._describe, sorted(self._neighbor_changes))
+                self._neighbors = table
+        finally:
+            self._neighbor_changes = None
+
+    @_reads
+    def warm_up(self, neighbors: bool = True) -> None:
+        """Build every index that is otherwise built on first use.
+
+        Call this before forking worker processes so the indexes are built
+        once and shared instead of being rebuilt in each worker. Pass
+        ``neighbors=False`` to skip the similar-drink table.
+        """
+        for field in ('name', 'ingredient'):
+            self._fuzzy_index(field)
+        for language in LANGUAGE_FIELDS:
+            self._text_index(language)
+        self._measure_index()
+        if neighbors:
+            self.neighbor_table()
+
+    def _collect(self, positions: List[int]) -> List[Cocktail]:
+        cocktails = self.cocktails
+        # A delta applied while a search runs can leave a deleted position behind.
+        return [cocktail for cocktail in map(cocktails.__getitem__, positions) if cocktail is not None]
+
+    def __iter__(self) -> Iterator[Cocktail]:
+        """Iterate over the live cocktails in catalog order."""
+        return (cocktail for cocktail in self.cocktails if cocktail is not None)
+
+    def __len__(self) -> int:
+        return len(self._positions_by_id)
+
+    def reading(self):
+        """Hold off ``upsert`` and ``delete`` from other threads within a ``with`` block.
+
+        Every search takes this lock on its own; hold it across several
+        calls when their results must come from the same catalog.
+        """
+        return self._lock.reading()
+
+    def writing(self):
+        """Keep searches on other threads out within a ``with`` block, e.g. to apply a batch of deltas."""
+        return self._lock.writing()
+
+    @_writes
+    def upsert(self, raw: Dict[str, Any]) -> None:
+        """Add a drink, or replace the one with the same ``idDrink``.
+
+        Every index is updated in place, in time proportional to the size of
+        the record rather than the catalog. A replaced drink keeps its
+        catalog position; a new one is appended. A built similar-drink table is
+        patched too, in time linear in the catalog (see
+        ``cocktail_similar.NeighborTable``).
+        """
+        drink_id = raw.get('idDrink')
+        if not isinstance(drink_id, str) or not drink_id:
+            raise ValueError('A drink needs a non-empty string idDrink')
+        cocktail = Cocktail(raw, self.ingredients)
+        self._extend_pantry_ids()
+        position = self._positions_by_id.get(drink_id)
+        if position is None:
+            position = len(self.cocktails)
+            self.cocktails.append(cocktail)
+            self._recipe_sizes.append(0)
+        else:
+            self._unindex(position, self.cocktails[position])
+            self.cocktails[position] = cocktail
+        self._index(position, cocktail)
+        self._positions_by_id[drink_id] = position
+        self._update_neighbors(position)
+
+    @_writes
+    def delete(self, drink_id: str) -> bool:
+        """Remove a drink from the catalog and its indexes; returns whether it existed.
+
+        Its catalog position is left as a ``None`` tombstone so every other
+        position stays valid.
+        """
+        position = self._positions_by_id.pop(drink_id, None)
+        if position is None:
+            return False
+        self._unindex(position, self.cocktails[position])
+        self.cocktails[position] = None
+        self._update_neighbors(position)
+        return True
+
+    def _suggestion_values(self, cocktail: Cocktail) -> List[Tuple[str, str]]:
+        """The distinct ``(value, kind)`` suggestions a cocktail counts towards."""
+        names = self.ingredients.names
+        values = {(names[ingredient_id], 'ingredient') for ingredient_id, _ in cocktail.recipe}
+        values.add((cocktail.name or '', 'name'))
+        values.add((cocktail.category or '', 'category'))
+        return [(value, kind) for value, kind in values if value]
+
+    def _index(self, position: int, cocktail: Cocktail) -> None:
+        names = self.ingredients.names
+        self._name_index.add(position, cocktail.name or '')
+        for ingredient_id, _ in cocktail.recipe:
+            self._ingredient_index.add(position, names[ingredient_id])
+        if cocktail.category:
+            self._category_index.add(position, cocktail.category)
+        self._add_recipe(position, cocktail)
+        self._facets.add(position, cocktail)
+        for language, index in self._text_indexes.items():
+            index.add(position, cocktail.get(LANGUAGE_FIELDS[language]))
+        if self._measures is not None:
+            self._measures.add(position, cocktail)
+        for field, fuzzy in self._fuzzy_indexes.items():
+            values = self._fuzzy_sources()[field].values
+            for value_id in range(len(fuzzy.word_counts), len(values)):
+                fuzzy.add(value_id, values[value_id])
+        for value, kind in self._suggestion_values(cocktail):
+            self._suggestions.adjust(value, kind, 1)
+
+    def _unindex(self, position: int, cocktail: Cocktail) -> None:
+        names = self.ingredients.names
+        self._name_index.remove(position, cocktail.name or '')
+        for ingredient_id, _ in cocktail.recipe:
+            self._ingredient_index.remove(position, names[ingredient_id])
+        if cocktail.category:
+            self._category_index.remove(position, cocktail.category)
+        self._remove_recipe(position, cocktail)
+        self._facets.remove(position, cocktail)
+        for language, index in self._text_indexes.items():
+            index.remove(position, cocktail.get(LANGUAGE_FIELDS[language]))
+        if self._measures is not None:
+            self._measures.remove(position)
+        for value, kind in self._suggestion_values(cocktail):
+            self._suggestions.adjust(value, kind, -1)
+
+    @_reads
+    def get_cocktail_by_id(self, drink_id: str) -> Optional[Cocktail]:
+        """Get a cocktail by its ID."""
+        position = self._positions_by_id.get(drink_id)
+        return None if position is None else self.cocktails[position]
+
+    @_reads
+    def position_of(self, drink_id: str) -> Optional[int]:
+        """Return a drink's catalog position, or None if it is unknown."""
+        return self._positions_by_id.get(drink_id)
+
+    def shard(self, start: int, end: int) -> 'CocktailDB':
+        """Return a CocktailDB that searches only the drinks at positions ``[start, end)``.
+
+        The shard shares this catalog's records and keeps their positions,
+        with ``None`` tombstones elsewhere, and builds its own search
+        indexes over them. It answers the name, ingredient, category, fuzzy
+        and text searches (and takes ``upsert``/``delete`` for its drinks);
+        its facets and suggestions are left empty. Used by
+        ``cocktail_shards.py``.
+        """
+        shard = CocktailDB.__new__(CocktailDB)
+        shard.json_file = self.json_file
+        shard._lock = _ReadWriteLock()
+        shard.details = self.details
+        shard._neighbor_state = shard._neighbors = shard._neighbor_changes = None
+        # A copy, with its own lock: shards are built in forked workers, where
+        # a lock some other thread held at the fork would never be released.
+        shard.ingredients = self.ingredients.copy()
+        shard.cocktails = [None] * start + self.cocktails[start:end]
+        shard._build_indexes()
+        shard._positions_by_id = {
+            cocktail.id: position for position, cocktail in enumerate(shard.cocktails[start:], start)
+            if cocktail is not None
+        }
+        shard._build_pantry_index()
+        shard._suggestions = SuggestIndex([])
+        shard._facets = FacetIndex([])
+        shard._fuzzy_indexes = {}
+        shard._text_indexes = {}
+        shard._measures = None
+        return shard
+
+    @_reads
+    def search_by_name(self, name: str, case_sensitive: bool = False) -> List[Cocktail]:
         """Search for cocktails by name."""
-        results = []
-        name = name if case_sensitive else name.lower()
-        
-        for cocktail in self.cocktails:
-            cocktail_name = cocktail.get('strDrink', '')
-            if not case_sensitive:
-                cocktail_name = cocktail_name.lower()
-            if name in cocktail_name:
-                results.append(cocktail)
-        return results
+        return self._collect(self._name_index.search(name, case_sensitive))
     
-    def search_by_ingredient(self, ingredient: str, case_sensitive: bool = False) -> List[Dict[str, Any]]:
+    @_reads
+    def search_by_ingredient(self, ingredient: str, case_sensitive: bool = False) -> List[Cocktail]:
         """Search for cocktails containing a specific ingredient."""
-        results = []
-        ingredient = ingredient if case_sensitive else ingredient.lower()
-        
-        for cocktail in self.cocktails:
-            # Check all ingredient fields (strIngredient1 through strIngredient15)
-            for i in range(1, 16):
-                ingredient_key = f'strIngredient{i}'
-                if ingredient_key in cocktail and cocktail[ingredient_key]:
-                    cocktail_ingredient = cocktail[ingredient_key]
-                    if not case_sensitive:
-                        cocktail_ingredient = cocktail_ingredient.lower()
-                    if ingredient in cocktail_ingredient:
-                        results.append(cocktail)
-                        break  # No need to check other ingredients for this cocktail
-        return results
+        return self._collect(self._ingredient_index.search(ingredient, case_sensitive))
     
-    def search_by_category(self, category: str, case_sensitive: bool = False) -> List[Dict[str, Any]]:
+    @_reads
+    def search_by_category(self, category: str, case_sensitive: bool = False) -> List[Cocktail]:
         """Search for cocktails by category."""
-        category = category if case_sensitive else category.lower()
-        return [
-            cocktail for cocktail in self.cocktails
-            if cocktail.get('strCategory') and 
-            (category in (cocktail['strCategory'].lower() if not case_sensitive else cocktail['strCategory']))
-        ]
+        return self._collect(self._category_index.search(category, case_sensitive))
+
+    def _fuzzy_sources(self) -> Dict[str, '_SubstringIndex']:
+        return {'name': self._name_index, 'ingredient': self._ingredient_index}
+
+    def _fuzzy_index(self, field: str) -> Tuple['_SubstringIndex', FuzzyIndex]:
+        indexes = self._fuzzy_sources()
+        if field not in indexes:
+            raise ValueError(f"Fuzzy search supports 'name' and 'ingredient', not {field!r}")
+        index = indexes[field]
+        fuzzy = self._fuzzy_indexes.get(field)
+        if fuzzy is None:
+            fuzzy = self._fuzzy_indexes[field] = FuzzyIndex(index.values)
+        return index, fuzzy
+
+    @_reads
+    def search_fuzzy(self, query: str, field: str = 'name', max_distance: int = 2) -> List[Cocktail]:
+        """Search names or ingredients, tolerating typos.
+
+        Every word of ``query`` must be within ``max_distance`` edits of a
+        word of the drink's name (or of one of its ingredients); words of up
+        to five letters get a smaller budget. Results are ranked by total
+        edit distance, then by how few extra words the match has.
+        """
+        ranks = self._fuzzy_ranks(query, field, max_distance)
+        return self._collect(sorted(ranks, key=lambda position: (ranks[position], position)))
+
+    def _fuzzy_ranks(self, query: str, field: str, max_distance: int) -> Dict[int, Tuple[int, int]]:
+        """Return ``{position: (edit distance, extra words)}`` for a fuzzy search."""
+        index, fuzzy = self._fuzzy_index(field)
+        ranks: Dict[int, Tuple[int, int]] = {}
+        for value_id, rank in fuzzy.search(query, max_distance).items():
+            for position in index.postings[value_id]:
+                if position not in ranks or rank < ranks[position]:
+                    ranks[position] = rank
+        return ranks
+
+    def _text_index(self, language: str) -> TextIndex:
+        field = LANGUAGE_FIELDS.get(language)
+        if field is None:
+            raise ValueError(f"Unsupported language {language!r}; expected one of {', '.join(LANGUAGE_FIELDS)}")
+        index = self._text_indexes.get(language)
+        if index is None:
+            index = TextIndex((position, cocktail.get(field))
+                              for position, cocktail in enumerate(self.cocktails) if cocktail is not None)
+            self._text_indexes[language] = index
+        return index
+
+    @_reads
+    def search_by_text(self, query: str, language: str = 'en', limit: Optional[int] = None) -> List[Cocktail]:
+        """Search cocktail instructions in the given language, best matches first.
+
+        ``language`` is one of ``en``, ``es``, ``de``, ``fr`` or ``it``.
+        Matches are ranked with BM25; pass ``limit`` to keep only the top hits.
+        """
+        hits = self._text_index(language).search(query, limit)
+        return self._collect([position for position, _ in hits])
+
+    @_reads
+    def count_by_text(self, query: str, language: str = 'en') -> int:
+        """Return how many cocktails ``search_by_text`` would match."""
+        return self._text_index(language).count(query)
+
+    def _measure_index(self) -> MeasureIndex:
+        if self._measures is None:
+            self._measures = MeasureIndex(self.cocktails)
+        return self._measures
+
+    @_reads
+    def measures(self, drink_id: str) -> Optional[DrinkMeasures]:
+        """Return a drink's parsed measures and derived totals, or None if it is unknown."""
+        position = self._positions_by_id.get(drink_id)
+        return None if position is None else self._measure_index().drinks[position]
+
+    @_reads
+    def search_by_measure(self, metric: str, minimum: Optional[float] = None,
+                          maximum: Optional[float] = None, descending: bool = False,
+                          limit: Optional[int] = None, exact: bool = False) -> List[Cocktail]:
+        """Find drinks whose derived ``metric`` lies between ``minimum`` and ``maximum``.
+
+        ``metric`` is ``total_ml``, ``spirit_ml``, ``spirit_share`` (spirit
+        volume over total volume) or ``ingredient_count``; both bounds are
+        inclusive and optional. Results are ordered by the metric, smallest
+        first unless ``descending``, so the strongest drinks are::
+
+            db.search_by_measure('spirit_share', descending=True, limit=10)
+
+        Drinks with no parseable volume are left out of the volume metrics.
+        Measures are free text, so totals can rest on estimates ("dash",
+        "1-2 oz") or leave unmeasured ingredients out; pass ``exact=True``
+        to consider only drinks where every ingredient has an exact volume.
+        """
+        return self._collect(self._measure_index().range(metric, minimum, maximum, descending, limit, exact))
+
+    @_reads
+    def count_by_measure(self, metric: str, minimum: Optional[float] = None,
+                         maximum: Optional[float] = None, exact: bool = False) -> int:
+        """Return how many cocktails ``search_by_measure`` would return without a limit."""
+        return self._measure_index().count(metric, minimum, maximum, exact)
+
+    def _filter_bitmap(self, spec: Dict[str, Any]) -> int:
+        if not isinstance(spec, dict):
+            raise ValueError('Each filter must be an object')
+        bitmap = self._facets.all
+        for key, value in spec.items():
+            values = value if isinstance(value, list) else [value]
+            if key == 'all':
+                for part in values:
+                    bitmap &= self._filter_bitmap(part)
+            elif key == 'any':
+                union = 0
+                for part in values:
+                    union |= self._filter_bitmap(part)
+                bitmap &= union
+            elif key == 'not':
+                for part in values:
+                    bitmap &= ~self._filter_bitmap(part)
+            elif key in METRICS:
+                if not isinstance(value, dict) or not set(value) <= {'min', 'max'} or not all(
+                        isinstance(bound, (int, float)) and not isinstance(bound, bool) for bound in value.values()):
+                    raise ValueError(f'{key!r} takes an object with numeric "min" and/or "max"')
+                positions = self._measure_index().range(key, value.get('min'), value.get('max'))
+                bitmap &= positions_to_bitmap(positions, self._facets.size)
+            elif key in ('name', 'ingredient') or key in FACETS:
+                if not all(isinstance(v, str) for v in values):
+                    raise ValueError(f'Values for {key!r} must be strings')
+                union = 0
+                for v in values:
+                    if key == 'name':
+                        union |= positions_to_bitmap(self._name_index.search(v), self._facets.size)
+                    elif key == 'ingredient':
+                        union |= positions_to_bitmap(self._ingredient_index.search(v), self._facets.size)
+                    else:
+                        union |= self._facets.bitmap(key, v)
+                bitmap &= union
+            else:
+                raise ValueError(f'Unknown filter {key!r}')
+        return bitmap
 
-def print_cocktail(cocktail: Dict[str, Any]) -> None:
+    @_reads
+    def query(self, spec: Dict[str, Any],
+              facet_limit: Optional[int] = None) -> Tuple[List[Cocktail], Dict[str, Dict[str, int]]]:
+        """Run a structured filter and count facet values over its results.
+
+        ``spec`` maps filters to values; all of its entries must hold.
+        ``name`` and ``ingredient`` match substrings like the search_by_*
+        methods, while ``category``, ``alcoholic``, ``glass``, ``iba`` and
+        ``tag`` match whole values, ignoring case. A list of values matches
+        any of them, and ``all``/``any``/``not`` take nested filters::
+
+            {'category': 'Ordinary Drink', 'alcoholic': 'Non alcoholic',
+             'any': [{'glass': 'Highball glass'}, {'ingredient': 'lime'}]}
+
+        The measure metrics of ``search_by_measure`` take inclusive ranges,
+        e.g. ``{'total_ml': {'max': 150}, 'ingredient_count': {'max': 3}}``.
+
+        Returns the matching cocktails in catalog order and, per facet, the
+        number of results carrying each value.
+        """
+        bitmap = self._filter_bitmap(spec)
+        return self._collect(bitmap_to_positions(bitmap)), self._facets.counts(bitmap, facet_limit)
+
+    @_reads
+    def similar(self, drink_id: str, k: int = 5) -> List[Cocktail]:
+        """Return up to ``k`` drinks most similar to ``drink_id``.
+
+        Similarity is IDF-weighted cosine over ingredients, with shared
+        category and then glass breaking ties. Neighbors are precomputed
+        for the whole catalog, so this is a lookup; ``k`` is capped at
+        ``cocktail_similar.MAX_NEIGHBORS``.
+        """
+        position = self._positions_by_id.get(drink_id)
+        if position is None:
+            return []
+        row = self.neighbor_table().neighbors[position][:k]
+        return self._collect([int(neighbor) for neighbor in row if neighbor >= 0])
+
+    @_reads
+    def featured(self, limit: int = 6) -> List[Cocktail]:
+        """Return the first ``limit`` drinks of the catalog, for landing pages.
+
+        Only ``limit`` drinks are visited, instead of the whole catalog that
+        ``search_by_name('')`` would scan and copy.
+        """
+        return list(islice(self, limit))
+
+    @_reads
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, int]]:
+        """Complete ``prefix`` to drink names, ingredients or categories.
+
+        Returns ``(text, kind, drink count)`` tuples, most common first, where
+        kind is ``name``, ``ingredient`` or ``category``. Any word of a
+        suggestion can match the prefix.
+        """
+        return self._suggestions.suggest(prefix, limit)
+
+    @_reads
+    def search_by_pantry(self, ingredients: Iterable[str],
+                         max_missing: int = 0) -> List[Tuple[Cocktail, List[str]]]:
+        """Find cocktails that can be made from the given ingredients.
+
+        Ingredient names are matched whole and case-insensitively. Returns
+        ``(cocktail, missing ingredient names)`` pairs for every cocktail
+        missing at most ``max_missing`` ingredients, fewest missing first.
+        """
+        import numpy as np
+
+        pantry = {self._pantry_ids_by_key.get(ingredient.strip().lower()) for ingredient in ingredients}
+        pantry.discard(None)
+        # Each drink's missing count is its recipe size less the pantry
+        # ingredients it uses, counted over the pantry's postings at once.
+        # A view rather than a copy of the sizes. It pins the array's buffer,
+        # and upsert cannot append to it while any view is alive, so the
+        # view must not outlive the read lock.
+        sizes = np.frombuffer(self._recipe_sizes, dtype=np.uint16)
+        try:
+            postings = [self._pantry_postings[pantry_id] for pantry_id in pantry]
+            present = np.zeros(len(sizes), dtype=np.int32)
+            if any(postings):
+                used = np.concatenate([np.array(posting, dtype=np.intp) for posting in postings])
+                present = np.bincount(used, minlength=len(sizes))[:len(sizes)]
+            missing = sizes - present
+            positions = np.flatnonzero((sizes > 0) & (missing <= max_missing))
+        finally:
+            del sizes
+        positions = positions[np.argsort(missing[positions], kind='stable')]
+
+        names = self.ingredients.names
+        results = []
+        for position in positions.tolist():
+            cocktail = self.cocktails[position]
+            if cocktail is None:
+                continue
+            missing_names = []
+            reported = set()
+            for ingredient_id, _ in cocktail.recipe:
+                pantry_id = self._pantry_ids[ingredient_id]
+                if pantry_id not in pantry and pantry_id not in reported:
+                    missing_names.append(names[ingredient_id])
+                    reported.add(pantry_id)
+            results.append((cocktail, missing_names))
+        return results
+
+def print_cocktail(cocktail: Mapping) -> None:
     """Print a formatted cocktail recipe."""
     print(f"\n{'='*50}")
     print(f"Name: {cocktail.get('strDrink', 'N/A')}")
@@ -73,9 +1107,26 @@ def print_cocktail(cocktail: Dict[str, Any]) -> None:
         print(f"\nImage: {cocktail['strDrinkThumb']}")
 
 def main():
+    parser = argparse.ArgumentParser(description='Search the cocktail catalog.')
+    parser.add_argument('--json-file', default='cocktaildb_dump.json',
+                        help='JSON dump, or an SQLite catalog (.sqlite, .sqlite3 or .db)')
+    parser.add_argument('--batch', metavar='FILE',
+                        help="answer JSONL queries from FILE ('-' for stdin) instead of the menu")
+    parser.add_argument('--workers', type=int, default=0,
+                        help='batch worker processes (default: one per CPU)')
+    parser.add_argument('--chunk-size', type=int, default=256, help='batch queries sent to a worker at a time')
+    parser.add_argument('--fields', choices=('ids', 'full'), default='ids',
+                        help='batch results as drink ids or full records')
+    parser.add_argument('--limit', type=int, help='keep at most this many batch results per query')
+    args = parser.parse_args()
+    if args.batch:
+        import cocktail_batch
+        cocktail_batch.main(args)
+        return
+
     # Initialize the database
     try:
-        db = CocktailDB('cocktaildb_dump.json')
+        db = open_store(args.json_file)
         print("Cocktail database loaded successfully!")
     except Exception as e:
         print(f"Error loading database: {e}")
@@ -0,0 +1,258 @@
+"""Pre-forking production server for the Flask app.
+
+The master process imports ``app`` (loading the catalog, its prebuilt JSON
+payloads and, via ``CocktailDB.warm_up``, every lazily built search index), calls
+``gc.freeze()`` so the collector never touches those objects again, and
+then forks worker processes that accept connections on one shared
+listening socket. Workers inherit the catalog copy-on-write, so its memory
+is paid roughly once however many workers run.
+
+The master also owns hot reload: it polls the dump instead of each worker
+doing so, and when the catalog changes it forks a fresh set of workers
+from the new state and retires the old ones gracefully.
+
+Signals sent to the master:
+
+* ``SIGHUP``  reload the catalog if the dump changed, then recycle workers
+* ``SIGTERM``/``SIGINT``  stop accepting, let in-flight requests finish, exit
+
+Workers also retire themselves after ``--max-requests`` requests (with
+jitter so they do not all restart together). Metrics on ``/metrics`` are
+per worker.
+
+    python cocktail_server.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import logging
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Set
+
+from werkzeug.serving import make_server
+
+logger = logging.getLogger('cocktail_server')
+
+# Seconds a retiring worker gets to finish in-flight requests before SIGKILL.
+GRACEFUL_TIMEOUT = 30.0
+
+# How often a worker wakes up to check for a shutdown request.
+_WORKER_TICK = 1.0
+
+
+def _worker(listener: socket.socket, max_requests: int) -> int:
+    """Serve requests on ``listener`` until told to stop or ``max_requests`` is reached."""
+    import app as flask_app
+
+    gc.enable()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    served = 0
+
+    def counted(environ, start_response):
+        nonlocal served
+        served += 1
+        return flask_app.app(environ, start_response)
+
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, counted, fd=listener.fileno())
+    # The listener is shared and non-blocking: when another worker wins the
+    # race for a connection, accept() fails fast instead of stalling this one.
+    server.socket.setblocking(False)
+    server.timeout = _WORKER_TICK
+    while not stopping and (not max_requests or served < max_requests):
+        server.handle_request()
+    server.socket.close()
+    return 0
+
+
+class Master:
+    """Forks, watches and recycles the worker processes."""
+
+    def __init__(self, host: str, port: int, workers: int, max_requests: int = 0,
+                 max_requests_jitter: int = 0, graceful_timeout: float = GRACEFUL_TIMEOUT,
+                 reload_interval: float = 5.0):
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.reload_interval = reload_interval
+        self.listener = socket.create_server((host, port), backlog=2048)
+        self.listener.setblocking(False)
+        self._children: Set[int] = set()
+        self._retiring: Dict[int, float] = {}   # pid -> deadline for SIGKILL
+        self._stopping = False
+        self._recycle_requested = False
+
+    def _load(self) -> None:
+        import app as flask_app
+
+        self.catalog = flask_app.catalog
+        # The master polls the dump itself; a watcher thread must not be
+        # running across fork().
+        self.catalog.stop_watching()
+        self._warm_up(self.catalog.state)
+        self.catalog.on_reload(self._warm_up)
+        self._freeze()
+
+    @staticmethod
+    def _warm_up(state) -> None:
+        # An SQLite catalog has no in-memory indexes to build. The
+        # similar-drink table is left to the snapshot or the first /similar
+        # request rather than rebuilt on every reload.
+        warm_up = getattr(state.db, 'warm_up', None)
+        if warm_up is not None:
+            warm_up(neighbors=False)
+
+    @staticmethod
+    def _freeze() -> None:
+        # Collect garbage once, then move every surviving object into the
+        # permanent generation so collections in the workers never write to
+        # (and so copy) the pages holding the catalog.
+        gc.collect()
+        gc.freeze()
+
+    def _spawn(self) -> None:
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        gc.disable()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _worker(self.listener, max_requests)
+            except BaseException:
+                logger.exception('Worker %d crashed', os.getpid())
+            finally:
+                os._exit(code)
+        gc.enable()
+        self._children.add(pid)
+        logger.info('Started worker %d', pid)
+
+    def _retire(self, pids) -> None:
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            if pid in self._children and pid not in self._retiring:
+                self._retiring[pid] = deadline
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if pid == 0:
+                break
+            self._children.discard(pid)
+            if self._retiring.pop(pid, None) is None:
+                logger.info('Worker %d exited (status %d)', pid, os.waitstatus_to_exitcode(status))
+        now = time.monotonic()
+        for pid, deadline in list(self._retiring.items()):
+            if now > deadline:
+                logger.warning('Worker %d did not stop in time; killing it', pid)
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                self._retiring[pid] = now + self.graceful_timeout
+
+    def _recycle(self) -> None:
+        """Replace every worker, starting the new ones before retiring the old."""
+        old = set(self._children)
+        self._freeze()
+        for _ in range(self.workers):
+            self._spawn()
+        self._retire(old)
+
+    def run(self) -> None:
+        self._load()
+
+        def request_stop(signum, frame):
+            self._stopping = True
+
+        def request_recycle(signum, frame):
+            self._recycle_requested = True
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGHUP, request_recycle)
+
+        host, port = self.listener.getsockname()[:2]
+        logger.info('Serving on http://%s:%d with %d workers', host, port, self.workers)
+        for _ in range(self.workers):
+            self._spawn()
+
+        next_poll = time.monotonic() + self.reload_interval
+        while not self._stopping:
+            time.sleep(0.2)
+            self._reap()
+            if time.monotonic() >= next_poll:
+                next_poll = time.monotonic() + self.reload_interval
+                if self.catalog.reload_if_changed():
+                    self._recycle_requested = True
+            if self._recycle_requested:
+                self._recycle_requested = False
+                self.catalog.reload_if_changed()
+                self._recycle()
+            # Replace workers that exited on their own (max_requests or a crash).
+            for _ in range(self.workers - (len(self._children) - len(self._retiring))):
+                self._spawn()
+
+        logger.info('Shutting down')
+        self._retire(set(self._children))
+        while self._children:
+            time.sleep(0.1)
+            self._reap()
+        self.listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the cocktail search app with pre-forked workers.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-requests', type=int, default=0,
+                        help='recycle a worker after this many requests (0 = never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=0,
+                        help='add up to this many requests to each worker\'s limit')
+    parser.add_argument('--graceful-timeout', type=float, default=GRACEFUL_TIMEOUT,
+                        help='seconds a retiring worker may take before it is killed')
+    parser.add_argument('--shared-cache', metavar='PATH',
+                        help='SQLite file for a response cache shared by all workers')
+    parser.add_argument('--reload-interval', type=float, default=5.0,
+                        help='seconds between checks of the dump for changes')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit('cocktail_server.py needs os.fork(); use app.py on this platform.')
+    if args.shared_cache:
+        os.environ['COCKTAILDB_SHARED_CACHE'] = args.shared_cache
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(process)d] %(levelname)s %(message)s')
+    if os.environ.pop('COCKTAILDB_SHARDS', None):
+        # Shard workers talk to one parent over pipes, which forked server
+        # workers would share; the server already spreads requests over cores.
+        logging.warning('COCKTAILDB_SHARDS is ignored by cocktail_server.py')
+    Master(args.host, args.port, args.workers, args.max_requests, args.max_requests_jitter,
+           args.graceful_timeout, args.reload_interval).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+"""Sharded, multi-process query execution for large catalogs.
+
+``ShardedCocktailDB`` wraps a loaded ``CocktailDB`` and splits its catalog
+positions into contiguous ranges, one per long-lived worker process. Each
+worker is forked from the loaded catalog and builds its own indexes over
+its range only (``CocktailDB.shard``), so the name, ingredient, category,
+fuzzy and full-text searches run on every shard at once and the merge is
+cheap:
+
+* substring searches concatenate the shards' positions, which are already
+  in catalog order;
+* fuzzy and text searches merge the shards' ranked lists by the same keys
+  ``CocktailDB`` sorts by, keeping only the top ``limit`` text hits. BM25
+  scores use corpus statistics summed over every shard, collected in a
+  first round trip, so the ranking is exactly that of one index.
+
+Workers return catalog positions, never records: each writes its results
+into its own shared-memory buffer (positions as int64, sort keys as
+float64) and replies with just their count, and the parent looks the
+records up in its own copy of the catalog. Results too large for the
+buffer go over the pipe instead. Every other method is answered by the
+wrapped ``CocktailDB``.
+
+Fan-out pays a pipe round trip per shard, so sharding only helps catalogs
+large enough for a search to take milliseconds. Each shard has its own
+lock, held from sending a request until its reply is read, and searches
+take them in shard order: concurrent searches queue behind one another
+shard by shard instead of waiting for a whole search to be merged.
+
+Workers are forked from the thread that creates the ``ShardedCocktailDB``
+(``SharedCocktailDB`` does so from its watcher thread on reload). A forked
+child has only that thread, and any lock another thread held at the time
+stays held in the child forever, so workers only use the shard they build
+after the fork, whose locks are their own, and never log. Python 3.12
+and later warn about forking a multi-threaded process for this reason.
+
+    db = ShardedCocktailDB(CocktailDB('cocktaildb_dump.json'), shards=4)
+"""
+import heapq
+import multiprocessing
+import threading
+import weakref
+from array import array
+from bisect import bisect_right
+from itertools import islice
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from cocktail_search import Cocktail, CocktailDB
+from cocktail_store import CocktailStore
+from cocktail_text import Statistics
+
+# Bytes per result in a shard's buffer: an int64 position and a float64 key.
+_ITEM_SIZE = 16
+
+# Seconds a stopping worker gets to exit before it is terminated.
+_STOP_TIMEOUT = 5.0
+
+_SUBSTRING_FIELDS = ('name', 'ingredient', 'category')
+
+# Operations whose replies are ``Results``, sent through the shared buffer.
+_RESULT_OPERATIONS = frozenset({'substring', 'fuzzy', 'text'})
+
+# Positions and sort keys (None when the results are in catalog order).
+Results = Tuple[List[int], Optional[List[float]]]
+
+
+class _Worker(NamedTuple):
+    process: Any
+    connection: Any
+    memory: SharedMemory
+    capacity: int
+    # Held from sending a request to this worker until its reply is read.
+    lock: threading.Lock
+
+
+def _handle(shard: CocktailDB, operation: str, args: tuple) -> Any:
+    """Run one request on a shard."""
+    if operation == 'substring':
+        field, query, case_sensitive = args
+        if field not in _SUBSTRING_FIELDS:
+            raise ValueError(f'Unknown search field {field!r}')
+        index = getattr(shard, f'_{field}_index')
+        return index.search(query, case_sensitive), None
+    if operation == 'fuzzy':
+        query, field, max_distance = args
+        ranks = shard._fuzzy_ranks(query, field, max_distance)
+        ordered = sorted(ranks, key=lambda position: (ranks[position], position))
+        # (distance, extra words) as one float that sorts the same way.
+        return ordered, [ranks[position][0] * 65536.0 + ranks[position][1] for position in ordered]
+    if operation == 'text_statistics':
+        language, query = args
+        return shard._text_index(language).statistics(query)
+    if operation == 'text':
+        language, query, limit, statistics = args
+        hits = shard._text_index(language).search(query, limit, statistics)
+        return [position for position, _ in hits], [-score for _, score in hits]
+    if operation == 'count_text':
+        language, query = args
+        return shard._text_index(language).count(query)
+    if operation == 'upsert':
+        return shard.upsert(*args)
+    if operation == 'delete':
+        return shard.delete(*args)
+    raise ValueError(f'Unknown shard operation {operation!r}')
+
+
+def _serve(db: CocktailDB, start: int, end: int, connection, memory: SharedMemory, capacity: int) -> None:
+    """Worker loop: build the shard, then answer requests until told to stop."""
+    shard = db.shard(start, end)
+    shard.warm_up(neighbors=False)
+    positions_view = memory.buf[:capacity * 8].cast('q')
+    keys_view = memory.buf[capacity * 8:capacity * _ITEM_SIZE].cast('d')
+    connection.send(('value', len(shard)))
+    try:
+        while True:
+            try:
+                operation, *args = connection.recv()
+            except EOFError:
+                break
+            if operation == 'stop':
+                break
+            try:
+                result = _handle(shard, operation, tuple(args))
+            except Exception as e:
+                connection.send(('error', e))
+                continue
+            if operation not in _RESULT_OPERATIONS:
+                connection.send(('value', result))
+                continue
+            positions, keys = result
+            if len(positions) > capacity:
+                connection.send(('list', positions, keys))
+                continue
+            positions_view[:len(positions)] = array('q', positions)
+            if keys is not None:
+                keys_view[:len(keys)] = array('d', keys)
+            connection.send(('shared', len(positions), keys is not None))
+    finally:
+        positions_view.release()
+        keys_view.release()
+        connection.close()
+
+
+def _stop(workers: List[_Worker]) -> None:
+    for worker in workers:
+        try:
+            worker.connection.send(('stop',))
+        except (OSError, ValueError):
+            pass
+    for worker in workers:
+        worker.process.join(_STOP_TIMEOUT)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join()
+        worker.connection.close()
+        worker.memory.close()
+        worker.memory.unlink()
+
+
+class ShardedCocktailDB(CocktailStore):
+    """A ``CocktailDB`` whose searches run across ``shards`` worker processes.
+
+    Needs the ``fork`` start method: workers inherit ``db`` instead of
+    loading the catalog again. Deltas applied through ``upsert`` and
+    ``delete`` update ``db`` and the shard holding the drink; new drinks
+    join the last shard. Call ``close`` (or use it as a context manager) to
+    stop the workers; they are also stopped when it is garbage collected.
+    """
+
+    def __init__(self, db: CocktailDB, shards: int):
+        if shards < 1:
+            raise ValueError('shards must be at least 1')
+        self.db = db
+        size = len(db.cocktails)
+        bounds = [size * shard // shards for shard in range(shards + 1)]
+        self._starts = bounds[:-1]
+        self._workers: List[_Worker] = []
+        self._finalizer = weakref.finalize(self, _stop, self._workers)
+        context = multiprocessing.get_context('fork')
+        for shard, (start, end) in enumerate(zip(bounds, bounds[1:])):
+            capacity = max(end - start, 1)
+            memory = SharedMemory(create=True, size=capacity * _ITEM_SIZE)
+            connection, child_connection = context.Pipe()
+            process = context.Process(target=_serve, name=f'cocktaildb-shard-{shard}', daemon=True,
+                                      args=(db, start, end, child_connection, memory, capacity))
+            process.start()
+            child_connection.close()
+            self._workers.append(_Worker(process, connection, memory, capacity, threading.Lock()))
+        try:
+            # Every worker reports its drink count once its indexes are built.
+            for worker in self._workers:
+                self._receive(worker)
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def shards(self) -> int:
+        return len(self._workers)
+
+    def close(self) -> None:
+        """Stop the worker processes and free their buffers."""
+        self._finalizer()
+
+    def __enter__(self) -> 'ShardedCocktailDB':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.db, name)
+
+    def __iter__(self) -> Iterator[Cocktail]:
+        return iter(self.db)
+
+    def __len__(self) -> int:
+        return len(self.db)
+
+    @staticmethod
+    def _receive(worker: _Worker) -> Any:
+        try:
+            kind, *reply = worker.connection.recv()
+        except EOFError:
+            raise RuntimeError(f'Shard worker {worker.process.name} exited') from None
+        if kind == 'error':
+            raise reply[0]
+        if kind == 'value':
+            return reply[0]
+        if kind == 'list':
+            return reply[0], reply[1]
+        count, has_keys = reply
+        buffer, capacity = worker.memory.buf, worker.capacity
+        positions = buffer[:count * 8].cast('q').tolist()
+        keys = buffer[capacity * 8:(capacity + count) * 8].cast('d').tolist() if has_keys else None
+        return positions, keys
+
+    def _fan_out(self, *message) -> List[Any]:
+        """Send ``message`` to every shard and return their replies, in shard order.
+
+        Shard locks are taken in order and each is released once its reply
+        is read, so the next search can start on the first shard while this
+        one still waits for the last; taking them in one order means two
+        searches never wait on each other's shards.
+        """
+        sent, error = [], None
+        for worker in self._workers:
+            worker.lock.acquire()
+            try:
+                worker.connection.send(message)
+            except Exception as e:
+                worker.lock.release()
+                error = e
+                break
+            sent.append(worker)
+        replies = []
+        # Read every reply, even after an error, so no shard is left out of step.
+        for worker in sent:
+            try:
+                replies.append(self._receive(worker))
+            except Exception as e:
+                error = error or e
+            finally:
+                worker.lock.release()
+        if error is not None:
+            raise error
+        return replies
+
+    def _send(self, position: int, *message) -> Any:
+        """Send ``message`` to the shard holding ``position`` and return its reply."""
+        worker = self._workers[bisect_right(self._starts, position) - 1]
+        with worker.lock:
+            worker.connection.send(message)
+            return self._receive(worker)
+
+    def _substring(self, field: str, query: str, case_sensitive: bool) -> List[Cocktail]:
+        positions: List[int] = []
+        with self.db.reading():
+            for shard_positions, _ in self._fan_out('substring', field, query, case_sensitive):
+                positions.extend(shard_positions)
+            return self.db._collect(positions)
+
+    def _merged(self, replies: List[Results], limit: Optional[int] = None) -> List[Cocktail]:
+        """Merge the shards' ranked results by ``(key, position)``."""
+        merged = heapq.merge(*(zip(keys, positions) for positions, keys in replies))
+        return self.db._collect([position for _, position in islice(merged, limit)])
+
+    def get_cocktail_by_id(self, drink_id: str) -> Optional[Cocktail]:
+        return self.db.get_cocktail_by_id(drink_id)
+
+    def search_by_name(self, name: str, case_sensitive: bool = False) -> List[Cocktail]:
+        return self._substring('name', name, case_sensitive)
+
+    def search_by_ingredient(self, ingredient: str, case_sensitive: bool = False) -> List[Cocktail]:
+        return self._substring('ingredient', ingredient, case_sensitive)
+
+    def search_by_category(self, category: str, case_sensitive: bool = False) -> List[Cocktail]:
+        return self._substring('category', category, case_sensitive)
+
+    def search_fuzzy(self, query: str, field: str = 'name', max_distance: int = 2) -> List[Cocktail]:
+        with self.db.reading():
+            return self._merged(self._fan_out('fuzzy', query, field, max_distance))
+
+    def _text_statistics(self, language: str, query: str) -> Statistics:
+        """Sum the shards' BM25 statistics into those of the whole catalog."""
+        document_count = total_length = 0
+        frequencies: Dict[str, int] = {}
+        for count, length, shard_frequencies in self._fan_out('text_statistics', language, query):
+            document_count += count
+            total_length += length
+            for term, frequency in shard_frequencies.items():
+                frequencies[term] = frequencies.get(term, 0) + frequency
+        return document_count, total_length, frequencies
+
+    def search_by_text(self, query: str, language: str = 'en', limit: Optional[int] = None) -> List[Cocktail]:
+        with self.db.reading():
+            statistics = self._text_statistics(language, query)
+            return self._merged(self._fan_out('text', language, query, limit, statistics), limit)
+
+    def count_by_text(self, query: str, language: str = 'en') -> int:
+        with self.db.reading():
+            return sum(self._fan_out('count_text', language, query))
+
+    def reading(self):
+        return self.db.reading()
+
+    def writing(self):
+        return self.db.writing()
+
+    def upsert(self, raw: Dict[str, Any]) -> None:
+        # Searches see the drink in both the catalog and its shard, or in neither.
+        with self.db.writing():
+            self.db.upsert(raw)
+            self._send(self.db.position_of(raw['idDrink']), 'upsert', raw)
+
+    def delete(self, drink_id: str) -> bool:
+        with self.db.writing():
+            position = self.db.position_of(drink_id)
+            if not self.db.delete(drink_id):
+                return False
+            self._send(position, 'delete', drink_id)
+            return True
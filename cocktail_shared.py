@@ -0,0 +1,267 @@
+"""Process-wide CocktailDB handle with hot reload.
+
+Every entry point used to build its own ``CocktailDB`` at import time, and
+picking up a new dump meant restarting. ``get_shared_db`` returns one
+``SharedCocktailDB`` per dump path and process. It watches the dump's
+size/mtime and content hash in a background thread, builds a complete new
+``CocktailDB`` (plus any registered per-catalog artifacts) off to the side
+when the file changes, and publishes it with a single reference swap, so a
+request that grabbed ``handle.state`` keeps a consistent view until it is
+done with it.
+
+Deltas spooled next to the dump (see ``cocktail_delta.py``) are applied to
+the loaded ``CocktailDB`` in place instead: only the changed drinks are
+re-indexed, artifacts that support it are patched, and the result is
+published as the next generation. The batch is applied under the
+catalog's write lock, so each search sees it wholly or not at all; a
+request that makes several calls, or joins results with the artifacts,
+holds ``with handle.reading() as state:`` around them.
+
+With ``shards`` above one, each loaded catalog is wrapped in a
+``ShardedCocktailDB`` (see ``cocktail_shards.py``) whose worker processes
+run the expensive searches in parallel.
+
+The catalog is opened with ``open_store``, so an SQLite path gets a
+``SQLiteCocktailDB``. Such a database is updated in place by other
+processes, and the handle starts a new generation once the file changes;
+its version comes from the database's own commit counter rather than a
+hash of the file.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from cocktail_delta import apply_delta, file_digest, iter_delta, spooled_deltas, validate_delta
+from cocktail_search import CocktailDB
+from cocktail_shards import ShardedCocktailDB
+from cocktail_store import SQLITE_EXTENSIONS, CocktailStore, open_store
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogState:
+    """One loaded generation of the catalog and its derived artifacts."""
+
+    __slots__ = ('db', 'generation', 'digest', 'artifacts', 'load_seconds')
+
+    def __init__(self, db: CocktailStore, generation: int, digest: str, artifacts: Dict[str, Any],
+                 load_seconds: float):
+        self.db = db
+        self.generation = generation
+        # SHA-256 of the dump this generation was loaded from, chained with
+        # the digest of each delta applied since.
+        self.digest = digest
+        self.artifacts = artifacts
+        self.load_seconds = load_seconds
+
+
+class SharedCocktailDB:
+    """A catalog that can be swapped for a freshly loaded one at runtime.
+
+    Read ``state`` once per request and use its ``db`` and ``artifacts``
+    throughout; the handle itself also forwards attribute access to the
+    current database for callers that only need one search.
+    """
+
+    def __init__(self, json_file: str, poll_interval: float = 5.0, shards: int = 0, **db_options: Any):
+        self.json_file = json_file
+        self.poll_interval = poll_interval
+        self.shards = shards
+        self.db_options = db_options
+        self._builders: Dict[str, Callable[[CocktailStore], Any]] = {}
+        self._listeners: List[Callable[[CatalogState], None]] = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        # Spool files already applied to the loaded catalog.
+        self._applied: Set[str] = set()
+        self._stamp: Optional[Tuple[int, int]] = self._stat()
+        self._digest: Optional[str] = self._hash()
+        self.state = self._load(1, self._digest)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.state.db, name)
+
+    @property
+    def db(self) -> CocktailStore:
+        return self.state.db
+
+    @contextmanager
+    def reading(self) -> Iterator[CatalogState]:
+        """Yield the current state, holding off deltas until the block exits.
+
+        The database and artifacts of the yielded state agree with each
+        other for the whole block.
+        """
+        state = self.state
+        with state.db.reading():
+            # Deltas are published under the write lock, so a state for the
+            # same database read now is complete; a reloaded catalog leaves
+            # the old one untouched.
+            current = self.state
+            yield current if current.db is state.db else state
+
+    def register_artifact(self, name: str, builder: Callable[[CocktailStore], Any]) -> Any:
+        """Build ``builder(db)`` for the current and every future catalog.
+
+        Artifacts are rebuilt before a reloaded catalog is published, so
+        ``state.artifacts[name]`` always matches ``state.db``. After a delta,
+        an artifact with an ``update(db, drink_ids)`` method is patched for
+        the changed drinks instead of being rebuilt.
+        """
+        with self._reload_lock:
+            self._builders[name] = builder
+            artifact = builder(self.state.db)
+            self.state.artifacts[name] = artifact
+            return artifact
+
+    def on_reload(self, listener: Callable[[CatalogState], None]) -> None:
+        """Call ``listener(state)`` after each newly loaded catalog is published."""
+        self._listeners.append(listener)
+
+    def _stat(self) -> Tuple[int, int]:
+        stat = os.stat(self.json_file)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _hash(self) -> str:
+        if self.json_file.lower().endswith(SQLITE_EXTENSIONS):
+            # The database counts its own commits; hashing it would read
+            # the whole file after every delta.
+            from cocktail_sqlite import catalog_version
+            return hashlib.sha256(catalog_version(self.json_file).encode('ascii')).hexdigest()
+        return file_digest(self.json_file)
+
+    @staticmethod
+    def _chain(digest: str, delta_file: str) -> str:
+        return hashlib.sha256(f'{digest}{file_digest(delta_file)}'.encode('ascii')).hexdigest()
+
+    def _load(self, generation: int, digest: str) -> CatalogState:
+        """Load the dump, replay its spooled deltas and build the artifacts."""
+        started = time.perf_counter()
+        db = open_store(self.json_file, **self.db_options)
+        applied = set()
+        for delta in spooled_deltas(self.json_file):
+            apply_delta(db, iter_delta(delta))
+            digest = self._chain(digest, delta)
+            applied.add(os.path.basename(delta))
+        if self.shards > 1:
+            if not isinstance(db, CocktailDB):
+                raise ValueError('Only a JSON catalog can be sharded')
+            # The replaced catalog's workers stop once nothing references it.
+            db = ShardedCocktailDB(db, self.shards)
+        artifacts = {name: builder(db) for name, builder in self._builders.items()}
+        self._applied = applied
+        return CatalogState(db, generation, digest, artifacts, time.perf_counter() - started)
+
+    def _apply_deltas(self, deltas: List[str]) -> CatalogState:
+        """Apply new spool files to the loaded catalog in place.
+
+        Call with the catalog's write lock held, and publish the result
+        before releasing it.
+        """
+        started = time.perf_counter()
+        # Check every line first so a malformed file changes nothing.
+        for delta in deltas:
+            validate_delta(delta)
+        state = self.state
+        db, digest, changed = state.db, state.digest, set()
+        for delta in deltas:
+            changed |= apply_delta(db, iter_delta(delta))
+            digest = self._chain(digest, delta)
+            self._applied.add(os.path.basename(delta))
+        artifacts = dict(state.artifacts)
+        for name, builder in self._builders.items():
+            update = getattr(artifacts.get(name), 'update', None)
+            if update is not None:
+                update(db, changed)
+            else:
+                artifacts[name] = builder(db)
+        return CatalogState(db, state.generation + 1, digest, artifacts, time.perf_counter() - started)
+
+    def reload_if_changed(self) -> bool:
+        """Pick up a changed dump or newly spooled deltas; return whether anything changed.
+
+        A changed dump is loaded from scratch; new deltas on an unchanged
+        dump are applied to the loaded catalog.
+        """
+        with self._reload_lock:
+            state = None
+            try:
+                stamp = self._stat()
+                if stamp != self._stamp:
+                    self._stamp = stamp
+                    digest = self._hash()
+                    if digest != self._digest:
+                        state = self._load(self.state.generation + 1, digest)
+                        self._digest = digest
+                        action = 'Reloaded'
+                if state is None:
+                    pending = [delta for delta in spooled_deltas(self.json_file)
+                               if os.path.basename(delta) not in self._applied]
+                    if not pending:
+                        return False
+                    try:
+                        with self.state.db.writing():
+                            state = self.state = self._apply_deltas(pending)
+                    except Exception:
+                        # The catalog may be partly updated; load it afresh next time.
+                        self._stamp = self._digest = None
+                        raise
+                    action = f'Applied {len(pending)} deltas to'
+            except Exception:
+                logger.exception('Reloading %s failed; keeping the loaded catalog', self.json_file)
+                return False
+            self.state = state
+            logger.info('%s %s (generation %d) in %.3fs',
+                        action, self.json_file, state.generation, state.load_seconds)
+        for listener in self._listeners:
+            try:
+                listener(state)
+            except Exception:
+                logger.exception('Reload listener %r failed', listener)
+        return True
+
+    def start_watching(self) -> None:
+        """Poll the dump for changes in a daemon thread."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name='cocktaildb-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        """Stop the watcher thread and wait for it to exit."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
+
+
+_handles: Dict[str, SharedCocktailDB] = {}
+_handles_lock = threading.Lock()
+
+
+def get_shared_db(json_file: str = 'cocktaildb_dump.json', watch: bool = True, **db_options: Any) -> SharedCocktailDB:
+    """Return the process-wide handle for ``json_file``, loading it on first use.
+
+    ``json_file`` may also be an SQLite catalog (see ``open_store``).
+    ``db_options`` (e.g. ``lazy_details=True``) are passed to the backend
+    when the handle is first created, except ``shards``, which is the
+    number of ``ShardedCocktailDB`` workers to search with (0 for none).
+    """
+    key = os.path.abspath(json_file)
+    with _handles_lock:
+        handle = _handles.get(key)
+        if handle is None:
+            handle = _handles[key] = SharedCocktailDB(json_file, **db_options)
+    if watch:
+        handle.start_watching()
+    return handle
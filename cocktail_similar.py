@@ -0,0 +1,332 @@
+"""Precomputed "similar drinks" neighbors.
+
+Each recipe is an IDF-weighted, L2-normalized vector over the case-folded
+ingredient vocabulary, stored sparsely. A drink is only compared with the
+drinks found through its ingredients' posting lists, and a list longer than
+``MAX_FAN_OUT`` is not followed at all, except for the drink's rarest
+ingredient, where only the ``MAX_FAN_OUT`` drinks around its own place in the
+list are taken. That keeps the build linear in the catalog instead of
+quadratic: a drink's neighbors are found exactly as long as they share an
+ingredient used by at most ``MAX_FAN_OUT`` drinks, which holds for every
+drink of the stock dump. Candidates are then scored exactly, a block of
+drinks at a time. Shared category and glass break ties between equally
+similar drinks. The top ``k`` neighbors of every drink end up in one
+``(n, k)`` int32 array, with -1 padding for drinks that share ingredients
+with fewer than ``k`` others.
+
+``NeighborTable`` keeps that array with the matching scores and patches it
+when a single drink is added, changed or deleted: the drink's own row is
+scored against the catalog through the ingredient postings, it is inserted
+into the rows it now beats, and only the rows that listed it before are
+recomputed. That is linear in the catalog rather than quadratic. The IDF
+weights stay those of the last full build, so the owner rebuilds once
+``changed`` reaches ``REBUILD_FRACTION`` of the catalog; it can build from a
+copy of the drink descriptions while the catalog keeps changing, then hand
+the new table the drinks changed meanwhile with ``catch_up``.
+"""
+import math
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Neighbors kept per drink; CocktailDB.similar can return at most this many.
+MAX_NEIGHBORS = 10
+
+# Longest ingredient posting list a full build follows; see the module docstring.
+MAX_FAN_OUT = 256
+
+# Largest number of candidate ingredient lookups held in memory for one block of drinks.
+_BLOCK_LOOKUPS = 1 << 22
+
+# Added to positive similarities so shared category, then glass, break ties.
+_CATEGORY_BONUS = 1e-6
+_GLASS_BONUS = 1e-7
+
+# Share of the catalog that may be patched before the IDF weights are stale
+# enough to rebuild the whole table.
+REBUILD_FRACTION = 0.1
+
+# A drink's distinct ingredient ids, category and glass.
+Description = Tuple[Sequence[int], Optional[str], Optional[str]]
+
+
+def _multi_arange(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenate ``arange(start, start + length)`` for every pair."""
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.cumsum(lengths)
+    offsets = np.repeat(starts - (ends - lengths), lengths)
+    return np.arange(total, dtype=np.int64) + offsets
+
+
+def _codes(labels: Sequence[Optional[str]]) -> np.ndarray:
+    """Map labels to integer codes, giving every missing label its own code."""
+    codes = {}
+    return np.array([codes.setdefault(label, len(codes)) if label else -1 - i
+                     for i, label in enumerate(labels)], dtype=np.int64)
+
+
+def build_neighbors(recipes: Sequence[Sequence[int]], categories: Sequence[Optional[str]],
+                    glasses: Sequence[Optional[str]], k: int = MAX_NEIGHBORS) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the ``(len(recipes), k)`` arrays of each drink's nearest neighbors and their scores.
+
+    ``recipes`` holds each drink's distinct ingredient ids. Padding
+    entries are -1 with a score of ``-inf``.
+    """
+    n = len(recipes)
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    neighbor_scores = np.full((n, k), -np.inf)
+    lengths = np.array([len(recipe) for recipe in recipes], dtype=np.int64)
+    if not n or not lengths.sum():
+        return neighbors, neighbor_scores
+
+    # CSR form of the drink x ingredient matrix.
+    row_ptr = np.concatenate(([0], np.cumsum(lengths)))
+    rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    cols = np.fromiter((i for recipe in recipes for i in recipe), dtype=np.int64, count=len(rows))
+    df = np.bincount(cols)
+    # Deleted drinks, left as empty recipes, do not count towards the IDF.
+    weights = np.log(np.count_nonzero(lengths) / df[cols]) + 1.0
+    norms = np.sqrt(np.bincount(rows, weights ** 2, minlength=n))
+    data = weights / norms[rows]
+
+    # Posting lists (the CSC form) for expanding ingredients to drinks, and
+    # each entry's place in its ingredient's list.
+    order = np.argsort(cols, kind='stable')
+    post_rows = rows[order]
+    post_data = data[order]
+    col_ptr = np.concatenate(([0], np.cumsum(df)))
+    places = np.empty_like(order)
+    places[order] = np.arange(len(order)) - col_ptr[cols[order]]
+
+    # Follow every short posting list and a window of each drink's rarest
+    # one. Common ingredients only find candidates; their weights are looked
+    # up per candidate in the entries sorted by (drink, ingredient).
+    common = df[cols] > MAX_FAN_OUT
+    rarest = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(rarest, rows, df[cols])
+    fan_out = np.where(~common | (df[cols] == rarest[rows]), np.minimum(df[cols], MAX_FAN_OUT), 0)
+    window = col_ptr[cols] + np.clip(places - MAX_FAN_OUT // 2, 0, df[cols] - fan_out)
+    common_counts = np.bincount(rows, common, minlength=n).astype(np.int64)
+    lookups = np.cumsum(np.bincount(rows, fan_out, minlength=n).astype(np.int64) * (1 + common_counts))
+    vocabulary = len(df)
+    keys = rows * vocabulary + cols
+    key_order = np.argsort(keys)
+    sorted_keys, sorted_data = keys[key_order], data[key_order]
+    common_entries = np.flatnonzero(common)
+
+    category_codes = _codes(categories)
+    glass_codes = _codes(glasses)
+    start = 0
+    while start < n:
+        done = lookups[start - 1] if start else 0
+        stop = max(start + 1, int(np.searchsorted(lookups, done + _BLOCK_LOOKUPS, side='right')))
+        lo, hi = row_ptr[start], row_ptr[stop]
+        start = stop
+        block_fan_out = fan_out[lo:hi]
+        entries = _multi_arange(window[lo:hi], block_fan_out)
+        pair_keys = np.repeat(rows[lo:hi], block_fan_out) * n + post_rows[entries]
+        products = np.repeat(np.where(common[lo:hi], 0.0, data[lo:hi]), block_fan_out) * post_data[entries]
+        # Group the products by pair, keeping each pair's in recipe order.
+        grouping = np.argsort(pair_keys, kind='stable')
+        pair_keys = pair_keys[grouping]
+        firsts = np.concatenate(([True], pair_keys[1:] != pair_keys[:-1]))
+        scores = np.bincount(np.cumsum(firsts) - 1, products[grouping])
+        pair_rows, pair_cols = pair_keys[firsts] // n, pair_keys[firsts] % n
+        distinct = pair_rows != pair_cols
+        pair_rows, pair_cols, scores = pair_rows[distinct], pair_cols[distinct], scores[distinct]
+        if not len(pair_rows):
+            continue
+
+        # Add the common ingredients each candidate shares.
+        block_common = common_entries[(common_entries >= lo) & (common_entries < hi)]
+        if len(block_common):
+            per_pair = common_counts[pair_rows]
+            own = block_common[_multi_arange(np.searchsorted(block_common, row_ptr[pair_rows]), per_pair)]
+            wanted = np.repeat(pair_cols, per_pair) * vocabulary + cols[own]
+            found = np.minimum(np.searchsorted(sorted_keys, wanted), len(sorted_keys) - 1)
+            shared = np.where(sorted_keys[found] == wanted, data[own] * sorted_data[found], 0.0)
+            scores += np.bincount(np.repeat(np.arange(len(pair_rows)), per_pair), shared,
+                                  minlength=len(pair_rows))
+        scores += (_CATEGORY_BONUS * (category_codes[pair_rows] == category_codes[pair_cols])
+                   + _GLASS_BONUS * (glass_codes[pair_rows] == glass_codes[pair_cols]))
+
+        # Order by score, then catalog position for a stable result: the
+        # pairs are already in position order within each drink.
+        ranking = np.argsort(-scores, kind='stable')
+        ranking = ranking[np.argsort(pair_rows[ranking], kind='stable')]
+        pair_rows, pair_cols, scores = pair_rows[ranking], pair_cols[ranking], scores[ranking]
+        ranks = np.arange(len(pair_rows)) - np.searchsorted(pair_rows, pair_rows)
+        kept = ranks < k
+        neighbors[pair_rows[kept], ranks[kept]] = pair_cols[kept]
+        neighbor_scores[pair_rows[kept], ranks[kept]] = scores[kept]
+    return neighbors, neighbor_scores
+
+
+class _Labels:
+    """Integer codes for a growing column of labels, as ``_codes`` assigns them."""
+
+    def __init__(self, labels: Sequence[Optional[str]]):
+        self._ids: Dict[str, int] = {}
+        self.codes = np.array([self._code(i, label) for i, label in enumerate(labels)], dtype=np.int64)
+
+    def _code(self, position: int, label: Optional[str]) -> int:
+        return self._ids.setdefault(label, len(self._ids)) if label else -1 - position
+
+    def set(self, position: int, label: Optional[str]) -> None:
+        self.codes[position] = self._code(position, label)
+
+
+class NeighborTable:
+    """Every drink's nearest neighbors, patched in place as drinks change.
+
+    ``neighbors`` and ``scores`` are the ``(n, k)`` arrays ``build_neighbors``
+    returns. ``describe(position)`` gives a drink's current ingredient ids,
+    category and glass (no ingredients once it is deleted), and
+    ``postings[ingredient_id]`` the sorted positions of the drinks using an
+    ingredient; both belong to the owning catalog and must already reflect
+    a change when ``patch`` is called for it.
+    """
+
+    def __init__(self, neighbors: np.ndarray, scores: np.ndarray,
+                 describe: Callable[[int], Description], postings: List[List[int]]):
+        self.neighbors = neighbors
+        self.scores = scores
+        self.changed = 0
+        self._describe = describe
+        self._postings = postings
+        descriptions = [describe(position) for position in range(len(neighbors))]
+        recipes = [recipe for recipe, _, _ in descriptions]
+        n = len(recipes)
+        lengths = np.array([len(recipe) for recipe in recipes], dtype=np.int64)
+        cols = np.fromiter(chain.from_iterable(recipes), dtype=np.int64, count=int(lengths.sum()))
+        df = np.bincount(cols, minlength=len(postings))
+        # Weighted as in build_neighbors; an ingredient no drink used yet
+        # counts as used by one.
+        drinks = int(np.count_nonzero(lengths))
+        self._new_weight = math.log(max(drinks, 1)) + 1.0
+        with np.errstate(divide='ignore'):
+            self._idf = np.where(df > 0, np.log(drinks / np.maximum(df, 1)) + 1.0, self._new_weight)
+        rows = np.repeat(np.arange(n, dtype=np.int64), lengths)
+        self.norms = np.sqrt(np.bincount(rows, self._idf[cols] ** 2, minlength=n))
+        self._categories = _Labels([category for _, category, _ in descriptions])
+        self._glasses = _Labels([glass for _, _, glass in descriptions])
+
+    @classmethod
+    def build(cls, describe: Callable[[int], Description], postings: List[List[int]],
+              size: int, k: int = MAX_NEIGHBORS) -> 'NeighborTable':
+        """Build the table for the ``size`` drinks ``describe`` knows."""
+        descriptions = [describe(position) for position in range(size)]
+        neighbors, scores = build_neighbors(*zip(*descriptions), k=k) if descriptions else (
+            np.full((0, k), -1, dtype=np.int32), np.full((0, k), -np.inf))
+        return cls(neighbors, scores, describe, postings)
+
+    def state(self) -> Tuple[bytes, bytes]:
+        """Return the neighbors and scores as bytes for a snapshot."""
+        return self.neighbors.astype('<i4').tobytes(), self.scores.astype('<f8').tobytes()
+
+    @classmethod
+    def from_state(cls, state: Tuple[bytes, bytes], describe: Callable[[int], Description],
+                   postings: List[List[int]], k: int = MAX_NEIGHBORS) -> 'NeighborTable':
+        """Rebuild a table from ``state()`` without recomputing any neighbors."""
+        neighbors = np.frombuffer(state[0], dtype='<i4').reshape(-1, k).astype(np.int32)
+        scores = np.frombuffer(state[1], dtype='<f8').reshape(-1, k).astype(np.float64)
+        return cls(neighbors, scores, describe, postings)
+
+    def catch_up(self, describe: Callable[[int], Description], positions: Sequence[int]) -> None:
+        """Follow the live catalog after a build from an earlier copy of it.
+
+        ``describe`` replaces the one the table was built with, and the
+        drinks at ``positions``, those changed since the copy was taken,
+        are patched.
+        """
+        self._describe = describe
+        for position in positions:
+            self.patch(position)
+
+    def _weights(self, recipe: Sequence[int]) -> np.ndarray:
+        ids = np.asarray(recipe, dtype=np.int64)
+        if len(ids) and ids.max() >= len(self._idf):
+            self._idf = np.concatenate(
+                (self._idf, np.full(ids.max() + 1 - len(self._idf), self._new_weight)))
+        return self._idf[ids]
+
+    def _row_scores(self, position: int, recipe: Sequence[int]) -> np.ndarray:
+        """Score one drink against every drink, as ``build_neighbors`` does."""
+        n = len(self.norms)
+        if not len(recipe):
+            return np.full(n, -np.inf)
+        weights = self._weights(recipe)
+        postings = [self._postings[ingredient_id] for ingredient_id in recipe]
+        fan_out = np.array([len(posting) for posting in postings], dtype=np.int64)
+        others = np.concatenate([np.asarray(posting, dtype=np.int64) for posting in postings])
+        products = (np.repeat(weights / self.norms[position], fan_out)
+                    * (np.repeat(weights, fan_out) / self.norms[others]))
+        scores = np.bincount(others, products, minlength=n)[:n]
+        related = scores > 0
+        scores += related * (
+            _CATEGORY_BONUS * (self._categories.codes[position] == self._categories.codes)
+            + _GLASS_BONUS * (self._glasses.codes[position] == self._glasses.codes))
+        scores[~related] = -np.inf
+        scores[position] = -np.inf
+        return scores
+
+    def _set_row(self, row: int, scores: np.ndarray) -> None:
+        """Store the top ``k`` of ``scores``, best first, ties by catalog position."""
+        k = self.neighbors.shape[1]
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if len(candidates) > k:
+            cutoff = -np.partition(-scores[candidates], k - 1)[k - 1]
+            candidates = candidates[scores[candidates] >= cutoff]
+        top = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+        self.neighbors[row] = -1
+        self.scores[row] = -np.inf
+        self.neighbors[row, :len(top)] = top
+        self.scores[row, :len(top)] = scores[top]
+
+    def _grow(self, size: int) -> None:
+        extra = size - len(self.neighbors)
+        k = self.neighbors.shape[1]
+        self.neighbors = np.concatenate((self.neighbors, np.full((extra, k), -1, dtype=np.int32)))
+        self.scores = np.concatenate((self.scores, np.full((extra, k), -np.inf)))
+        self.norms = np.concatenate((self.norms, np.zeros(extra)))
+        for labels in (self._categories, self._glasses):
+            labels.codes = np.concatenate((labels.codes, -1 - np.arange(size - extra, size)))
+
+    def patch(self, position: int) -> None:
+        """Re-score the drink at ``position`` after it was added, changed or deleted."""
+        if not self.neighbors.flags.writeable:
+            self.neighbors, self.scores = self.neighbors.copy(), self.scores.copy()
+        if position >= len(self.neighbors):
+            self._grow(position + 1)
+        recipe, category, glass = self._describe(position)
+        weights = self._weights(recipe)
+        # Summed in order, as np.bincount sums them in the full build.
+        self.norms[position] = math.sqrt(sum((weights ** 2).tolist()))
+        self._categories.set(position, category)
+        self._glasses.set(position, glass)
+        self.changed += 1
+
+        # Rows that listed the drink may now rank it differently, or not at all.
+        stale = np.flatnonzero((self.neighbors == position).any(axis=1))
+        scores = self._row_scores(position, recipe)
+        self._set_row(position, scores)
+        last_scores, last_neighbors = self.scores[:, -1], self.neighbors[:, -1]
+        beats = np.isfinite(scores) & ((scores > last_scores)
+                                       | ((scores == last_scores) & (position < last_neighbors)))
+        beats[stale] = False
+        for row in np.flatnonzero(beats).tolist():
+            entries = [(-score, neighbor) for score, neighbor in zip(self.scores[row].tolist(),
+                                                                     self.neighbors[row].tolist())
+                       if neighbor >= 0]
+            entries.append((-scores[row], position))
+            entries.sort()
+            del entries[self.neighbors.shape[1]:]
+            self.neighbors[row, :len(entries)] = [neighbor for _, neighbor in entries]
+            self.scores[row, :len(entries)] = [-score for score, _ in entries]
+        for row in stale.tolist():
+            if row != position:
+                self._set_row(row, self._row_scores(row, self._describe(row)[0]))
+
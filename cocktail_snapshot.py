@@ -0,0 +1,159 @@
+"""Binary snapshot format for a prebuilt CocktailDB.
+
+A snapshot holds the compact record store and the search indexes of a
+``CocktailDB`` so a process can start without parsing the JSON dump. The
+file is a fixed header, a section table and a series of ``marshal``-encoded
+sections; loading maps the file, validates the header and every section's
+CRC-32 and decodes sections straight out of the mapping.
+
+Build or refresh the snapshot after updating the dump:
+
+    python cocktail_snapshot.py cocktaildb_dump.json
+"""
+import argparse
+import marshal
+import mmap
+import os
+import struct
+import sys
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+MAGIC = b'CKTLSNAP'
+
+# Bump whenever the sections written by CocktailDB.snapshot_sections change.
+FORMAT_VERSION = 5
+
+# magic, format version, marshal version, interpreter tag,
+# source size, source mtime (ns), section count
+_HEADER = struct.Struct('<8sHH16sqqI')
+# section name, offset, length, CRC-32
+_SECTION = struct.Struct('<24sQQI')
+
+
+def snapshot_path_for(json_file: str) -> str:
+    """Return the default snapshot path for a JSON dump."""
+    return os.path.splitext(json_file)[0] + '.snapshot'
+
+
+def _source_stamp(json_file: str) -> Tuple[int, int]:
+    stat = os.stat(json_file)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _interpreter_tag() -> bytes:
+    # marshal output is only guaranteed to round-trip on the same interpreter.
+    return (sys.implementation.cache_tag or sys.implementation.name).encode('ascii')[:16]
+
+
+def write_snapshot(snapshot_file: str, json_file: str, sections: Dict[str, Any]) -> None:
+    """Write ``sections`` to ``snapshot_file``, stamped with ``json_file``'s size and mtime.
+
+    The file is written next to its destination and renamed into place, so
+    readers never see a partially written snapshot.
+    """
+    blobs = [(name.encode('utf-8'), marshal.dumps(value)) for name, value in sections.items()]
+    size, mtime_ns = _source_stamp(json_file)
+    offset = _HEADER.size + _SECTION.size * len(blobs)
+    table = []
+    for name, blob in blobs:
+        table.append(_SECTION.pack(name, offset, len(blob), zlib.crc32(blob)))
+        offset += len(blob)
+
+    tmp_file = f'{snapshot_file}.tmp{os.getpid()}'
+    with open(tmp_file, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, _interpreter_tag(),
+                             size, mtime_ns, len(blobs)))
+        f.writelines(table)
+        f.writelines(blob for _, blob in blobs)
+    os.replace(tmp_file, snapshot_file)
+
+
+class Snapshot:
+    """A validated, memory-mapped snapshot file.
+
+    Use ``Snapshot.open`` to get one; it returns ``None`` when the file is
+    missing, corrupt, written by another format/interpreter version or was
+    built from a different version of the JSON dump.
+    """
+
+    def __init__(self, mapping: mmap.mmap, sections: Dict[str, Tuple[int, int]]):
+        self._mapping = mapping
+        self._sections = sections
+
+    @classmethod
+    def open(cls, snapshot_file: str, json_file: str) -> Optional['Snapshot']:
+        """Map ``snapshot_file`` if it is a fresh snapshot of ``json_file``."""
+        try:
+            with open(snapshot_file, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        try:
+            sections = cls._validate(mapping, json_file)
+        except (OSError, struct.error):
+            sections = None
+        if sections is None:
+            mapping.close()
+            return None
+        return cls(mapping, sections)
+
+    @staticmethod
+    def _validate(mapping: mmap.mmap, json_file: str) -> Optional[Dict[str, Tuple[int, int]]]:
+        magic, version, marshal_version, tag, size, mtime_ns, count = _HEADER.unpack_from(mapping, 0)
+        if (magic != MAGIC or version != FORMAT_VERSION or marshal_version != marshal.version
+                or tag.rstrip(b'\0') != _interpreter_tag()):
+            return None
+        if (size, mtime_ns) != _source_stamp(json_file):
+            return None
+        sections = {}
+        for i in range(count):
+            name, offset, length, crc = _SECTION.unpack_from(mapping, _HEADER.size + i * _SECTION.size)
+            if offset + length > len(mapping):
+                return None
+            with memoryview(mapping) as view:
+                if zlib.crc32(view[offset:offset + length]) != crc:
+                    return None
+            sections[name.rstrip(b'\0').decode('utf-8')] = (offset, length)
+        return sections
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sections
+
+    def load(self, name: str) -> Any:
+        """Decode one section directly from the mapped file."""
+        offset, length = self._sections[name]
+        with memoryview(self._mapping) as view:
+            return marshal.loads(view[offset:offset + length])
+
+    def close(self) -> None:
+        self._mapping.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def build_snapshot(json_file: str, snapshot_file: Optional[str] = None) -> str:
+    """Compile ``json_file`` and its indexes into a snapshot and return its path."""
+    from cocktail_search import CocktailDB
+
+    snapshot_file = snapshot_file or snapshot_path_for(json_file)
+    db = CocktailDB(json_file, use_snapshot=False)
+    write_snapshot(snapshot_file, json_file, db.snapshot_sections())
+    return snapshot_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a CocktailDB snapshot from a JSON dump.')
+    parser.add_argument('json_file', nargs='?', default='cocktaildb_dump.json')
+    parser.add_argument('-o', '--output', help='snapshot path (default: <json_file>.snapshot)')
+    args = parser.parse_args()
+    path = build_snapshot(args.json_file, args.output)
+    print(f"Snapshot written to {path}")
+
+
+if __name__ == '__main__':
+    main()
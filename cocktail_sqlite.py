@@ -0,0 +1,423 @@
+"""SQLite storage backend for the cocktail catalog.
+
+The catalog lives in an on-disk database instead of a JSON list in RAM, so
+it can grow far beyond memory, and any number of processes can open the
+same file without a load step. The tables are:
+
+* ``drinks``: one row per drink in catalog order, with the full raw record as
+  JSON, plus indexed columns for the id and category.
+* ``categories`` and ``ingredients``: the distinct names, referenced by id.
+* ``recipe``: the (drink, slot, ingredient, measure) rows, indexed by
+  ingredient.
+* ``name_fts`` / ``ingredient_fts``: FTS5 trigram indexes over drink and
+  ingredient names, for substring search.
+* ``instructions_fts``: an FTS5 word index over the instructions in every
+  supported language, ranked with BM25.
+
+Substring searches take their candidates from the trigram index and check
+them with the same ``in`` test ``CocktailDB`` uses, so both backends return
+identical results. ``upsert`` and ``delete`` change single drinks in place
+(see ``cocktail_delta.py``). Build a database from the JSON dump with:
+
+    python cocktail_sqlite.py cocktaildb_dump.json cocktails.sqlite
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from cocktail_details import iter_dump_records
+from cocktail_search import INGREDIENT_SLOTS, Cocktail, IngredientTable
+from cocktail_store import CocktailStore
+from cocktail_text import LANGUAGE_FIELDS, tokenize
+
+# Bumped whenever the schema changes; older databases must be re-imported.
+SCHEMA_VERSION = 2
+
+# Drinks inserted per transaction while importing.
+IMPORT_BATCH = 5000
+
+# Largest number of bound parameters used in one IN (...) list.
+_IN_CHUNK = 900
+
+_SCHEMA = f"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE ingredients (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE drinks (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    name TEXT,
+    category INTEGER REFERENCES categories (id),
+    raw TEXT NOT NULL
+);
+CREATE INDEX drinks_category ON drinks (category, position);
+CREATE TABLE recipe (
+    drink INTEGER NOT NULL REFERENCES drinks (position),
+    slot INTEGER NOT NULL,
+    ingredient INTEGER NOT NULL REFERENCES ingredients (id),
+    measure TEXT,
+    PRIMARY KEY (drink, slot)
+) WITHOUT ROWID;
+CREATE INDEX recipe_ingredient ON recipe (ingredient, drink);
+CREATE VIRTUAL TABLE name_fts USING fts5 (name, content='drinks', content_rowid='position', tokenize='trigram');
+CREATE VIRTUAL TABLE ingredient_fts USING fts5 (name, content='ingredients', content_rowid='id', tokenize='trigram');
+CREATE VIRTUAL TABLE instructions_fts USING fts5 ({', '.join(LANGUAGE_FIELDS)}, tokenize='unicode61 remove_diacritics 2');
+"""
+
+
+def _chunks(values: List[int]) -> Iterable[List[int]]:
+    for start in range(0, len(values), _IN_CHUNK):
+        yield values[start:start + _IN_CHUNK]
+
+
+def _phrase(text: str) -> str:
+    """Quote ``text`` as a single FTS5 phrase."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _drink_row(position: int, raw: Dict[str, Any], category_id: Optional[int]) -> tuple:
+    return (position, raw['idDrink'], raw.get('strDrink'), category_id,
+            json.dumps(raw, ensure_ascii=False, separators=(',', ':')))
+
+
+def _recipe_slots(raw: Dict[str, Any]) -> Iterable[tuple]:
+    """Yield ``(slot, ingredient, measure)`` for the filled ingredient slots."""
+    for slot in range(1, INGREDIENT_SLOTS + 1):
+        ingredient = raw.get(f'strIngredient{slot}')
+        if ingredient:
+            yield slot, ingredient, raw.get(f'strMeasure{slot}')
+
+
+def _instructions_row(position: int, raw: Dict[str, Any]) -> tuple:
+    return (position, *(raw.get(field) for field in LANGUAGE_FIELDS.values()))
+
+
+def import_dump(json_file: str, db_path: str, batch_size: int = IMPORT_BATCH) -> str:
+    """Build an SQLite catalog at ``db_path`` from a TheCocktailDB JSON dump.
+
+    The dump is streamed, so it never has to fit in memory. The database is
+    written next to ``db_path`` and moved into place when complete. Returns
+    ``db_path``.
+    """
+    tmp_path = f'{db_path}.tmp{os.getpid()}'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute('PRAGMA journal_mode=OFF')
+        connection.execute('PRAGMA synchronous=OFF')
+        connection.executescript(_SCHEMA)
+        categories: Dict[str, int] = {}
+        ingredients: Dict[str, int] = {}
+        drinks, recipe, instructions = [], [], []
+
+        def flush():
+            with connection:
+                connection.executemany('INSERT INTO drinks VALUES (?, ?, ?, ?, ?)', drinks)
+                connection.executemany('INSERT INTO recipe VALUES (?, ?, ?, ?)', recipe)
+                connection.executemany(
+                    f"INSERT INTO instructions_fts (rowid, {', '.join(LANGUAGE_FIELDS)}) "
+                    f"VALUES (?{', ?' * len(LANGUAGE_FIELDS)})",
+                    instructions,
+                )
+            drinks.clear()
+            recipe.clear()
+            instructions.clear()
+
+        for position, (raw, _, _) in enumerate(iter_dump_records(json_file)):
+            category = raw.get('strCategory')
+            category_id = None
+            if category:
+                category_id = categories.setdefault(category, len(categories) + 1)
+            drinks.append(_drink_row(position, raw, category_id))
+            for slot, ingredient, measure in _recipe_slots(raw):
+                ingredient_id = ingredients.setdefault(ingredient, len(ingredients) + 1)
+                recipe.append((position, slot, ingredient_id, measure))
+            instructions.append(_instructions_row(position, raw))
+            if len(drinks) >= batch_size:
+                flush()
+        flush()
+
+        with connection:
+            connection.executemany('INSERT INTO categories VALUES (?, ?)',
+                                   ((category_id, name) for name, category_id in categories.items()))
+            connection.executemany('INSERT INTO ingredients VALUES (?, ?)',
+                                   ((ingredient_id, name) for name, ingredient_id in ingredients.items()))
+            connection.execute("INSERT INTO name_fts (name_fts) VALUES ('rebuild')")
+            connection.execute("INSERT INTO ingredient_fts (ingredient_fts) VALUES ('rebuild')")
+            connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('schema_version', str(SCHEMA_VERSION)),
+                # Identifies this import; revision counts the commits since.
+                ('build', uuid.uuid4().hex),
+                ('revision', '0'),
+            ])
+        connection.execute('ANALYZE')
+    except BaseException:
+        connection.close()
+        os.remove(tmp_path)
+        raise
+    connection.close()
+    os.replace(tmp_path, db_path)
+    return db_path
+
+
+def catalog_version(db_path: str) -> str:
+    """Return a string that changes with every commit to an SQLite catalog.
+
+    It names the import the database came from and the number of
+    ``upsert``/``delete`` commits since, so it is cheap to read however
+    large the database is.
+    """
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        meta = dict(connection.execute("SELECT key, value FROM meta WHERE key IN ('build', 'revision')"))
+    finally:
+        connection.close()
+    return f"{meta.get('build')}:{meta.get('revision')}"
+
+
+class SQLiteCocktailDB(CocktailStore):
+    """A catalog served from a database built by ``import_dump``.
+
+    Each thread (and each forked process) gets its own read-only connection;
+    ``upsert`` and ``delete`` go through a separate writable one. Records
+    are decoded from the stored JSON on demand; up to ``cache_size`` of them
+    are kept for ``get_cocktail_by_id``, and dropped whenever any process
+    commits a change to the database.
+    """
+
+    def __init__(self, db_path: str, cache_size: int = 1024):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        self.db_path = db_path
+        self.ingredients = IngredientTable()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_pid: Optional[int] = None
+        version = self._execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if version is None or int(version[0]) != SCHEMA_VERSION:
+            raise ValueError(f'{db_path} was built for a different schema version; re-import it')
+        self._by_id = lru_cache(maxsize=cache_size)(self._read_by_id)
+
+    def _connection(self) -> sqlite3.Connection:
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = sqlite3.connect(f'file:{self.db_path}?mode=ro', uri=True)
+            local.pid = os.getpid()
+            local.data_version = None
+        return local.connection
+
+    def _execute(self, sql: str, parameters: Iterable[Any] = ()) -> sqlite3.Cursor:
+        return self._connection().execute(sql, tuple(parameters))
+
+    def __len__(self) -> int:
+        return self._execute('SELECT count(*) FROM drinks').fetchone()[0]
+
+    def _collect(self, positions: List[int]) -> List[Cocktail]:
+        records: Dict[int, Cocktail] = {}
+        for chunk in _chunks(positions):
+            rows = self._execute(
+                f"SELECT position, raw FROM drinks WHERE position IN ({', '.join('?' * len(chunk))})", chunk)
+            for position, raw in rows:
+                records[position] = Cocktail(json.loads(raw), self.ingredients)
+        # A drink deleted since its position was matched is skipped.
+        return [records[position] for position in positions if position in records]
+
+    def _read_by_id(self, drink_id: str) -> Optional[Cocktail]:
+        row = self._execute('SELECT raw FROM drinks WHERE id = ?', (drink_id,)).fetchone()
+        return None if row is None else Cocktail(json.loads(row[0]), self.ingredients)
+
+    def get_cocktail_by_id(self, drink_id: str) -> Optional[Cocktail]:
+        """Get a cocktail by its ID."""
+        # data_version changes whenever another connection commits, so cached
+        # records never outlive an update made by this or any other process.
+        data_version = self._execute('PRAGMA data_version').fetchone()[0]
+        if data_version != self._local.data_version:
+            if self._local.data_version is not None:
+                self._by_id.cache_clear()
+            self._local.data_version = data_version
+        return self._by_id(drink_id)
+
+    def _write_connection(self) -> sqlite3.Connection:
+        if self._writer is None or self._writer_pid != os.getpid():
+            self._writer = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._writer_pid = os.getpid()
+        return self._writer
+
+    @staticmethod
+    def _remove(connection: sqlite3.Connection, drink_id: str) -> Optional[int]:
+        """Delete a drink's rows and index entries; returns its old position."""
+        row = connection.execute('SELECT position, name FROM drinks WHERE id = ?', (drink_id,)).fetchone()
+        if row is None:
+            return None
+        position, name = row
+        # External-content FTS tables are told which values to forget.
+        connection.execute("INSERT INTO name_fts (name_fts, rowid, name) VALUES ('delete', ?, ?)",
+                           (position, name))
+        connection.execute('DELETE FROM instructions_fts WHERE rowid = ?', (position,))
+        connection.execute('DELETE FROM recipe WHERE drink = ?', (position,))
+        connection.execute('DELETE FROM drinks WHERE position = ?', (position,))
+        return position
+
+    @staticmethod
+    def _bump_revision(connection: sqlite3.Connection) -> None:
+        connection.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+
+    @staticmethod
+    def _name_id(connection: sqlite3.Connection, table: str, name: str) -> int:
+        row = connection.execute(f'SELECT id FROM {table} WHERE name = ?', (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        row_id = connection.execute(f'INSERT INTO {table} (name) VALUES (?)', (name,)).lastrowid
+        if table == 'ingredients':
+            connection.execute('INSERT INTO ingredient_fts (rowid, name) VALUES (?, ?)', (row_id, name))
+        return row_id
+
+    def upsert(self, raw: Dict[str, Any]) -> None:
+        """Add a drink, or replace the one with the same ``idDrink``.
+
+        A replaced drink keeps its catalog position; a new one is appended.
+        """
+        drink_id = raw.get('idDrink')
+        if not isinstance(drink_id, str) or not drink_id:
+            raise ValueError('A drink needs a non-empty string idDrink')
+        with self._write_lock:
+            connection = self._write_connection()
+            with connection:
+                position = self._remove(connection, drink_id)
+                if position is None:
+                    position = connection.execute('SELECT coalesce(max(position), -1) + 1 FROM drinks').fetchone()[0]
+                category = raw.get('strCategory')
+                category_id = self._name_id(connection, 'categories', category) if category else None
+                connection.execute('INSERT INTO drinks VALUES (?, ?, ?, ?, ?)',
+                                   _drink_row(position, raw, category_id))
+                connection.execute('INSERT INTO name_fts (rowid, name) VALUES (?, ?)',
+                                   (position, raw.get('strDrink')))
+                connection.executemany('INSERT INTO recipe VALUES (?, ?, ?, ?)', [
+                    (position, slot, self._name_id(connection, 'ingredients', ingredient), measure)
+                    for slot, ingredient, measure in _recipe_slots(raw)
+                ])
+                connection.execute(
+                    f"INSERT INTO instructions_fts (rowid, {', '.join(LANGUAGE_FIELDS)}) "
+                    f"VALUES (?{', ?' * len(LANGUAGE_FIELDS)})",
+                    _instructions_row(position, raw),
+                )
+                self._bump_revision(connection)
+        self._by_id.cache_clear()
+
+    def delete(self, drink_id: str) -> bool:
+        """Remove a drink; returns whether it existed."""
+        with self._write_lock:
+            connection = self._write_connection()
+            with connection:
+                removed = self._remove(connection, drink_id) is not None
+                if removed:
+                    self._bump_revision(connection)
+        self._by_id.cache_clear()
+        return removed
+
+    def _matching(self, table: str, fts_table: str, query: str, case_sensitive: bool) -> List[int]:
+        """Return the row ids of ``table`` whose name contains ``query``."""
+        needle = query if case_sensitive else query.lower()
+        # The trigram tokenizer folds case its own way, so it is only used to
+        # prune candidates for ASCII queries long enough to form a trigram.
+        if len(query) >= 3 and query.isascii():
+            rows = self._execute(f'SELECT rowid, name FROM {fts_table} WHERE {fts_table} MATCH ?',
+                                 (_phrase(query),))
+        else:
+            rows = self._execute(f'SELECT rowid, name FROM {table}')
+        return [
+            row_id for row_id, name in rows
+            if name is not None and needle in (name if case_sensitive else name.lower())
+        ]
+
+    def search_by_name(self, name: str, case_sensitive: bool = False) -> List[Cocktail]:
+        """Search for cocktails by name."""
+        return self._collect(sorted(self._matching('drinks', 'name_fts', name, case_sensitive)))
+
+    def search_by_ingredient(self, ingredient: str, case_sensitive: bool = False) -> List[Cocktail]:
+        """Search for cocktails containing a specific ingredient."""
+        ingredient_ids = self._matching('ingredients', 'ingredient_fts', ingredient, case_sensitive)
+        positions = set()
+        for chunk in _chunks(ingredient_ids):
+            rows = self._execute(
+                f"SELECT drink FROM recipe WHERE ingredient IN ({', '.join('?' * len(chunk))})", chunk)
+            positions.update(position for position, in rows)
+        return self._collect(sorted(positions))
+
+    def search_by_category(self, category: str, case_sensitive: bool = False) -> List[Cocktail]:
+        """Search for cocktails by category."""
+        needle = category if case_sensitive else category.lower()
+        category_ids = [
+            category_id for category_id, name in self._execute('SELECT id, name FROM categories')
+            if needle in (name if case_sensitive else name.lower())
+        ]
+        positions = []
+        for chunk in _chunks(category_ids):
+            rows = self._execute(
+                f"SELECT position FROM drinks WHERE category IN ({', '.join('?' * len(chunk))})", chunk)
+            positions.extend(position for position, in rows)
+        return self._collect(sorted(positions))
+
+    def _text_match(self, query: str, language: str) -> Optional[str]:
+        if language not in LANGUAGE_FIELDS:
+            raise ValueError(f"Unsupported language {language!r}; expected one of {', '.join(LANGUAGE_FIELDS)}")
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return None
+        return f"{language} : ({' OR '.join(_phrase(term) for term in terms)})"
+
+    def search_by_text(self, query: str, language: str = 'en', limit: Optional[int] = None) -> List[Cocktail]:
+        """Search cocktail instructions in the given language, best matches first.
+
+        ``language`` is one of ``en``, ``es``, ``de``, ``fr`` or ``it``.
+        Matches are ranked with FTS5's BM25; pass ``limit`` to keep only the
+        top hits.
+        """
+        match = self._text_match(query, language)
+        if match is None:
+            return []
+        rows = self._execute(
+            'SELECT rowid FROM instructions_fts WHERE instructions_fts MATCH ? '
+            'ORDER BY bm25(instructions_fts), rowid LIMIT ?',
+            (match, -1 if limit is None else limit),
+        )
+        return self._collect([position for position, in rows])
+
+    def count_by_text(self, query: str, language: str = 'en') -> int:
+        """Return how many cocktails ``search_by_text`` would match."""
+        match = self._text_match(query, language)
+        if match is None:
+            return 0
+        return self._execute('SELECT count(*) FROM instructions_fts WHERE instructions_fts MATCH ?',
+                             (match,)).fetchone()[0]
+
+    def close(self) -> None:
+        """Close this thread's connection and the write connection."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.pid = None
+        with self._write_lock:
+            if self._writer is not None and self._writer_pid == os.getpid():
+                self._writer.close()
+            self._writer = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import a TheCocktailDB JSON dump into an SQLite catalog.')
+    parser.add_argument('json_file', nargs='?', default='cocktaildb_dump.json')
+    parser.add_argument('db_path', nargs='?', default='cocktails.sqlite')
+    args = parser.parse_args()
+    import_dump(args.json_file, args.db_path)
+    print(f'Wrote {args.db_path} ({len(SQLiteCocktailDB(args.db_path))} drinks)')
+
+
+if __name__ == '__main__':
+    main()
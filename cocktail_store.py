@@ -0,0 +1,83 @@
+"""Storage-backend interface for the cocktail catalog.
+
+``CocktailDB`` keeps the whole catalog and its indexes in memory;
+``SQLiteCocktailDB`` (``cocktail_sqlite.py``) answers the same searches
+from an on-disk SQLite database. Code that only needs the searches below
+can take any ``CocktailStore`` and use ``open_store`` to pick the backend
+from the file it is given.
+"""
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from contextlib import nullcontext
+from typing import Any, ContextManager, Dict, List, Optional
+
+# File extensions opened with the SQLite backend by ``open_store``.
+SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+
+class CocktailStore(ABC):
+    """Searches and updates every catalog backend supports.
+
+    Records are read-only mappings in the raw TheCocktailDB shape that also
+    expose ``ingredients`` as ``(name, measure)`` pairs. Search results are
+    in catalog order, except ``search_by_text`` which ranks by relevance.
+    """
+
+    @abstractmethod
+    def get_cocktail_by_id(self, drink_id: str) -> Optional[Mapping]:
+        """Get a cocktail by its ID."""
+
+    @abstractmethod
+    def search_by_name(self, name: str, case_sensitive: bool = False) -> List[Mapping]:
+        """Search for cocktails by name."""
+
+    @abstractmethod
+    def search_by_ingredient(self, ingredient: str, case_sensitive: bool = False) -> List[Mapping]:
+        """Search for cocktails containing a specific ingredient."""
+
+    @abstractmethod
+    def search_by_category(self, category: str, case_sensitive: bool = False) -> List[Mapping]:
+        """Search for cocktails by category."""
+
+    @abstractmethod
+    def search_by_text(self, query: str, language: str = 'en', limit: Optional[int] = None) -> List[Mapping]:
+        """Search cocktail instructions in the given language, best matches first."""
+
+    @abstractmethod
+    def count_by_text(self, query: str, language: str = 'en') -> int:
+        """Return how many cocktails ``search_by_text`` would match."""
+
+    @abstractmethod
+    def upsert(self, raw: Dict[str, Any]) -> None:
+        """Add a drink, or replace the one with the same ``idDrink``."""
+
+    @abstractmethod
+    def delete(self, drink_id: str) -> bool:
+        """Remove a drink; returns whether it existed."""
+
+    def reading(self) -> ContextManager[None]:
+        """Hold off updates from other threads for the duration of a ``with`` block.
+
+        Calls made inside the block see the catalog either before or after
+        each ``upsert``/``delete``, never halfway through one. Backends
+        whose searches are already isolated from writes need no lock.
+        """
+        return nullcontext()
+
+    def writing(self) -> ContextManager[None]:
+        """Keep searches on other threads out for the duration of a ``with`` block."""
+        return nullcontext()
+
+
+def open_store(path: str, **options: Any) -> CocktailStore:
+    """Open ``path`` with the backend its extension calls for.
+
+    SQLite databases built by ``cocktail_sqlite.py`` open as
+    ``SQLiteCocktailDB``; anything else is treated as a JSON dump and loaded
+    into a ``CocktailDB``. ``options`` go to the backend's constructor.
+    """
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        from cocktail_sqlite import SQLiteCocktailDB
+        return SQLiteCocktailDB(path, **options)
+    from cocktail_search import CocktailDB
+    return CocktailDB(path, **options)
@@ -0,0 +1,124 @@
+"""Prefix completion over drink names, ingredients and categories.
+
+``SuggestIndex`` stores every word-start suffix of every suggestion
+("Blue Margarita" is reachable from "blue" and "marg") in one sorted array,
+so completing a prefix is a ``bisect`` range lookup. Suggestions are ranked
+by the number of drinks they match. Rankings for very short prefixes, whose
+ranges cover much of the array, are precomputed at build time. ``adjust`` applies drink-count changes from
+catalog deltas without a rebuild.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Tuple
+
+_WORD_START = re.compile(r'\b\w')
+
+# Prefixes up to this length have their top suggestions precomputed.
+PRECOMPUTED_PREFIX = 2
+
+# Most suggestions a single lookup may return.
+MAX_SUGGESTIONS = 20
+
+
+class SuggestIndex:
+    """Sorted-array prefix index of ``(text, kind, count)`` suggestions."""
+
+    def __init__(self, entries: Iterable[Tuple[str, str, int]]):
+        self.entries: List[Tuple[str, str, int]] = []
+        self._entry_ids_by_key: Dict[Tuple[str, str], int] = {}
+        for text, kind, count in entries:
+            # Spellings differing only in case ("Lemon juice"/"Lemon Juice")
+            # become one suggestion under the most common spelling.
+            key = (kind, text.lower())
+            entry_id = self._entry_ids_by_key.get(key)
+            if entry_id is None:
+                self._entry_ids_by_key[key] = len(self.entries)
+                self.entries.append((text, kind, count))
+            else:
+                best_text, _, total = self.entries[entry_id]
+                if count > total - count:
+                    best_text = text
+                self.entries[entry_id] = (best_text, kind, total + count)
+
+        keys = sorted(
+            (key, entry_id)
+            for entry_id, (text, _, _) in enumerate(self.entries)
+            for key in self._suffixes(text)
+        )
+        self._keys = [key for key, _ in keys]
+        self._entry_ids = [entry_id for _, entry_id in keys]
+
+        self._top: Dict[str, List[int]] = {}
+        prefixes = {key[:length] for key in self._keys for length in range(1, PRECOMPUTED_PREFIX + 1)}
+        for prefix in prefixes:
+            self._top[prefix] = self._rank(prefix, MAX_SUGGESTIONS)
+
+    @staticmethod
+    def _suffixes(text: str) -> List[str]:
+        lowered = text.lower()
+        return [lowered[match.start():] for match in _WORD_START.finditer(lowered)]
+
+    def _sort_key(self, entry_id: int) -> Tuple[int, str]:
+        text, _, count = self.entries[entry_id]
+        return -count, text.lower()
+
+    def _rank(self, prefix: str, limit: int) -> List[int]:
+        low = bisect_left(self._keys, prefix)
+        high = bisect_left(self._keys, prefix + '\U0010ffff', low)
+        candidates = {entry_id for entry_id in self._entry_ids[low:high] if self.entries[entry_id][2] > 0}
+        return heapq.nsmallest(limit, candidates, key=self._sort_key)
+
+    def adjust(self, text: str, kind: str, delta: int) -> None:
+        """Change the drink count of a suggestion by ``delta``, adding it if new.
+
+        Suggestions whose count drops to zero stop being returned.
+        """
+        key = (kind, text.lower())
+        entry_id = self._entry_ids_by_key.get(key)
+        if entry_id is None:
+            if delta <= 0:
+                return
+            entry_id = self._entry_ids_by_key[key] = len(self.entries)
+            self.entries.append((text, kind, delta))
+            for suffix in self._suffixes(text):
+                index = bisect_left(self._keys, suffix)
+                self._keys.insert(index, suffix)
+                self._entry_ids.insert(index, entry_id)
+        else:
+            display, _, count = self.entries[entry_id]
+            self.entries[entry_id] = (display, kind, max(0, count + delta))
+
+        # Keep the precomputed rankings current: a grown entry can be merged
+        # in directly, while a shrunken one that was ranked may let another
+        # entry in, so that prefix is re-ranked on its next lookup.
+        for prefix in {suffix[:length] for suffix in self._suffixes(text)
+                       for length in range(1, PRECOMPUTED_PREFIX + 1)}:
+            top = self._top.get(prefix)
+            if top is None:
+                continue
+            if delta < 0:
+                if entry_id in top:
+                    del self._top[prefix]
+            else:
+                if entry_id not in top:
+                    top.append(entry_id)
+                top.sort(key=self._sort_key)
+                del top[MAX_SUGGESTIONS:]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, str, int]]:
+        """Return up to ``limit`` ``(text, kind, count)`` completions of ``prefix``."""
+        prefix = prefix.strip().lower()
+        if not prefix or limit < 1:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        if len(prefix) <= PRECOMPUTED_PREFIX:
+            top = self._top.get(prefix)
+            if top is None:
+                top = self._rank(prefix, MAX_SUGGESTIONS)
+                if top:
+                    self._top[prefix] = top
+            entry_ids = top[:limit]
+        else:
+            entry_ids = self._rank(prefix, limit)
+        return [self.entries[entry_id] for entry_id in entry_ids]
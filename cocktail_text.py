@@ -0,0 +1,138 @@
+"""Ranked full-text search over cocktail instructions.
+
+One ``TextIndex`` covers the instructions of a single language. It keeps
+per-term posting lists of ``(position, term frequency)`` and scores matches
+with BM25; only the best ``k`` hits are selected, through a heap, so a broad
+query does not sort every matching drink. Documents can be added and
+removed individually, so catalog deltas never rebuild the index. Terms are lowercased and stripped
+of accents, so "fria" matches "fría".
+"""
+import heapq
+import math
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cocktail_fuzzy import words
+
+# Language code -> raw TheCocktailDB field holding the instructions.
+LANGUAGE_FIELDS = {
+    'en': 'strInstructions',
+    'es': 'strInstructionsES',
+    'de': 'strInstructionsDE',
+    'fr': 'strInstructionsFR',
+    'it': 'strInstructionsIT',
+}
+
+# Standard BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+# (document count, total document length, {term: document frequency})
+Statistics = Tuple[int, int, Dict[str, int]]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split ``text`` into lowercase, accent-free terms."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return words(stripped)
+
+
+class TextIndex:
+    """BM25 inverted index over one text field of the catalog."""
+
+    def __init__(self, documents: Iterable[Tuple[int, Optional[str]]]):
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        for position, text in documents:
+            self.add(position, text)
+
+    @property
+    def document_count(self) -> int:
+        return len(self._lengths)
+
+    @staticmethod
+    def _counts(terms: List[str]) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def add(self, position: int, text: Optional[str]) -> None:
+        """Index the document at ``position``, which must not be indexed yet."""
+        if not text:
+            return
+        terms = tokenize(text)
+        self._lengths[position] = len(terms)
+        self._total_length += len(terms)
+        for term, count in self._counts(terms).items():
+            posting = self.postings.setdefault(term, [])
+            if not posting or posting[-1][0] < position:
+                posting.append((position, count))
+            else:
+                insort(posting, (position, count))
+
+    def remove(self, position: int, text: Optional[str]) -> None:
+        """Drop the document at ``position``, previously added with ``text``."""
+        if position not in self._lengths:
+            return
+        # Postings go first: a concurrent search must never find a posting
+        # whose document length is already gone.
+        for term in set(tokenize(text or '')):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            index = bisect_left(posting, (position,))
+            if index < len(posting) and posting[index][0] == position:
+                del posting[index]
+        self._total_length -= self._lengths.pop(position)
+
+    def _terms(self, query: str) -> List[str]:
+        # Sorted, so scores are summed in the same order in every index.
+        return sorted({term for term in tokenize(query) if term in self.postings})
+
+    def statistics(self, query: str) -> Statistics:
+        """Return the corpus statistics ``search`` uses for ``query``.
+
+        Several indexes over disjoint parts of one corpus can sum these and
+        pass the totals to ``search`` to score exactly as one index would.
+        """
+        return self._statistics(self._terms(query))
+
+    def _statistics(self, terms: List[str]) -> Statistics:
+        return self.document_count, self._total_length, {term: len(self.postings[term]) for term in terms}
+
+    def count(self, query: str) -> int:
+        """Return how many documents contain at least one query term."""
+        return len({position for term in self._terms(query) for position, _ in self.postings[term]})
+
+    def search(self, query: str, k: Optional[int] = None,
+               statistics: Optional[Statistics] = None) -> List[Tuple[int, float]]:
+        """Return the top ``k`` ``(position, score)`` pairs, best first; all hits if ``k`` is None.
+
+        ``statistics`` replaces this index's own document count, total length
+        and document frequencies (see ``statistics``).
+        """
+        scores: Dict[int, float] = {}
+        terms = self._terms(query)
+        document_count, total_length, frequencies = statistics or self._statistics(terms)
+        average = total_length / document_count if document_count else 1.0
+        # BM25's length normalization, K1 * (1 - B + B * length / average), as base + slope * length.
+        base, slope = K1 * (1 - B), K1 * B / average if average else 0.0
+        lengths = self._lengths
+        for term in terms:
+            posting = self.postings[term]
+            frequency_in_corpus = frequencies.get(term, len(posting))
+            idf = math.log(1 + (document_count - frequency_in_corpus + 0.5) / (frequency_in_corpus + 0.5))
+            for position, frequency in posting:
+                gain = idf * frequency * (K1 + 1) / (frequency + base + slope * lengths[position])
+                scores[position] = scores.get(position, 0.0) + gain
+
+        def rank(hit):
+            return hit[1], -hit[0]
+
+        if k is None or k >= len(scores):
+            return sorted(scores.items(), key=rank, reverse=True)
+        return heapq.nlargest(k, scores.items(), key=rank)
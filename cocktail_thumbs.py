@@ -0,0 +1,163 @@
+"""Concurrent, disk-cached thumbnail fetching for the Streamlit front-ends.
+
+Rendering a result grid used to issue one blocking ``requests.get`` per card
+on every rerun. ``ThumbnailService`` keeps a pooled HTTP session, fetches a
+whole page of images in parallel on a bounded thread pool, stores resized
+JPEG thumbnails in an on-disk cache with size-based LRU eviction and falls
+back to a placeholder image when a download fails or times out.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from typing import Dict, Iterable, Optional, Tuple
+
+import requests
+from PIL import Image, ImageDraw
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.thumbnail_cache')
+
+
+class ThumbnailService:
+    """Fetch, resize and cache drink thumbnails.
+
+    ``get`` and ``prefetch`` always return JPEG bytes suitable for
+    ``st.image``; any URL that cannot be fetched within ``timeout`` seconds
+    yields the placeholder instead of raising.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_cache_bytes: int = 64 * 1024 * 1024,
+                 size: Tuple[int, int] = (300, 300), timeout: float = 3.0, max_workers: int = 8,
+                 session: Optional[requests.Session] = None):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_bytes
+        self.size = size
+        self.timeout = timeout
+        self.session = session or self._make_session(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbs')
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._cache_bytes = 0
+        self.placeholder = self._make_placeholder()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._scan_cache()
+
+    @staticmethod
+    def _make_session(max_workers: int) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _make_placeholder(self) -> bytes:
+        image = Image.new('RGB', self.size, (230, 230, 230))
+        ImageDraw.Draw(image).text((self.size[0] // 2, self.size[1] // 2), 'No Image',
+                                   fill=(120, 120, 120), anchor='mm')
+        return self._encode(image)
+
+    def _encode(self, image: Image.Image) -> bytes:
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=85)
+        return buffer.getvalue()
+
+    def _scan_cache(self) -> None:
+        """Load existing cache files into the LRU, least recently used first."""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith('.jpg'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._cache_bytes += size
+        self._evict()
+
+    def _cache_name(self, url: str) -> str:
+        key = f'{self.size[0]}x{self.size[1]}:{url}'.encode('utf-8')
+        return hashlib.sha1(key).hexdigest() + '.jpg'
+
+    def _read_cached(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        path = os.path.join(self.cache_dir, name)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._cache_bytes -= self._entries.pop(name, 0)
+            return None
+        return data
+
+    def _write_cached(self, name: str, data: bytes) -> None:
+        path = os.path.join(self.cache_dir, name)
+        tmp_path = f'{path}.tmp{threading.get_ident()}'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._cache_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Caller holds self._lock (or is the constructor).
+        while self._cache_bytes > self.max_cache_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._cache_bytes -= size
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _fetch(self, url: str) -> Optional[bytes]:
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            image = Image.open(BytesIO(response.content))
+            image.thumbnail(self.size)
+            return self._encode(image.convert('RGB'))
+        except (requests.RequestException, OSError, ValueError):
+            return None
+
+    def get(self, url: Optional[str]) -> bytes:
+        """Return the thumbnail for ``url``, downloading it if it is not cached."""
+        if not url:
+            return self.placeholder
+        name = self._cache_name(url)
+        data = self._read_cached(name)
+        if data is None:
+            data = self._fetch(url)
+            if data is None:
+                return self.placeholder
+            self._write_cached(name, data)
+        return data
+
+    def prefetch(self, urls: Iterable[Optional[str]]) -> Dict[Optional[str], bytes]:
+        """Fetch every URL in parallel and return a ``{url: thumbnail}`` map.
+
+        URLs still downloading after ``timeout`` seconds map to the
+        placeholder; they keep downloading in the background and will be
+        served from the cache on a later call.
+        """
+        unique = list(dict.fromkeys(urls))
+        futures = {url: self._executor.submit(self.get, url) for url in unique}
+        wait(futures.values(), timeout=self.timeout)
+        return {
+            url: future.result() if future.done() else self.placeholder
+            for url, future in futures.items()
+        }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.session.close()
@@ -4,10 +4,80 @@ document.addEventListener('DOMContentLoaded', function() {
     const searchType = document.getElementById('searchType');
     const resultsDiv = document.getElementById('results');
     const loadingDiv = document.getElementById('loading');
+    const suggestionList = document.getElementById('suggestions');
     
     // Initialize Bootstrap modal
     const cocktailModal = new bootstrap.Modal(document.getElementById('cocktailModal'));
     
+    // Number of results requested per page
+    const PAGE_SIZE = 24;
+    
+    // State of the current search, used to fetch further pages on scroll
+    let currentSearch = null;
+    let nextCursor = null;
+    let loadingPage = false;
+    let resultsRow = null;
+    
+    // Load the next page when the sentinel below the results scrolls into view
+    const sentinel = document.createElement('div');
+    const pageObserver = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }, { rootMargin: '400px' });
+    
+    // Delay before asking for suggestions after the last keystroke
+    const SUGGEST_DELAY_MS = 150;
+    let suggestTimer = null;
+    let suggestController = null;
+    let suggestionTypes = new Map();
+    
+    // Offer completions while typing; only the latest request is kept
+    searchQuery.addEventListener('input', function() {
+        clearTimeout(suggestTimer);
+        const prefix = searchQuery.value.trim();
+        
+        // Picking a suggestion also selects the matching search type
+        if (suggestionTypes.has(searchQuery.value)) {
+            const type = suggestionTypes.get(searchQuery.value);
+            if (searchType.querySelector(`option[value="${type}"]`)) {
+                searchType.value = type;
+            }
+            return;
+        }
+        if (!prefix) {
+            suggestionList.innerHTML = '';
+            return;
+        }
+        suggestTimer = setTimeout(() => fetchSuggestions(prefix), SUGGEST_DELAY_MS);
+    });
+    
+    function fetchSuggestions(prefix) {
+        if (suggestController) {
+            suggestController.abort();
+        }
+        suggestController = new AbortController();
+        
+        fetch(`/suggest?q=${encodeURIComponent(prefix)}&limit=8`, { signal: suggestController.signal })
+        .then(response => response.ok ? response.json() : { suggestions: [] })
+        .then(data => {
+            suggestionList.innerHTML = '';
+            suggestionTypes = new Map();
+            data.suggestions.forEach(suggestion => {
+                const option = document.createElement('option');
+                option.value = suggestion.text;
+                option.label = `${suggestion.type} · ${suggestion.count}`;
+                suggestionList.appendChild(option);
+                suggestionTypes.set(suggestion.text, suggestion.type);
+            });
+        })
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                suggestionList.innerHTML = '';
+            }
+        });
+    }
+    
     // Search when button is clicked or Enter is pressed
     searchButton.addEventListener('click', performSearch);
     searchQuery.addEventListener('keypress', function(e) {
@@ -25,20 +95,57 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
+        pageObserver.disconnect();
+        currentSearch = { type: type, query: query };
+        nextCursor = null;
+        resultsRow = null;
+        resultsDiv.innerHTML = '';
+        
         // Show loading indicator
         loadingDiv.classList.remove('d-none');
-        resultsDiv.innerHTML = '';
+        
+        const search = currentSearch;
+        fetchPage(search, null)
+        .then(data => {
+            // Nothing matched exactly: retry once allowing for typos
+            if (data.total === 0 && (type === 'name' || type === 'ingredient')) {
+                search.fuzzy = true;
+                return fetchPage(search, null);
+            }
+            return data;
+        })
+        .then(data => {
+            if (search === currentSearch) {
+                displayResults(data);
+            }
+        })
+        .catch(error => {
+            showAlert(error.message || 'An error occurred while searching', 'danger');
+        })
+        .finally(() => {
+            loadingDiv.classList.add('d-none');
+        });
+    }
+    
+    function fetchPage(search, cursor) {
+        const body = {
+            type: search.type,
+            query: search.query,
+            fields: 'summary',
+            limit: PAGE_SIZE,
+            fuzzy: Boolean(search.fuzzy)
+        };
+        if (cursor) {
+            body.cursor = cursor;
+        }
         
         // Make API request
-        fetch('/search', {
+        return fetch('/search', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({
-                type: type,
-                query: query
-            })
+            body: JSON.stringify(body)
         })
         .then(response => {
             if (!response.ok) {
@@ -50,32 +157,54 @@ document.addEventListener('DOMContentLoaded', function() {
             if (data.error) {
                 throw new Error(data.error);
             }
-            displayResults(data.results);
+            return data;
+        });
+    }
+    
+    function loadNextPage() {
+        if (!nextCursor || loadingPage) {
+            return;
+        }
+        const search = currentSearch;
+        loadingPage = true;
+        
+        fetchPage(search, nextCursor)
+        .then(data => {
+            // Ignore pages of a search that has since been replaced
+            if (search === currentSearch) {
+                appendResults(data);
+            }
         })
         .catch(error => {
-            showAlert(error.message || 'An error occurred while searching', 'danger');
+            showAlert(error.message || 'An error occurred while loading more results', 'danger');
         })
         .finally(() => {
-            loadingDiv.classList.add('d-none');
+            loadingPage = false;
         });
     }
     
-    function displayResults(cocktails) {
+    function displayResults(data) {
         resultsDiv.innerHTML = '';
         
-        if (cocktails.length === 0) {
+        if (data.total === 0) {
             showAlert('No cocktails found matching your search', 'info');
             return;
         }
         
         const resultsHeader = document.createElement('h3');
-        resultsHeader.textContent = `Found ${cocktails.length} cocktail${cocktails.length !== 1 ? 's' : ''}:`;
+        resultsHeader.textContent = `Found ${data.total} cocktail${data.total !== 1 ? 's' : ''}:`;
         resultsDiv.appendChild(resultsHeader);
         
-        const row = document.createElement('div');
-        row.className = 'row row-cols-1 row-cols-md-2 g-4 mt-2';
+        resultsRow = document.createElement('div');
+        resultsRow.className = 'row row-cols-1 row-cols-md-2 g-4 mt-2';
+        resultsDiv.appendChild(resultsRow);
+        resultsDiv.appendChild(sentinel);
         
-        cocktails.forEach(cocktail => {
+        appendResults(data);
+    }
+    
+    function appendResults(data) {
+        data.results.forEach(cocktail => {
             const col = document.createElement('div');
             col.className = 'col';
             
@@ -86,6 +215,7 @@ document.addEventListener('DOMContentLoaded', function() {
             image.src = cocktail.image || 'https://via.placeholder.com/300x200?text=No+Image';
             image.className = 'card-img-top';
             image.alt = cocktail.name;
+            image.loading = 'lazy';
             image.style.height = '200px';
             image.style.objectFit = 'cover';
             
@@ -103,7 +233,7 @@ document.addEventListener('DOMContentLoaded', function() {
             const viewButton = document.createElement('button');
             viewButton.className = 'btn btn-outline-primary btn-sm mt-2';
             viewButton.textContent = 'View Recipe';
-            viewButton.onclick = () => showCocktailDetails(cocktail);
+            viewButton.onclick = () => loadCocktailDetails(cocktail.id);
             
             cardBody.appendChild(title);
             cardBody.appendChild(category);
@@ -112,10 +242,28 @@ document.addEventListener('DOMContentLoaded', function() {
             card.appendChild(image);
             card.appendChild(cardBody);
             col.appendChild(card);
-            row.appendChild(col);
+            resultsRow.appendChild(col);
         });
         
-        resultsDiv.appendChild(row);
+        nextCursor = data.next_cursor;
+        pageObserver.disconnect();
+        if (nextCursor) {
+            pageObserver.observe(sentinel);
+        }
+    }
+    
+    function loadCocktailDetails(id) {
+        fetch(`/cocktail/${encodeURIComponent(id)}`)
+        .then(response => {
+            if (!response.ok) {
+                return response.json().then(err => { throw err; });
+            }
+            return response.json();
+        })
+        .then(showCocktailDetails)
+        .catch(error => {
+            showAlert(error.message || error.error || 'Could not load cocktail details', 'danger');
+        });
     }
     
     function showCocktailDetails(cocktail) {
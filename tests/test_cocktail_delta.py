@@ -0,0 +1,210 @@
+"""Catalogs updated with upsert/delete against the same catalog rebuilt from scratch."""
+import copy
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cocktail_search import CocktailDB  # noqa: E402
+from cocktail_sqlite import SQLiteCocktailDB, import_dump  # noqa: E402
+
+DUMP = os.path.join(ROOT, 'cocktaildb_dump.json')
+
+QUERIES = ['', 'a', 'mar', 'Royale', 'royale', 'Newdrink', 'gin', 'Mezcal', 'yuzu', 'Zubrowka',
+           'lemon', 'Shot', 'Brand', 'punch', 'ordinary', 'zz']
+TEXT_QUERIES = ['shake', 'mezcal vigorously', 'stir ice', 'glass']
+PANTRIES = [['Gin', 'Lemon juice', 'Sugar'], ['mezcal', 'lime juice', 'salt', 'yuzu liqueur'], ['vodka']]
+FILTERS = [{}, {'category': ['Shot']}, {'ingredient': ['Gin'], 'alcoholic': ['Alcoholic']},
+           {'name': ['royale']}, {'category': ['Brand New Cat', 'Cocktail']}]
+
+
+def _ids(results):
+    return [cocktail.id for cocktail in results]
+
+
+def _deltas(records):
+    """A shuffled mix of changed, deleted and new drinks."""
+    rng = random.Random(7)
+    ops = []
+    for record in rng.sample(records, 40):
+        record = copy.deepcopy(record)
+        record['strDrink'] = (record['strDrink'] or '') + ' Royale'
+        record['strIngredient1'] = rng.choice(['Mezcal', 'Gin', 'Zubrowka Grass'])
+        record['strCategory'] = rng.choice(['Shot', 'Punch Party', 'Brand New Cat'])
+        record['strInstructions'] = 'Shake vigorously with mezcal ' + (record['strInstructions'] or '')
+        ops.append(('upsert', record))
+    for record in rng.sample(records, 30):
+        ops.append(('delete', record['idDrink']))
+    for i in range(25):
+        record = copy.deepcopy(rng.choice(records))
+        record['idDrink'] = f'9{i:05d}'
+        record['strDrink'] = f'Newdrink {i} Margarita'
+        record['strIngredient2'] = 'Yuzu Liqueur'
+        ops.append(('upsert', record))
+    rng.shuffle(ops)
+    return ops
+
+
+def _replay(records, ops):
+    """The records a dump written after ``ops`` would hold, in catalog order."""
+    order = [record['idDrink'] for record in records]
+    by_id = {record['idDrink']: record for record in records}
+    for op, value in ops:
+        if op == 'upsert':
+            if value['idDrink'] not in by_id:
+                order.append(value['idDrink'])
+            by_id[value['idDrink']] = value
+        else:
+            by_id.pop(value, None)
+            order = [drink_id for drink_id in order if drink_id != value]
+    return [by_id[drink_id] for drink_id in order if drink_id in by_id]
+
+
+def _apply(db, ops):
+    for op, value in ops:
+        if op == 'upsert':
+            db.upsert(value)
+        else:
+            db.delete(value)
+
+
+class DeltaTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        with open(DUMP) as f:
+            records = json.load(f)
+        cls.ops = _deltas(records)
+        cls.final_dump = os.path.join(cls.directory, 'final.json')
+        with open(cls.final_dump, 'w') as f:
+            json.dump(_replay(records, cls.ops), f)
+        cls.fresh = CocktailDB(cls.final_dump)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+
+class CocktailDBDeltaTest(DeltaTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.db = CocktailDB(DUMP, use_snapshot=False)
+        # Build the lazy indexes first so the deltas patch them.
+        cls.db.warm_up()
+        cls.db.search_fuzzy('margarta')
+        cls.db.search_fuzzy('vodak', 'ingredient')
+        cls.db.suggest('ma')
+        _apply(cls.db, cls.ops)
+
+    def test_catalog(self):
+        self.assertEqual(len(self.db), len(self.fresh))
+        self.assertEqual(_ids(self.db), _ids(self.fresh))
+        for cocktail in self.fresh:
+            self.assertEqual(self.db.get_cocktail_by_id(cocktail.id).to_dict(), cocktail.to_dict())
+
+    def test_substring_searches(self):
+        for method in ('search_by_name', 'search_by_ingredient', 'search_by_category'):
+            for query in QUERIES:
+                for case_sensitive in (False, True):
+                    with self.subTest(method=method, query=query, case_sensitive=case_sensitive):
+                        self.assertEqual(_ids(getattr(self.db, method)(query, case_sensitive)),
+                                         _ids(getattr(self.fresh, method)(query, case_sensitive)))
+
+    def test_text_search(self):
+        for query in TEXT_QUERIES:
+            for language in ('en', 'de', 'es'):
+                with self.subTest(query=query, language=language):
+                    self.assertEqual(_ids(self.db.search_by_text(query, language)),
+                                     _ids(self.fresh.search_by_text(query, language)))
+                    self.assertEqual(self.db.count_by_text(query, language),
+                                     self.fresh.count_by_text(query, language))
+
+    def test_fuzzy_search(self):
+        for query, field in [('margarta', 'name'), ('newdrnk', 'name'), ('mezcl', 'ingredient'),
+                             ('yuzo', 'ingredient')]:
+            with self.subTest(query=query):
+                self.assertEqual(sorted(_ids(self.db.search_fuzzy(query, field))),
+                                 sorted(_ids(self.fresh.search_fuzzy(query, field))))
+
+    def test_pantry_search(self):
+        for pantry in PANTRIES:
+            for max_missing in (0, 2):
+                with self.subTest(pantry=pantry, max_missing=max_missing):
+                    self.assertEqual(
+                        [(cocktail.id, missing) for cocktail, missing in self.db.search_by_pantry(pantry, max_missing)],
+                        [(cocktail.id, missing) for cocktail, missing in self.fresh.search_by_pantry(pantry, max_missing)])
+
+    def test_facets(self):
+        def folded(facets):
+            return {key: sorted((value.lower(), count) for value, count in counts.items())
+                    for key, counts in facets.items()}
+
+        for spec in FILTERS:
+            with self.subTest(spec=spec):
+                results, facets = self.db.query(spec)
+                fresh_results, fresh_facets = self.fresh.query(spec)
+                self.assertEqual(_ids(results), _ids(fresh_results))
+                self.assertEqual(folded(facets), folded(fresh_facets))
+
+    def test_suggest(self):
+        for prefix in ['m', 'ma', 'gin', 'lem', 'new', 'bra', 'z', 'Ro', 'yu', 'pu', 's']:
+            with self.subTest(prefix=prefix):
+                self.assertEqual([(value.lower(), kind, count) for value, kind, count in self.db.suggest(prefix, 20)],
+                                 [(value.lower(), kind, count) for value, kind, count in self.fresh.suggest(prefix, 20)])
+
+    def test_similar_after_rebuild(self):
+        # Patched tables keep the IDF weights of their last build, so compare
+        # a table rebuilt from the updated catalog.
+        with self.db.writing():
+            self.db._neighbors = self.db._neighbor_state = None
+        for cocktail in list(self.fresh)[::20]:
+            with self.subTest(drink_id=cocktail.id):
+                self.assertEqual(_ids(self.db.similar(cocktail.id)), _ids(self.fresh.similar(cocktail.id)))
+
+
+class SQLiteDeltaTest(DeltaTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.db = SQLiteCocktailDB(import_dump(DUMP, os.path.join(cls.directory, 'catalog.sqlite')))
+        _apply(cls.db, cls.ops)
+        cls.fresh_sqlite = SQLiteCocktailDB(import_dump(cls.final_dump, os.path.join(cls.directory, 'final.sqlite')))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.db.close()
+        cls.fresh_sqlite.close()
+        super().tearDownClass()
+
+    def test_catalog(self):
+        self.assertEqual(len(self.db), len(self.fresh))
+        for cocktail in self.fresh:
+            self.assertEqual(self.db.get_cocktail_by_id(cocktail.id).to_dict(), cocktail.to_dict())
+
+    def test_substring_searches(self):
+        for method in ('search_by_name', 'search_by_ingredient', 'search_by_category'):
+            for query in QUERIES:
+                for case_sensitive in (False, True):
+                    with self.subTest(method=method, query=query, case_sensitive=case_sensitive):
+                        self.assertEqual(_ids(getattr(self.db, method)(query, case_sensitive)),
+                                         _ids(getattr(self.fresh, method)(query, case_sensitive)))
+
+    def test_text_search(self):
+        for query in TEXT_QUERIES:
+            for language in ('en', 'de', 'es'):
+                with self.subTest(query=query, language=language):
+                    self.assertEqual(_ids(self.db.search_by_text(query, language)),
+                                     _ids(self.fresh_sqlite.search_by_text(query, language)))
+                    self.assertEqual(self.db.count_by_text(query, language),
+                                     self.fresh.count_by_text(query, language))
+
+
+if __name__ == '__main__':
+    unittest.main()
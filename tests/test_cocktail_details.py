@@ -0,0 +1,50 @@
+"""Lazily loaded details when the dump changes underneath the catalog."""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cocktail_details import DumpChangedError  # noqa: E402
+from cocktail_search import CocktailDB  # noqa: E402
+
+DUMP = os.path.join(ROOT, 'cocktaildb_dump.json')
+
+
+class DetailStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.directory, 'dump.json')
+        shutil.copy(DUMP, self.json_file)
+        self.db = CocktailDB(self.json_file, lazy_details=True)
+        self.eager = CocktailDB(DUMP)
+
+    def tearDown(self):
+        self.db.details.close()
+        shutil.rmtree(self.directory)
+
+    def test_details_match_eager_load(self):
+        for position in (0, len(self.eager.cocktails) // 2, len(self.eager.cocktails) - 1):
+            self.assertEqual(self.db.cocktails[position].to_dict(), self.eager.cocktails[position].to_dict())
+
+    def test_replaced_dump_keeps_serving_indexed_version(self):
+        replacement = os.path.join(self.directory, 'new.json')
+        with open(replacement, 'w') as f:
+            f.write('[]')
+        os.replace(replacement, self.json_file)
+        position = len(self.eager.cocktails) - 1
+        self.assertEqual(self.db.cocktails[position].to_dict(), self.eager.cocktails[position].to_dict())
+
+    def test_truncated_dump_raises(self):
+        size = os.path.getsize(self.json_file)
+        with open(self.json_file, 'r+b') as f:
+            f.truncate(size // 3)
+        with self.assertRaises(DumpChangedError):
+            self.db.cocktails[len(self.eager.cocktails) - 1].to_dict()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Indexed CocktailDB searches against the linear scans they replaced."""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cocktail_search import CocktailDB  # noqa: E402
+from cocktail_snapshot import build_snapshot  # noqa: E402
+
+DUMP = os.path.join(ROOT, 'cocktaildb_dump.json')
+
+QUERIES = ['', 'a', 'A', 'ma', 'Mar', 'margarita', 'MARGARITA', 'gin', 'Gin', 'rum', 'juice', 'Lemon', 'shot',
+           'Shot', 'Ordinary Drink', 'ordinary drink', 'cocktail', 'é', ' ', 'xyzq']
+
+
+def _scan_name(records, name, case_sensitive):
+    name = name if case_sensitive else name.lower()
+    return [record['idDrink'] for record in records
+            if name in (record.get('strDrink', '') if case_sensitive else record.get('strDrink', '').lower())]
+
+
+def _scan_ingredient(records, ingredient, case_sensitive):
+    ingredient = ingredient if case_sensitive else ingredient.lower()
+    results = []
+    for record in records:
+        for i in range(1, 16):
+            value = record.get(f'strIngredient{i}')
+            if value and ingredient in (value if case_sensitive else value.lower()):
+                results.append(record['idDrink'])
+                break
+    return results
+
+
+def _scan_category(records, category, case_sensitive):
+    category = category if case_sensitive else category.lower()
+    return [record['idDrink'] for record in records
+            if record.get('strCategory')
+            and category in (record['strCategory'] if case_sensitive else record['strCategory'].lower())]
+
+
+class IndexedSearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(DUMP) as f:
+            cls.records = json.load(f)
+        cls.db = CocktailDB(DUMP, use_snapshot=False)
+
+    def test_matches_linear_scan(self):
+        for method, scan in (('search_by_name', _scan_name), ('search_by_ingredient', _scan_ingredient),
+                             ('search_by_category', _scan_category)):
+            for query in QUERIES:
+                for case_sensitive in (False, True):
+                    with self.subTest(method=method, query=query, case_sensitive=case_sensitive):
+                        self.assertEqual([cocktail.id for cocktail in getattr(self.db, method)(query, case_sensitive)],
+                                         scan(self.records, query, case_sensitive))
+
+
+class RecordRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.directory, 'dump.json')
+        shutil.copy(DUMP, self.json_file)
+        with open(DUMP) as f:
+            self.records = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_to_dict_returns_raw_record(self):
+        build_snapshot(self.json_file)
+        for options in ({'use_snapshot': False}, {}, {'lazy_details': True}):
+            db = CocktailDB(self.json_file, **options)
+            for record in self.records:
+                with self.subTest(options=options, drink_id=record['idDrink']):
+                    self.assertEqual(db.get_cocktail_by_id(record['idDrink']).to_dict(), record)
+
+    def test_to_dict_keeps_unknown_fields(self):
+        db = CocktailDB(self.json_file, use_snapshot=False)
+        record = dict(self.records[0], idDrink='x1', strExtra='kept')
+        db.upsert(record)
+        self.assertEqual(db.get_cocktail_by_id('x1').to_dict(), record)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""ShardedCocktailDB answers every search exactly as the unsharded catalog does."""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cocktail_search import CocktailDB  # noqa: E402
+from cocktail_shards import ShardedCocktailDB  # noqa: E402
+
+DUMP = os.path.join(ROOT, 'cocktaildb_dump.json')
+
+QUERIES = ['a', 'ma', 'gin', 'rum', 'Vodka', 'lemon', 'cocktail', 'shot', 'xyzq', 'Ordinary Drink',
+           'zeta', 'newish']
+TEXT_QUERIES = ['shake with ice', 'pour into glass', 'stir', 'Eis', 'shake gently', 'zzz']
+
+
+def _ids(results):
+    return [cocktail.id for cocktail in results]
+
+
+class ShardedCocktailDBTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.single = CocktailDB(DUMP, use_snapshot=False)
+        cls.sharded = ShardedCocktailDB(CocktailDB(DUMP, use_snapshot=False), 3)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.sharded.close()
+
+    def assertSameResults(self):
+        for query in QUERIES:
+            for method in ('search_by_name', 'search_by_ingredient', 'search_by_category'):
+                for case_sensitive in (False, True):
+                    with self.subTest(method=method, query=query, case_sensitive=case_sensitive):
+                        self.assertEqual(_ids(getattr(self.sharded, method)(query, case_sensitive)),
+                                         _ids(getattr(self.single, method)(query, case_sensitive)))
+            for field in ('name', 'ingredient'):
+                for max_distance in (0, 1, 2):
+                    with self.subTest(query=query, field=field, max_distance=max_distance):
+                        self.assertEqual(_ids(self.sharded.search_fuzzy(query, field, max_distance)),
+                                         _ids(self.single.search_fuzzy(query, field, max_distance)))
+        for query in TEXT_QUERIES:
+            for language in ('en', 'de'):
+                for limit in (None, 1, 5, 20):
+                    with self.subTest(query=query, language=language, limit=limit):
+                        self.assertEqual(_ids(self.sharded.search_by_text(query, language, limit)),
+                                         _ids(self.single.search_by_text(query, language, limit)))
+                with self.subTest(query=query, language=language):
+                    self.assertEqual(self.sharded.count_by_text(query, language),
+                                     self.single.count_by_text(query, language))
+
+    def test_searches_match(self):
+        self.assertSameResults()
+
+    def test_searches_match_after_deltas(self):
+        for db in (self.sharded, self.single):
+            # A changed drink in the first shard, a new one in the last, and
+            # a deleted one in the middle.
+            raw = self.single.cocktails[0].to_dict()
+            raw['strDrink'] = 'Zeta ' + raw['strDrink']
+            raw['strInstructions'] = 'Shake gently'
+            db.upsert(raw)
+            raw = dict(raw, idDrink='new1', strDrink='Newish Ginny', strCategory='Shot')
+            db.upsert(raw)
+            self.assertTrue(db.delete(self.single.cocktails[len(self.single.cocktails) // 2].id))
+        self.assertEqual(len(self.sharded), len(self.single))
+        self.assertSameResults()
+
+    def test_errors_match(self):
+        for db in (self.sharded, self.single):
+            with self.assertRaises(ValueError):
+                db.search_fuzzy('gin', 'category')
+            with self.assertRaises(ValueError):
+                db.search_by_text('gin', 'xx')
+
+
+if __name__ == '__main__':
+    unittest.main()
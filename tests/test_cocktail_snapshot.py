@@ -0,0 +1,91 @@
+"""Damaged or outdated snapshots fall back to loading the JSON dump."""
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cocktail_search import CocktailDB  # noqa: E402
+from cocktail_snapshot import FORMAT_VERSION, MAGIC, Snapshot, build_snapshot, write_snapshot  # noqa: E402
+
+DUMP = os.path.join(ROOT, 'cocktaildb_dump.json')
+
+
+def _ids(results):
+    return [cocktail.id for cocktail in results]
+
+
+class SnapshotFallbackTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.expected = CocktailDB(DUMP, use_snapshot=False)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.directory, 'dump.json')
+        shutil.copy(DUMP, self.json_file)
+        self.snapshot_file = build_snapshot(self.json_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _damage(self, damage):
+        """Apply ``damage(file)`` to the snapshot, keeping its mtime so only the damage can reject it."""
+        stat = os.stat(self.snapshot_file)
+        with open(self.snapshot_file, 'r+b') as f:
+            damage(f)
+        os.utime(self.snapshot_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def assertMatchesDump(self, db):
+        self.assertEqual(len(db), len(self.expected))
+        for cocktail in self.expected:
+            self.assertEqual(db.get_cocktail_by_id(cocktail.id).to_dict(), cocktail.to_dict())
+        for query in ('mar', 'Gin', 'shot', ''):
+            for method in ('search_by_name', 'search_by_ingredient', 'search_by_category'):
+                self.assertEqual(_ids(getattr(db, method)(query)), _ids(getattr(self.expected, method)(query)))
+        self.assertEqual(_ids(db.search_by_text('shake with ice')), _ids(self.expected.search_by_text('shake with ice')))
+        self.assertEqual(_ids(db.similar('11007')), _ids(self.expected.similar('11007')))
+
+    def test_valid_snapshot_is_used(self):
+        with Snapshot.open(self.snapshot_file, self.json_file) as snapshot:
+            self.assertIn('cocktails', snapshot)
+        self.assertMatchesDump(CocktailDB(self.json_file))
+
+    def test_truncated_snapshot(self):
+        self._damage(lambda f: f.truncate(os.path.getsize(self.snapshot_file) // 2))
+        self.assertIsNone(Snapshot.open(self.snapshot_file, self.json_file))
+        self.assertMatchesDump(CocktailDB(self.json_file))
+
+    def test_bit_flipped_snapshot(self):
+        def flip(f):
+            f.seek(os.path.getsize(self.snapshot_file) // 2)
+            byte = f.read(1)[0]
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte ^ 0x10]))
+
+        self._damage(flip)
+        self.assertIsNone(Snapshot.open(self.snapshot_file, self.json_file))
+        self.assertMatchesDump(CocktailDB(self.json_file))
+
+    def test_old_format_version(self):
+        self._damage(lambda f: (f.seek(len(MAGIC)), f.write(struct.pack('<H', FORMAT_VERSION - 1))))
+        self.assertIsNone(Snapshot.open(self.snapshot_file, self.json_file))
+        self.assertMatchesDump(CocktailDB(self.json_file))
+
+    def test_undecodable_section(self):
+        # Checksums match, but the cocktails section is not what the loader expects.
+        sections = self.expected.snapshot_sections()
+        sections['cocktails'] = 42
+        write_snapshot(self.snapshot_file, self.json_file, sections)
+        snapshot = Snapshot.open(self.snapshot_file, self.json_file)
+        self.assertIsNotNone(snapshot)
+        snapshot.close()
+        self.assertMatchesDump(CocktailDB(self.json_file))
+
+
+if __name__ == '__main__':
+    unittest.main()
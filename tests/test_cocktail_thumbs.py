@@ -0,0 +1,145 @@
+"""ThumbnailService against a local stand-in for the image host."""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image  # noqa: E402
+
+from cocktail_thumbs import ThumbnailService  # noqa: E402
+
+# Seconds the /slow/ images take to respond; longer than the service timeout.
+SLOW_SECONDS = 1.0
+
+
+def _png(width: int, height: int, color) -> bytes:
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    images = {}
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path.startswith('/slow/'):
+            time.sleep(SLOW_SECONDS)
+        body = self.images.get(self.path.rsplit('/', 1)[-1])
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThumbnailServiceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        _ImageHandler.images = {
+            'wide.png': _png(800, 400, (200, 40, 40)),
+            'tall.png': _png(300, 900, (40, 200, 40)),
+            'small.png': _png(50, 50, (40, 40, 200)),
+        }
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _ImageHandler)
+        cls.server.daemon_threads = True
+        cls.server.requests = []
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.cache_dir = tempfile.mkdtemp(prefix='thumbs-test-')
+        self.service = self._service()
+
+    def tearDown(self):
+        self.service.close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _service(self, **options):
+        options.setdefault('timeout', 0.3)
+        return ThumbnailService(self.cache_dir, size=(100, 100), **options)
+
+    def _cache_files(self):
+        return sorted(name for name in os.listdir(self.cache_dir) if name.endswith('.jpg'))
+
+    def test_resizes_into_bounding_box(self):
+        image = Image.open(BytesIO(self.service.get(f'{self.base}/wide.png')))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (100, 50))
+        image = Image.open(BytesIO(self.service.get(f'{self.base}/tall.png')))
+        self.assertEqual(image.size, (33, 100))
+
+    def test_missing_image_returns_placeholder(self):
+        self.assertEqual(self.service.get(f'{self.base}/missing.png'), self.service.placeholder)
+        self.assertEqual(self.service.get(None), self.service.placeholder)
+        self.assertEqual(self._cache_files(), [])
+
+    def test_timeout_returns_placeholder(self):
+        started = time.monotonic()
+        self.assertEqual(self.service.get(f'{self.base}/slow/wide.png'), self.service.placeholder)
+        self.assertLess(time.monotonic() - started, SLOW_SECONDS)
+
+    def test_cached_thumbnail_is_not_downloaded_again(self):
+        url = f'{self.base}/wide.png'
+        first = self.service.get(url)
+        self.assertEqual(self.service.get(url), first)
+        self.assertEqual(self.server.requests, ['/wide.png'])
+        # A new service finds the thumbnail in the on-disk cache.
+        self.service.close()
+        self.service = self._service()
+        self.assertEqual(self.service.get(url), first)
+        self.assertEqual(self.server.requests, ['/wide.png'])
+
+    def test_evicts_least_recently_used_under_byte_cap(self):
+        sizes = {}
+        for name in ('wide.png', 'tall.png', 'small.png'):
+            before = set(self._cache_files())
+            self.service.get(f'{self.base}/{name}')
+            (added,) = set(self._cache_files()) - before
+            sizes[name] = (added, os.path.getsize(os.path.join(self.cache_dir, added)))
+        self.service.close()
+        os.remove(os.path.join(self.cache_dir, sizes['small.png'][0]))
+        # Room for the wide thumbnail and one other, but not all three.
+        cap = sizes['wide.png'][1] + max(sizes['tall.png'][1], sizes['small.png'][1])
+        self.service = self._service(max_cache_bytes=cap)
+        self.service.get(f'{self.base}/wide.png')   # now more recently used than tall
+        self.service.get(f'{self.base}/small.png')
+        files = self._cache_files()
+        self.assertEqual(sorted(files), sorted([sizes['wide.png'][0], sizes['small.png'][0]]))
+        total = sum(os.path.getsize(os.path.join(self.cache_dir, name)) for name in files)
+        self.assertLessEqual(total, cap)
+
+    def test_prefetch_fetches_in_parallel_and_falls_back(self):
+        urls = [f'{self.base}/wide.png', f'{self.base}/tall.png', f'{self.base}/missing.png',
+                f'{self.base}/slow/small.png', None, f'{self.base}/wide.png']
+        thumbnails = self.service.prefetch(urls)
+        self.assertEqual(set(thumbnails), set(urls))
+        self.assertNotEqual(thumbnails[urls[0]], self.service.placeholder)
+        self.assertNotEqual(thumbnails[urls[1]], self.service.placeholder)
+        for url in urls[2:5]:
+            self.assertEqual(thumbnails[url], self.service.placeholder)
+        self.assertEqual(self.server.requests.count('/wide.png'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()